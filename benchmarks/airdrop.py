@@ -0,0 +1,73 @@
+"""
+Раздача на --recipients получателей: время, на которое команда занимает поток событий,
+время выполнения в потоке раздачи (выбор получателей, одна транзакция журнала и запись
+на диск) и число запросов messages.send на уведомления.
+
+Работает во временном каталоге: журнал балансов и player_data.json не затрагиваются.
+VK заменен заглушкой, которая только считает запросы.
+
+Запуск из корня проекта:
+    python -m benchmarks.airdrop [--recipients 10000] [--farm-entries 200000]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+import ledger
+import games.airdrop as airdrop
+
+class CountingVk:
+    def __init__(self):
+        self.calls = 0
+        self.messages = self
+
+    def send(self, **params):
+        self.calls += 1
+        return 1
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--recipients", type=int, default=10_000)
+    parser.add_argument("--farm-entries", type=int, default=200_000, help="наград за клики в журнале")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    os.chdir(tempfile.mkdtemp(prefix="airdrop_bench_"))
+    players = args.recipients * 2
+    player_data = {str(user_id): {"balance": 100, "name": f"Игрок {user_id}"} for user_id in range(1, players + 1)}
+    ledger.init_ledger(player_data)
+    for _ in range(args.farm_entries):
+        ledger.record_farm_reward(player_data, str(rng.randint(1, players)), rng.randint(5, 17))
+    ledger.flush()
+    vk = CountingVk()
+    airdrop.NOTIFY_RATE = 10_000
+
+    started = time.perf_counter()
+    airdrop.process_airdrop_command(airdrop.CONFIG["OWNER_ID"], f"раздача 50 топ {args.recipients} майнеров недели",
+                                    player_data, vk, 1)
+    selector_event_time = time.perf_counter() - started
+    airdrop._jobs.join()
+    selector_time = time.perf_counter() - started
+
+    lines = "\n".join(f"id{user_id} {rng.randint(1, 100)}" for user_id in range(players + 1, players + args.recipients + 1))
+    started = time.perf_counter()
+    airdrop.process_airdrop_command(airdrop.CONFIG["OWNER_ID"], f"раздача\n{lines}", player_data, vk, 1)
+    list_event_time = time.perf_counter() - started
+    airdrop._jobs.join()
+    list_time = time.perf_counter() - started
+
+    airdrop._notifications.join()
+    balances, _seq = ledger.replay(ledger.read_ledger_lines())
+    print(f"Топ {args.recipients} майнеров недели ({args.farm_entries} наград в журнале): {selector_time:.2f} с "
+          f"в потоке раздачи, поток событий занят {selector_event_time * 1000:.2f} мс")
+    print(f"Список из {args.recipients} новых получателей: {list_time:.2f} с в потоке раздачи, "
+          f"поток событий занят {list_event_time * 1000:.2f} мс")
+    print(f"Запросов messages.send на уведомления: {airdrop.airdrop_stats['notify_calls']} "
+          f"(при {airdrop.CONFIG.get('AIRDROP_NOTIFY_RATE', 5)} в секунду — "
+          f"{airdrop.airdrop_stats['notify_calls'] / airdrop.CONFIG.get('AIRDROP_NOTIFY_RATE', 5):.0f} с в фоне)")
+    print(f"Сумма всех счетов журнала: {round(sum(balances.values()), 2)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Стоимость коммитментов: прежняя схема (MD5 строки поля с суффиксом, которая хранится
+до раскрытия вместе с хешем, — на каждый раунд) и заранее опубликованный корень сидов
+сервера периода (commitments): дерево строится один раз при открытии периода, новой
+паре сидов достается следующий сид (HMAC-SHA256 и SHA-256), а раунд ничего не хеширует
+и не пишет. Путь к корню — O(log n) хешей на запрос проверки.
+
+Запуск из корня проекта:
+    python -m benchmarks.commitments [--rounds 100000]
+"""
+import argparse
+import hashlib
+import random
+import secrets
+import string
+import time
+from commitments import SEEDS_PER_PERIOD, _period_levels, merkle_proof, period_seed, seed_hash, verify_proof
+from games.mines import mask_to_grid_plain
+
+def legacy_grid_plain_with_random(grid_plain):
+    # Прежняя строка поля с 10 случайными символами, хранившаяся до раскрытия
+    return f"{grid_plain}|{''.join(random.choices(string.ascii_letters + string.digits, k=10))}"
+
+def legacy(rounds):
+    started = time.perf_counter()
+    stored = 0
+    for nonce in range(rounds):
+        plain = legacy_grid_plain_with_random(mask_to_grid_plain(1 << (nonce % 25), 5))
+        grid_hash = hashlib.md5(plain.encode("utf-8")).hexdigest()
+        stored += len(plain.encode("utf-8")) + len(grid_hash)
+    return time.perf_counter() - started, stored
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=100000)
+    args = parser.parse_args()
+
+    elapsed, stored = legacy(args.rounds)
+    print(f"MD5 на раунд:          {elapsed / args.rounds * 1e6:8.2f} мкс, хранится {stored / args.rounds:6.1f} байт/раунд")
+    print("Коммитмент на раунд:   не вычисляется и не хранится (0 хешей, 0 байт)")
+
+    secret = secrets.token_hex(32)
+    started = time.perf_counter()
+    for index in range(args.rounds):
+        seed_hash(period_seed(secret, index))
+    per_seed = time.perf_counter() - started
+    print(f"Сид новой пары:        {per_seed / args.rounds * 1e6:8.2f} мкс (HMAC-SHA256 + SHA-256, раз на пару сидов)")
+
+    started = time.perf_counter()
+    levels = _period_levels(secret)
+    build = time.perf_counter() - started
+    print(f"Открытие периода:      {build * 1e3:8.1f} мс на {SEEDS_PER_PERIOD} сидов, публикуется 1 корень")
+
+    index = SEEDS_PER_PERIOD // 3
+    started = time.perf_counter()
+    proof = merkle_proof(levels, index)
+    ok = verify_proof(seed_hash(period_seed(secret, index)), proof, levels[-1][0].hex())
+    print(f"Доказательство сида:   {len(proof)} хешей ({len(proof) * 32} байт), "
+          f"построение и проверка {(time.perf_counter() - started) * 1e6:.0f} мкс, верно: {ok}")
+
+if __name__ == "__main__":
+    main()
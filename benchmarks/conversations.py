@@ -0,0 +1,79 @@
+"""
+Проверка прав бота и состава беседы через кэш conversations против запроса
+messages.getConversationMembers на каждую команду.
+
+В --chats бесед по --members участников приходит --events событий: команды "начать"
+(проверка прав бота) вперемешку с приглашениями и исключениями
+участников (доля --churn). Считаются запросы к VK и время проверки; после каждого
+исключения проверяется, что кэш уже не считает участника членом беседы.
+
+VK заменен заглушкой с задержкой --latency на запрос.
+
+Запуск из корня проекта:
+    python -m benchmarks.conversations [--chats 200] [--events 100000] [--latency 0.05]
+"""
+import argparse
+import random
+import sys
+import time
+import conversations
+
+class FakeConversations:
+    def __init__(self, chats, members, latency):
+        self.latency = latency
+        self.calls = 0
+        self.chats = {2000000000 + chat: {conversations.BOT_MEMBER_ID} | set(range(1, members + 1))
+                      for chat in range(1, chats + 1)}
+        self.messages = self
+
+    def getConversationMembers(self, peer_id, offset=0, count=200):
+        self.calls += 1
+        time.sleep(self.latency)
+        members = sorted(self.chats[peer_id])
+        items = [{"member_id": member_id, "is_admin": member_id == conversations.BOT_MEMBER_ID}
+                 for member_id in members[offset:offset + count]]
+        return {"count": len(members), "items": items}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chats", type=int, default=200)
+    parser.add_argument("--members", type=int, default=300)
+    parser.add_argument("--events", type=int, default=100_000)
+    parser.add_argument("--churn", type=float, default=0.05, help="доля приглашений и исключений")
+    parser.add_argument("--latency", type=float, default=0.05, help="задержка запроса к VK (с)")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    vk = FakeConversations(args.chats, args.members, args.latency)
+    peers = list(vk.chats)
+    next_member = args.members + 1
+    checks = stale = 0
+    check_time = 0.0
+    for _ in range(args.events):
+        peer_id = rng.choice(peers)
+        if rng.random() < args.churn:
+            if rng.random() < 0.5:
+                member_id, next_member = next_member, next_member + 1
+                vk.chats[peer_id].add(member_id)
+                conversations.apply_chat_action(peer_id, {"type": "chat_invite_user", "member_id": member_id})
+            else:
+                member_id = rng.choice(sorted(vk.chats[peer_id] - {conversations.BOT_MEMBER_ID}))
+                vk.chats[peer_id].discard(member_id)
+                conversations.apply_chat_action(peer_id, {"type": "chat_kick_user", "member_id": member_id})
+                stale += member_id in conversations.get_conversation(peer_id, vk)["members"]
+            continue
+        started = time.perf_counter()
+        conversations.bot_is_admin(peer_id, vk)
+        check_time += time.perf_counter() - started
+        checks += 1
+
+    print(f"{checks} проверок прав бота в {args.chats} беседах: запросов к VK {vk.calls} "
+          f"(без кэша — {checks}, {checks * args.latency:.0f} с ожидания VK)")
+    print(f"  среднее время проверки (с учетом запросов к VK): {check_time / checks * 1e6:.1f} мкс, "
+          f"исключенных участников, которых кэш считает членами беседы: {stale}")
+    if stale:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+"""
+Скорость генерации поля "Мины": прежняя выборка с повторными попытками
+(прежний generate_mines_grid, random.randint) и детерминированное перемешивание
+по потоку HMAC-SHA256 (fairness.mines_mask) для разной плотности мин.
+
+Кэш mines_mask отключается, чтобы измерялось именно вычисление.
+
+Запуск из корня проекта:
+    python -m benchmarks.fairness [--rounds 20000] [--size 5]
+"""
+import argparse
+import secrets
+import time
+from fairness import coinflip_outcome, mines_mask
+from benchmarks.mines_bitboard import legacy_mines_grid
+
+def per_round(func, rounds):
+    started = time.perf_counter()
+    for nonce in range(rounds):
+        func(nonce)
+    return (time.perf_counter() - started) / rounds * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=20000)
+    parser.add_argument("--size", type=int, default=5)
+    args = parser.parse_args()
+    server_seed, client_seed = secrets.token_hex(32), secrets.token_hex(8)
+    uncached = mines_mask.__wrapped__
+    total = args.size * args.size
+
+    print(f"{'мин':>5}{'randint, мкс':>15}{'HMAC, мкс':>12}")
+    for mine_count in sorted({1, 3, total // 2, total - 3, total - 1}):
+        legacy = per_round(lambda nonce: legacy_mines_grid(args.size, mine_count), args.rounds)
+        seeded = per_round(lambda nonce: uncached(server_seed, client_seed, nonce, args.size, mine_count), args.rounds)
+        print(f"{mine_count:>5}{legacy:>15.2f}{seeded:>12.2f}")
+    coinflip = per_round(lambda nonce: coinflip_outcome(server_seed, client_seed, nonce), args.rounds)
+    print(f"Орел-решка (HMAC): {coinflip:.2f} мкс/раунд")
+
+if __name__ == "__main__":
+    main()
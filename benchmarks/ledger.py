@@ -0,0 +1,60 @@
+"""
+Стоимость записи изменения баланса: прежнее сохранение всего player_data.json
+на каждое изменение и журнал балансов (ledger) с записью пачками.
+
+Файлы пишутся во временный каталог.
+
+Запуск из корня проекта:
+    python -m benchmarks.ledger [--players 10000] [--changes 2000] [--batch 100]
+"""
+import argparse
+import os
+import tempfile
+import time
+import data_manager
+import ledger
+
+def make_players(count):
+    return {str(user_id): {"balance": 100, "start_date": "2024-01-01", "last_bonus": None, "clicks": [],
+                           "name": f"Пользователь {user_id}"} for user_id in range(1, count + 1)}
+
+def save_every_change(player_data, changes):
+    started = time.perf_counter()
+    for change in range(changes):
+        player_data[str(change % len(player_data) + 1)]["balance"] += 1
+        data_manager.save_player_data(player_data)
+    return (time.perf_counter() - started) / changes
+
+def ledger_batches(player_data, changes, batch):
+    ledger.init_ledger(player_data)
+    ledger.flush()
+    started = time.perf_counter()
+    for change in range(changes):
+        ledger.record_farm_reward(player_data, change % len(player_data) + 1, 1)
+        if (change + 1) % batch == 0:
+            ledger.flush()
+    ledger.flush()
+    return (time.perf_counter() - started) / changes
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--players", type=int, default=10000)
+    parser.add_argument("--changes", type=int, default=2000)
+    parser.add_argument("--batch", type=int, default=100, help="изменений в одной пачке журнала")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        legacy = save_every_change(make_players(args.players), args.changes)
+        batched = ledger_batches(make_players(args.players), args.changes, args.batch)
+        started = time.perf_counter()
+        balances, seq = ledger.replay(data_manager.read_ledger_lines())
+        rebuild = time.perf_counter() - started
+
+    print(f"Игроков: {args.players}")
+    print(f"save_player_data на изменение: {legacy * 1e3:8.3f} мс")
+    print(f"журнал, пачки по {args.batch}:      {batched * 1e3:8.3f} мс")
+    print(f"Пересчет всех балансов по журналу ({seq} записей): {rebuild * 1e3:.1f} мс")
+
+if __name__ == "__main__":
+    main()
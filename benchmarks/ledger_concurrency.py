@@ -0,0 +1,121 @@
+"""
+Нагрузочная проверка сохранения средств при параллельных изменениях балансов.
+
+--workers потоков одновременно делают ставки (record_stake, затем выплата с вероятностью 1/2)
+и переводы между случайными игроками (record_transfer), нередко на сумму больше баланса.
+После остановки проверяется:
+  - сумма всех счетов журнала равна нулю (деньги не появились и не исчезли);
+  - балансы в player_data совпадают с пересчетом журнала;
+  - ни один баланс игрока не стал отрицательным (нет двойного списания).
+Для сравнения тот же сценарий выполняется прежним способом — проверка баланса
+и списание отдельными шагами над общим словарем.
+
+Работает во временном каталоге, рабочие файлы бота не затрагиваются.
+
+Запуск из корня проекта:
+    python -m benchmarks.ledger_concurrency [--workers 64] [--operations 2000] [--players 50]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import ledger
+
+def run_workers(workers, operation):
+    barrier = threading.Barrier(workers)
+    errors = []
+
+    def worker(index):
+        rng = random.Random(index)
+        barrier.wait()
+        try:
+            operation(rng)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(index,)) for index in range(workers)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
+    return time.perf_counter() - started
+
+def ledger_operations(player_data, players, operations, stats):
+    lock = threading.Lock()
+
+    def operation(rng):
+        rejected = 0
+        for _ in range(operations):
+            user_id = str(rng.randint(1, players))
+            amount = rng.randint(1, 60)
+            try:
+                if rng.random() < 0.5:
+                    ledger.record_stake(player_data, user_id, amount, "stress")
+                    if rng.random() < 0.5:
+                        ledger.record_payout(player_data, user_id, amount * 2, "stress")
+                else:
+                    recipient = str(rng.randint(1, players))
+                    if recipient != user_id:
+                        ledger.record_transfer(player_data, user_id, recipient, amount)
+            except ledger.InsufficientFunds:
+                rejected += 1
+        with lock:
+            stats["rejected"] += rejected
+    return operation
+
+def unsafe_operations(balances, players, operations):
+    # Прежняя схема: проверка и списание — отдельные шаги без общей блокировки
+    def operation(rng):
+        for _ in range(operations):
+            sender, recipient = str(rng.randint(1, players)), str(rng.randint(1, players))
+            amount = rng.randint(1, 60)
+            if balances[sender] < amount or sender == recipient:
+                continue
+            time.sleep(0)  # переключение потока между проверкой и списанием
+            balances[sender] -= amount
+            balances[recipient] += amount
+    return operation
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=64)
+    parser.add_argument("--operations", type=int, default=2000, help="операций на поток")
+    parser.add_argument("--players", type=int, default=50)
+    parser.add_argument("--balance", type=int, default=100)
+    args = parser.parse_args()
+    # Частое переключение потоков делает гонки заметнее
+    sys.setswitchinterval(1e-5)
+
+    os.chdir(tempfile.mkdtemp(prefix="ledger_stress_"))
+    player_data = {str(user_id): {"balance": args.balance} for user_id in range(1, args.players + 1)}
+    ledger.init_ledger(player_data)
+    stats = {"rejected": 0}
+    elapsed = run_workers(args.workers, ledger_operations(player_data, args.players, args.operations, stats))
+    ledger.flush()
+
+    balances, _seq = ledger.replay(ledger.read_ledger_lines())
+    total = round(sum(balances.values()), 2)
+    mismatched = [user_id for user_id, player in player_data.items() if balances.get(user_id, 0) != player["balance"]]
+    negative = [user_id for user_id, player in player_data.items() if player["balance"] < 0]
+    operations = args.workers * args.operations
+    print(f"Журнал: {operations} операций в {args.workers} потоках за {elapsed:.2f} с "
+          f"({operations / elapsed:,.0f} операций/с), отклонено из-за нехватки средств: {stats['rejected']}")
+    print(f"  сумма всех счетов: {total}, расхождений с player_data: {len(mismatched)}, "
+          f"отрицательных балансов: {len(negative)}")
+
+    unsafe = {str(user_id): args.balance for user_id in range(1, args.players + 1)}
+    run_workers(args.workers, unsafe_operations(unsafe, args.players, args.operations))
+    negative_unsafe = [user_id for user_id, balance in unsafe.items() if balance < 0]
+    print(f"Проверка и списание отдельными шагами: отрицательных балансов {len(negative_unsafe)}, "
+          f"минимальный баланс {min(unsafe.values())}")
+    if total != 0 or mismatched or negative:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+"""
+Восстановление Long Poll после сбоев: прежний цикл main.main (VkBotLongPoll и пауза 3 с
+после любой ошибки) против ResilientLongPoll.
+
+Локальный HTTP-сервер имитирует Bots Long Poll: генерирует события с заданной частотой
+и на части запросов вместо ответа внедряет сбой — failed 1/2/3, HTTP 500 или обрыв
+соединения. Обработчик событий с заданной вероятностью выбрасывает исключение.
+Для каждого клиента считается число событий, не полученных к концу замера (потерянных
+или застрявших из-за пауз после ошибок), число повторно полученных событий
+и время от сбоя до следующего полученного события.
+
+События, пропущенные по протоколу после failed=3 (сервер выдает новый ts), показаны отдельно:
+их не может получить ни один клиент.
+
+Запуск из корня проекта:
+    python -m benchmarks.longpoll [--events 3000] [--rate 300] [--fault-rate 0.05]
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from vk_api.bot_longpoll import VkBotLongPoll
+from longpoll import ResilientLongPoll
+
+FAULTS = ("failed_1", "failed_2", "failed_3", "http_500", "drop")
+
+class LongPollStandIn:
+    """
+    Имитация Long Poll сервера и метода groups.getLongPollServer.
+    """
+
+    def __init__(self, fault_rate, batch, seed):
+        self.fault_rate = fault_rate
+        self.batch = batch
+        self.rng = random.Random(seed)
+        self.events = []
+        self.key = "k0"
+        self.faults = []
+        self.protocol_skipped = 0
+        self._resync_from = None
+        self._key_version = 0
+        self._cond = threading.Condition()
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                query = {name: values[0] for name, values in parse_qs(urlparse(self.path).query).items()}
+                stand_in.handle(self, query)
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}/"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def method(self, name, values=None):
+        # groups.getLongPollServer: текущие ключ, адрес и ts
+        with self._cond:
+            if self._resync_from is not None:
+                self.protocol_skipped += len(self.events) - self._resync_from
+                self._resync_from = None
+            return {"key": self.key, "server": self.url, "ts": str(len(self.events))}
+
+    def produce(self, count, rate):
+        for index in range(count):
+            with self._cond:
+                self.events.append({"type": "message_new", "group_id": 1, "event_id": f"ev{index}",
+                                    "object": {"message": {"id": 0, "conversation_message_id": index + 1,
+                                                           "peer_id": 2000000001, "from_id": 1, "text": "e"}}})
+                self._cond.notify_all()
+            time.sleep(1 / rate)
+
+    def _reply(self, handler, payload, status=200):
+        body = json.dumps(payload).encode() if payload is not None else b"<html>error</html>"
+        handler.send_response(status)
+        handler.send_header("Content-Length", str(len(body)))
+        handler.end_headers()
+        handler.wfile.write(body)
+
+    def handle(self, handler, query):
+        with self._cond:
+            fault = self.rng.choice(FAULTS) if self.rng.random() < self.fault_rate else None
+            if fault:
+                self.faults.append(time.perf_counter())
+            if fault in ("failed_2", "failed_3"):
+                self._key_version += 1
+                self.key = f"k{self._key_version}"
+                if fault == "failed_3" and self._resync_from is None:
+                    self._resync_from = int(query.get("ts", 0))
+        if fault == "drop":
+            handler.close_connection = True
+            return
+        if fault == "http_500":
+            self._reply(handler, None, status=500)
+            return
+        if fault == "failed_1":
+            self._reply(handler, {"failed": 1, "ts": query.get("ts")})
+            return
+        if fault:
+            self._reply(handler, {"failed": 2 if fault == "failed_2" else 3})
+            return
+        if query.get("key") != self.key:
+            self._reply(handler, {"failed": 2})
+            return
+        ts = int(query["ts"])
+        with self._cond:
+            self._cond.wait_for(lambda: len(self.events) > ts, timeout=float(query.get("wait", 1)))
+            updates = self.events[ts:ts + self.batch]
+        self._reply(handler, {"ts": str(ts + len(updates)), "updates": updates})
+
+    def shutdown(self):
+        self.httpd.shutdown()
+
+def run_baseline(longpoll, handle, stop, sleep):
+    # Прежний цикл main.main
+    while not stop.is_set():
+        try:
+            for event in longpoll.listen():
+                handle(event)
+                if stop.is_set():
+                    return
+        except Exception:
+            time.sleep(sleep)
+
+def run_resilient(longpoll, handle, stop):
+    # Текущий цикл main.main
+    while not stop.is_set():
+        try:
+            for event in longpoll.listen():
+                try:
+                    handle(event)
+                except Exception:
+                    pass
+                if stop.is_set():
+                    return
+        except Exception:
+            time.sleep(longpoll.backoff_delay())
+
+def measure(name, args):
+    server = LongPollStandIn(args.fault_rate, args.batch, args.seed)
+    rng = random.Random(args.seed + 1)
+    deliveries = {}
+    duplicates = 0
+    stop = threading.Event()
+
+    def handle(event):
+        nonlocal duplicates
+        message_id = event.obj["message"]["conversation_message_id"]
+        if message_id in deliveries:
+            duplicates += 1
+        deliveries.setdefault(message_id, time.perf_counter())
+        if rng.random() < args.handler_error_rate:
+            raise RuntimeError("ошибка обработчика")
+
+    if name == "baseline":
+        longpoll = VkBotLongPoll(server, 1, wait=args.wait)
+        target = lambda: run_baseline(longpoll, handle, stop, args.baseline_sleep)
+    else:
+        longpoll = ResilientLongPoll(server, 1, wait=args.wait, persist_ts=False, backoff_base=0.05, backoff_max=2.0)
+        target = lambda: run_resilient(longpoll, handle, stop)
+    threading.Thread(target=target, daemon=True).start()
+    server.produce(args.events, args.rate)
+    deadline = time.perf_counter() + args.drain
+    while time.perf_counter() < deadline and len(deliveries) < args.events - server.protocol_skipped:
+        time.sleep(0.05)
+    stop.set()
+    server.shutdown()
+
+    delivered_times = sorted(deliveries.values())
+    recoveries = []
+    for fault_time in server.faults:
+        later = next((t for t in delivered_times if t > fault_time), None)
+        if later is not None:
+            recoveries.append(later - fault_time)
+    lost = args.events - len(deliveries) - server.protocol_skipped
+    return {"faults": len(server.faults), "lost": lost, "protocol": server.protocol_skipped,
+            "duplicates": duplicates,
+            "recovery_mean": sum(recoveries) / len(recoveries) if recoveries else 0.0,
+            "recovery_max": max(recoveries, default=0.0)}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=3000)
+    parser.add_argument("--rate", type=float, default=300, help="событий в секунду")
+    parser.add_argument("--fault-rate", type=float, default=0.05, help="доля запросов со сбоем")
+    parser.add_argument("--handler-error-rate", type=float, default=0.01)
+    parser.add_argument("--batch", type=int, default=20, help="событий в одном ответе сервера")
+    parser.add_argument("--wait", type=int, default=1)
+    parser.add_argument("--baseline-sleep", type=float, default=3.0)
+    parser.add_argument("--drain", type=float, default=10.0, help="сколько ждать доставки после генерации (с)")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    print(f"{'клиент':<12}{'сбоев':>8}{'не получено':>13}{'по протоколу':>14}{'повторов':>10}"
+          f"{'восст. сред., с':>17}{'восст. макс., с':>17}")
+    for name in ("baseline", "resilient"):
+        result = measure(name, args)
+        print(f"{name:<12}{result['faults']:>8}{result['lost']:>13}{result['protocol']:>14}{result['duplicates']:>10}"
+              f"{result['recovery_mean']:>17.3f}{result['recovery_max']:>17.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Сравнение представлений сессии "Мины": прежнее (двумерный список строк, строка grid_plain,
+список chosen_cells и словарь board_state на каждый ход) и битовые маски
+(маска мин вычисляется по сидам и nonce, см. fairness.mines_mask).
+
+Выводятся память одной сессии (tracemalloc) и время одного хода: проверка мины,
+проверка повторного выбора и построение состояния поля для отрисовки.
+
+Запуск из корня проекта:
+    python -m benchmarks.mines_bitboard [--moves 200000] [--mines 3]
+"""
+import argparse
+import random
+import secrets
+import string
+import time
+import tracemalloc
+from fairness import mines_mask
+from games.mines import BOARD_SIZE, MINE, SAFE, BoardMasks, cell_bit
+
+def legacy_mines_grid(board_size, mine_count):
+    # Прежняя генерация поля: случайные ячейки с повторными попытками при попадании в мину
+    grid = [[SAFE for _ in range(board_size)] for _ in range(board_size)]
+    placed = 0
+    while placed < mine_count:
+        r = random.randint(0, board_size - 1)
+        c = random.randint(0, board_size - 1)
+        if grid[r][c] != MINE:
+            grid[r][c] = MINE
+            placed += 1
+    return grid, ''.join(''.join(row) for row in grid)
+
+def legacy_grid_plain_with_random(grid_plain):
+    # Прежняя строка поля с 10 случайными символами, хранившаяся до раскрытия
+    return f"{grid_plain}|{''.join(random.choices(string.ascii_letters + string.digits, k=10))}"
+
+def legacy_session(mine_count, picks):
+    grid, grid_plain = legacy_mines_grid(BOARD_SIZE, mine_count)
+    return {"grid": grid, "grid_plain": legacy_grid_plain_with_random(grid_plain), "chosen_cells": list(picks)}
+
+def bitboard_session(mine_count, picks):
+    picked = 0
+    for cell in picks:
+        picked |= cell_bit(cell)
+    mines = mines_mask(secrets.token_hex(32), secrets.token_hex(8), 0, BOARD_SIZE, mine_count)
+    return {"mines": mines, "nonce": 0, "picked": picked}
+
+def session_bytes(factory, mine_count, picks, count=1000):
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    sessions = [factory(mine_count, picks) for _ in range(count)]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    size = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    del sessions
+    return size / count
+
+def legacy_move(session, cell):
+    if cell in session["chosen_cells"]:
+        return None
+    row, col = divmod(cell - 1, BOARD_SIZE)
+    if session["grid"][row][col] == MINE:
+        return None
+    board_state = {c: "empty" for c in range(1, BOARD_SIZE * BOARD_SIZE + 1)}
+    for chosen in session["chosen_cells"]:
+        board_state[chosen] = "press"
+    board_state[cell] = "press"
+    return board_state
+
+def bitboard_move(session, cell):
+    bit = cell_bit(cell)
+    if session["picked"] & bit or session["mines"] & bit:
+        return None
+    return BoardMasks(session["picked"] | bit, 0, 0)
+
+def move_time(move, session, cells):
+    started = time.perf_counter()
+    for cell in cells:
+        move(session, cell)
+    return (time.perf_counter() - started) / len(cells)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--moves", type=int, default=200000)
+    parser.add_argument("--mines", type=int, default=3)
+    args = parser.parse_args()
+    picks = [1, 2, 3, 4, 5, 6, 7, 8]
+    cells = [random.randint(1, BOARD_SIZE * BOARD_SIZE) for _ in range(args.moves)]
+
+    print(f"{'представление':<16}{'байт/сессию':>14}{'мкс/ход':>10}")
+    for name, factory, move in (("списки", legacy_session, legacy_move), ("битовые маски", bitboard_session, bitboard_move)):
+        size = session_bytes(factory, args.mines, picks)
+        per_move = move_time(move, factory(args.mines, picks), cells) * 1e6
+        print(f"{name:<16}{size:>14.0f}{per_move:>10.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Замеры профилей кодирования изображений поля "Мины".
+
+Для каждого профиля из mines_visual.OUTPUT_PROFILES выводятся время кодирования и размер файла.
+С флагом --upload изображения дополнительно загружаются в VK (токен берется из config.py)
+и замеряется полная задержка: кодирование + photos.getMessagesUploadServer + загрузка + сохранение.
+
+Запуск из корня проекта:
+    python -m benchmarks.mines_images [--rounds 5] [--upload] [--peer-id 2000000001]
+"""
+import argparse
+import statistics
+import time
+from mines_visual import OUTPUT_PROFILES, compose_field, encode_field
+
+def sample_board(board_size=5):
+    """
+    Типичное раскрытое поле: несколько нажатых ячеек, мины и одна взорванная.
+    """
+    state = {cell: "empty" for cell in range(1, board_size * board_size + 1)}
+    for cell in (7, 11, 13, 19):
+        state[cell] = "press"
+    for cell in (3, 8, 17):
+        state[cell] = "bomb"
+    state[12] = "explosion"
+    return state
+
+def measure_profile(image, profile, rounds, upload=None, peer_id=None):
+    encode_times = []
+    upload_times = []
+    size = 0
+    for _ in range(rounds):
+        started = time.perf_counter()
+        buffer = encode_field(image, profile)
+        encode_times.append(time.perf_counter() - started)
+        size = len(buffer.getbuffer())
+        if upload is not None:
+            upload.photo_messages(buffer, peer_id=peer_id)
+            upload_times.append(time.perf_counter() - started)
+    return {
+        "profile": profile,
+        "bytes": size,
+        "encode_ms": statistics.median(encode_times) * 1000,
+        "upload_ms": statistics.median(upload_times) * 1000 if upload_times else None,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--upload", action="store_true", help="замерять загрузку в VK")
+    parser.add_argument("--peer-id", type=int, default=None)
+    args = parser.parse_args()
+
+    upload = None
+    if args.upload:
+        import vk_api
+        from vk_api import VkUpload
+        from config import CONFIG
+        upload = VkUpload(vk_api.VkApi(token=CONFIG["TOKEN"]).get_api())
+
+    image = compose_field(sample_board(), game_over=True)
+    print(f"{'профиль':<14}{'размер, КБ':>12}{'кодирование, мс':>18}{'с загрузкой, мс':>18}")
+    for profile in OUTPUT_PROFILES:
+        try:
+            result = measure_profile(image, profile, args.rounds, upload, args.peer_id)
+        except Exception as e:
+            print(f"{profile:<14} ошибка: {e}")
+            continue
+        upload_ms = f"{result['upload_ms']:.1f}" if result["upload_ms"] is not None else "-"
+        print(f"{profile:<14}{result['bytes'] / 1024:>12.1f}{result['encode_ms']:>18.1f}{upload_ms:>18}")
+
+if __name__ == "__main__":
+    main()
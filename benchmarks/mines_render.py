@@ -0,0 +1,61 @@
+"""
+Пропускная способность рендера поля "Мины": PIL (mines_visual.compose_field)
+против векторного компоновщика (mines_visual_numpy.compose_field_fast), в полях в секунду.
+
+Перед замером на случайных полях проверяется попиксельное совпадение двух рендеров;
+при расхождении скрипт завершается с ошибкой.
+
+Запуск из корня проекта:
+    python -m benchmarks.mines_render [--boards 50] [--board-size 5] [--check 20]
+"""
+import argparse
+import random
+import sys
+import time
+import numpy as np
+from mines_visual import CELL_STATUSES, compose_field
+from mines_visual_numpy import compose_field_fast
+
+def random_board(board_size, rng):
+    return {cell: rng.choice(CELL_STATUSES) for cell in range(1, board_size * board_size + 1) if rng.random() < 0.6}
+
+def check_identical(board_size, count, rng):
+    """
+    Возвращает количество полей, на которых рендеры разошлись.
+    """
+    mismatches = 0
+    for _ in range(count):
+        state = random_board(board_size, rng)
+        game_over = rng.random() < 0.5
+        reference = np.asarray(compose_field(state, board_size=board_size, game_over=game_over))
+        vectorized = np.asarray(compose_field_fast(state, board_size=board_size, game_over=game_over))
+        if not np.array_equal(reference, vectorized):
+            mismatches += 1
+    return mismatches
+
+def boards_per_second(render, boards, board_size):
+    render(boards[0], board_size=board_size, game_over=True)  # прогрев кэша изображений
+    started = time.perf_counter()
+    for state in boards:
+        render(state, board_size=board_size, game_over=True)
+    return len(boards) / (time.perf_counter() - started)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--boards", type=int, default=50)
+    parser.add_argument("--board-size", type=int, default=5)
+    parser.add_argument("--check", type=int, default=20, help="число случайных полей для сверки")
+    args = parser.parse_args()
+    rng = random.Random(0)
+
+    mismatches = check_identical(args.board_size, args.check, rng)
+    print(f"Сверка рендеров: {args.check - mismatches}/{args.check} полей совпадают попиксельно")
+    if mismatches:
+        sys.exit(1)
+
+    boards = [random_board(args.board_size, rng) for _ in range(args.boards)]
+    for name, render in (("PIL paste", compose_field), ("NumPy", compose_field_fast)):
+        print(f"{name:<10}{boards_per_second(render, boards, args.board_size):>10.1f} полей/с")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Стоимость пассивного дохода (passive_income.py) при --players простаивающих игроках.
+
+  - фоновая работа: процессорное время процесса за --idle секунд простоя с загруженными
+    игроками (ленивое начисление не обходит игроков) против одного обхода всех игроков,
+    который понадобился бы при периодическом начислении;
+  - начисление при обращении игрока: время settle_passive_income на одного игрока;
+  - смена ставки: доход игрока, простоявшего через смену, совпадает с расчетом по участкам;
+  - перезапуск: после начисления player_data.json не сохраняется (сбой), журнал
+    восстанавливает отметку last_bonus, и повторного начисления нет.
+
+Работает во временном каталоге, рабочие файлы бота не затрагиваются.
+
+Запуск из корня проекта:
+    python -m benchmarks.passive_income [--players 1000000] [--idle 5] [--reads 100000]
+"""
+import argparse
+import copy
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+import ledger
+import passive_income
+
+HOUR = 3600
+
+def sweep(player_data, now):
+    # Периодическое начисление: на каждом шаге пересчитывается доход всех игроков
+    return sum(passive_income.pending_income(player, now)[0] for player in player_data.values())
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--players", type=int, default=1_000_000)
+    parser.add_argument("--idle", type=float, default=5.0, help="секунд простоя")
+    parser.add_argument("--reads", type=int, default=100_000, help="обращений игроков")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    os.chdir(tempfile.mkdtemp(prefix="passive_bench_"))
+    now = time.time()
+    change = now - 6 * HOUR
+    # Ставка 2 Glitch в час, за 6 часов до запуска изменена на 5
+    passive_income.load_schedule([[datetime.fromtimestamp(now - 1000 * HOUR).isoformat(), 2],
+                                  [datetime.fromtimestamp(change).isoformat(), 5]])
+    player_data = {str(user_id): {"balance": 0, "last_bonus": now - rng.uniform(0, 20 * HOUR)}
+                   for user_id in range(1, args.players + 1)}
+    ledger.CHECKPOINT_EVERY = ledger.MAX_BATCH = 10 ** 9
+    ledger.init_ledger(player_data)
+    threads = threading.active_count()
+
+    cpu = time.process_time()
+    time.sleep(args.idle)
+    idle_cpu = time.process_time() - cpu
+    started = time.perf_counter()
+    sweep(player_data, now)
+    sweep_time = time.perf_counter() - started
+    print(f"{args.players} игроков, простой {args.idle:.0f} с: процессорное время {idle_cpu * 1000:.1f} мс, "
+          f"потоков {threading.active_count()} (журнал и основной); "
+          f"один обход всех игроков занял бы {sweep_time:.2f} с")
+
+    readers = [str(rng.randint(1, args.players)) for _ in range(args.reads)]
+    started = time.perf_counter()
+    for user_id in readers:
+        passive_income.settle_passive_income(user_id, player_data, now)
+    elapsed = time.perf_counter() - started
+    print(f"Начисление при обращении: {elapsed / args.reads * 1e6:.1f} мкс на игрока, "
+          f"зачислено {passive_income.passive_stats['credited']} Glitch⚡ "
+          f"в {passive_income.passive_stats['settled']} записях")
+
+    # Игрок простоял 10 часов: 4 часа по 2 и 6 часов по 5 Glitch в час
+    player_data["crossing"] = {"balance": 0, "last_bonus": change - 4 * HOUR}
+    credited = passive_income.settle_passive_income("crossing", player_data, now)
+    print(f"Простой через смену ставки: зачислено {credited}, ожидалось {4 * 2 + 6 * 5}")
+
+    # Перезапуск: сохраненная до начисления копия player_data и журнал с начислением
+    player_data["restart"] = {"balance": 0, "last_bonus": now - 3 * HOUR}
+    saved = copy.deepcopy(player_data["restart"])
+    first = passive_income.settle_passive_income("restart", player_data, now)
+    ledger.flush()
+    restored = {"restart": saved}
+    ledger._initialized = False
+    ledger._versions.clear()
+    ledger.init_ledger(restored)
+    second = passive_income.settle_passive_income("restart", restored, now)
+    print(f"Перезапуск: зачислено {first}, после восстановления баланс {restored['restart']['balance']}, "
+          f"повторно зачислено {second}")
+    if threading.active_count() != threads or credited != 38 or first != 15 or second != 0:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
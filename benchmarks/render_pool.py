@@ -0,0 +1,59 @@
+"""
+Масштабирование пула отрисовки: рендеров в секунду при числе процессов от 1 до N.
+
+Для каждого числа процессов в пул одновременно отправляется --jobs заданий
+(раскрытое поле 5x5 в выбранном профиле), замеряется время до получения всех изображений
+в потоке результатов и время, которое submit занимает поток, ставящий задания
+(в боте — поток обработки событий).
+
+Запуск из корня проекта:
+    python -m benchmarks.render_pool [--max-workers 4] [--jobs 64] [--profile png]
+"""
+import argparse
+import os
+import threading
+import time
+from benchmarks.mines_images import sample_board
+from render_pool import RenderPool
+
+def run_jobs(pool, count, profile):
+    """
+    Ставит count заданий и ждет все изображения. Возвращает время submit на задание.
+    """
+    done = threading.Semaphore(0)
+    submit_time = 0.0
+    for _ in range(count):
+        started = time.perf_counter()
+        pool.submit(sample_board(), lambda image: done.release(), game_over=True, profile=profile)
+        submit_time += time.perf_counter() - started
+    for _ in range(count):
+        done.acquire()
+    return submit_time / count
+
+def renders_per_second(workers, jobs, profile):
+    pool = RenderPool(workers, max_pending=jobs, timeout=60)
+    try:
+        # Прогрев: запуск процессов и загрузка изображений ячеек в каждом из них
+        run_jobs(pool, workers, profile)
+        started = time.perf_counter()
+        submit_time = run_jobs(pool, jobs, profile)
+        return jobs / (time.perf_counter() - started), submit_time
+    finally:
+        pool.shutdown()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--jobs", type=int, default=64)
+    parser.add_argument("--profile", default="png")
+    args = parser.parse_args()
+
+    baseline = None
+    print(f"{'процессов':<10}{'рендеров/с':>12}{'ускорение':>12}{'submit, мкс':>14}")
+    for workers in range(1, args.max_workers + 1):
+        rate, submit_time = renders_per_second(workers, args.jobs, args.profile)
+        baseline = baseline or rate
+        print(f"{workers:<10}{rate:>12.1f}{rate / baseline:>11.2f}x{submit_time * 1e6:>14.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Скорость определения получателя перевода (games.transfers.parse_recipient).
+
+Для player_data из --players игроков со случайными именами (в основном из двух слов)
+разбираются сообщения вида "перевод vk.com/id123 100", "перевод [id123|Имя] 100",
+"перевод @имя фамилия 100", "перевод @\"Имя Фамилия\" 100" и "перевод vk.com/screen_name 100"
+(короткие имена берутся из заранее заполненного кэша, запросов к VK нет). Отдельно
+проверяется, что "@Имя Фамилия 100" без кавычек находит именно этого игрока, а поиск
+по индексу имен сравнивается с перебором имен всех игроков.
+
+Запуск из корня проекта:
+    python -m benchmarks.transfers_parse [--players 100000] [--messages 200000]
+"""
+import argparse
+import random
+import time
+import types
+import name_index
+from games.transfers import parse_recipient
+
+LETTERS = "абвгдежзиклмнопрстуфхцчшщэюя"
+
+def random_word(rng):
+    return "".join(rng.choice(LETTERS) for _ in range(rng.randint(5, 10))).capitalize()
+
+def random_players(count, rng):
+    # Как в VK ("Имя Фамилия"), у большинства игроков имя из двух слов
+    players = {}
+    for user_id in range(1, count + 1):
+        name = random_word(rng) if user_id % 4 == 0 else f"{random_word(rng)} {random_word(rng)}"
+        players[str(user_id)] = {"name": name, "balance": 0}
+    return players
+
+def sample_messages(players, count, rng):
+    ids = list(players)
+    messages = []
+    for index in range(count):
+        user_id = rng.choice(ids)
+        kind = index % 5
+        if kind == 0:
+            messages.append(f"перевод vk.com/id{user_id} 100")
+        elif kind == 1:
+            messages.append(f"перевод [id{user_id}|{players[user_id]['name']}] 100")
+        elif kind == 2:
+            messages.append(f"перевод @{players[user_id]['name'].lower()} 100")
+        elif kind == 3:
+            messages.append(f'перевод @"{players[user_id]["name"]}" 100')
+        else:
+            messages.append(f"перевод vk.com/user{user_id} 100")
+    return messages
+
+def at_name_accuracy(players, count, rng):
+    """
+    Доля сообщений "@Имя Фамилия 100" (без кавычек), в которых найден именно этот игрок.
+    """
+    multiword = [user_id for user_id, player in players.items() if " " in player["name"]]
+    event = types.SimpleNamespace(obj=types.SimpleNamespace(message={}))
+    hits = 0
+    for _ in range(count):
+        user_id = rng.choice(multiword)
+        hits += parse_recipient(f"перевод @{players[user_id]['name']} 100", event) == user_id
+    return hits / count
+
+def linear_find(players, name):
+    lowered = name.lower()
+    found = [user_id for user_id, player in players.items() if player["name"].lower().startswith(lowered)]
+    return found[0] if len(found) == 1 else None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--players", type=int, default=100_000)
+    parser.add_argument("--messages", type=int, default=200_000)
+    parser.add_argument("--linear-lookups", type=int, default=200, help="поисков перебором для сравнения")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    players = random_players(args.players, rng)
+    started = time.perf_counter()
+    name_index.build_name_index(players)
+    print(f"Индекс по {args.players} именам построен за {time.perf_counter() - started:.2f} с")
+    expires_at = time.monotonic() + 3600
+    for user_id in players:
+        name_index._screen_names[f"user{user_id}"] = ("user", user_id, expires_at)
+
+    event = types.SimpleNamespace(obj=types.SimpleNamespace(message={}))
+    messages = sample_messages(players, args.messages, rng)
+    started = time.perf_counter()
+    resolved = sum(1 for text in messages if parse_recipient(text, event) is not None)
+    elapsed = time.perf_counter() - started
+    print(f"parse_recipient: {args.messages / elapsed:,.0f} сообщений/с "
+          f"({elapsed / args.messages * 1e6:.2f} мкс на сообщение), найдено {resolved}")
+
+    print(f"@Имя Фамилия без кавычек: найден нужный игрок в {at_name_accuracy(players, 10_000, rng):.1%} сообщений")
+
+    names = [players[rng.choice(list(players))]["name"] for _ in range(args.linear_lookups)]
+    started = time.perf_counter()
+    for name in names:
+        name_index.find_player(name)
+    index_time = (time.perf_counter() - started) / len(names)
+    started = time.perf_counter()
+    for name in names:
+        linear_find(players, name)
+    linear_time = (time.perf_counter() - started) / len(names)
+    print(f"@ник: индекс {index_time * 1e6:.2f} мкс, перебор {linear_time * 1e6:.0f} мкс "
+          f"(в {linear_time / index_time:.0f} раз медленнее)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+import atexit
+import logging
+import random
+import threading
+import time
+from collections import OrderedDict
+from ledger import record_farm_rewards
+from config import CONFIG
+
+# Token bucket на пользователя: CLICK_BURST кликов подряд, дальше CLICK_RATE кликов в секунду
+CLICK_RATE = CONFIG.get("CLICK_RATE", 1.0)
+CLICK_BURST = CONFIG.get("CLICK_BURST", 5)
+# Награды за принятые клики копятся в памяти и зачисляются одной транзакцией раз в интервал (с)
+CREDIT_INTERVAL = CONFIG.get("CLICK_CREDIT_INTERVAL", 5.0)
+MIN_REWARD, MAX_REWARD = 5, 17
+
+# user_id -> [токены, время последнего обновления, отказ уже показан] в порядке последнего клика.
+# Через CLICK_BURST / CLICK_RATE секунд без кликов ведро заново полное, и запись не нужна:
+# она вытесняется, поэтому память пропорциональна числу активных пользователей.
+_buckets = OrderedDict()
+# user_id -> сумма принятых, но еще не зачисленных наград
+_pending = {}
+_lock = threading.Lock()
+_player_data = None
+_flusher = None
+click_stats = {"accepted": 0, "throttled": 0, "credits": 0, "evicted": 0}
+
+def _evict_idle(now):
+    idle_after = CLICK_BURST / CLICK_RATE
+    while _buckets:
+        user_id, bucket = next(iter(_buckets.items()))
+        if now - bucket[1] < idle_after:
+            break
+        _buckets.popitem(last=False)
+        click_stats["evicted"] += 1
+
+def take_click(user_id, now=None):
+    """
+    Расходует токен клика. Возвращает (True, 0), если клик принят, иначе
+    (False, секунд до следующего токена).
+    """
+    now = time.monotonic() if now is None else now
+    key = str(user_id)
+    with _lock:
+        _evict_idle(now)
+        bucket = _buckets.pop(key, None) or [CLICK_BURST, now, False]
+        bucket[0] = min(CLICK_BURST, bucket[0] + (now - bucket[1]) * CLICK_RATE)
+        bucket[1] = now
+        _buckets[key] = bucket
+        if bucket[0] >= 1:
+            bucket[0] -= 1
+            bucket[2] = False
+            click_stats["accepted"] += 1
+            return True, 0
+        click_stats["throttled"] += 1
+        return False, (1 - bucket[0]) / CLICK_RATE
+
+def throttle_notice_due(user_id):
+    """
+    True один раз на серию отказов: о лимите сообщается только после первого отказа.
+    """
+    with _lock:
+        bucket = _buckets.get(str(user_id))
+        if bucket is None or bucket[2]:
+            return False
+        bucket[2] = True
+        return True
+
+def add_pending(user_id, amount):
+    with _lock:
+        _pending[str(user_id)] = _pending.get(str(user_id), 0) + amount
+
+def pending_credit(user_id):
+    """
+    Награды пользователя, которые еще не зачислены на баланс.
+    """
+    with _lock:
+        return _pending.get(str(user_id), 0)
+
+def display_balance(user_id, player_data):
+    """
+    Баланс для показа игроку: зачисленный баланс плюс ожидающие награды за клики.
+    """
+    return player_data.get(str(user_id), {}).get("balance", 0) + pending_credit(user_id)
+
+def farm_click(user_id, player_data):
+    """
+    Клик "майнинга": при наличии токена начисляет награду (в ожидающие) и возвращает
+    (награда, None); при превышении лимита — (None, секунд до следующего клика).
+    """
+    _ensure_flusher(player_data)
+    accepted, retry_after = take_click(user_id)
+    if not accepted:
+        return None, retry_after
+    earned = random.randint(MIN_REWARD, MAX_REWARD)
+    add_pending(user_id, earned)
+    return earned, None
+
+def credit_pending():
+    """
+    Зачисляет накопленные награды всех пользователей одной транзакцией журнала.
+    """
+    with _lock:
+        credits = dict(_pending)
+        _pending.clear()
+    if not credits or _player_data is None:
+        return 0
+    try:
+        record_farm_rewards(_player_data, credits)
+    except Exception as e:
+        logging.error(f"Не удалось зачислить награды за клики: {e}")
+        with _lock:
+            for user_id, amount in credits.items():
+                _pending[user_id] = _pending.get(user_id, 0) + amount
+        return 0
+    click_stats["credits"] += 1
+    return len(credits)
+
+def _credit_loop():
+    while True:
+        time.sleep(CREDIT_INTERVAL)
+        credit_pending()
+
+def _ensure_flusher(player_data):
+    global _player_data, _flusher
+    _player_data = player_data
+    if _flusher is None:
+        _flusher = threading.Thread(target=_credit_loop, name="click-credits", daemon=True)
+        _flusher.start()
+        atexit.register(credit_pending)
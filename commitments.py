@@ -0,0 +1,203 @@
+"""
+Общие коммитменты сидов сервера за период (сутки) в виде дерева Меркла.
+
+Сиды сервера, которые бот выдает игрокам за период, определяются заранее: при открытии
+периода создается секрет периода, сид с номером j — HMAC-SHA256(секрет, j), и по хешам
+всех SEEDS_PER_PERIOD сидов строится дерево Меркла. Корень публикуется сразу при открытии
+периода, до первого раунда на его сидах. Новая пара сидов игрока (fairness) получает
+следующий по номеру сид, поэтому бот не может подобрать сид сервера под сид клиента,
+который игрок передает в «сменить сид».
+
+Раунды ничего не добавляют в коммитменты: исход раунда проверяется по раскрытому сиду
+(fairness), а сам сид — по его хешу, номеру и O(log n) соседним хешам на пути к корню:
+
+    лист  = SHA-256(0x00 || хеш сида сервера),  узел = SHA-256(0x01 || левый || правый)
+
+Непарный последний узел уровня переносится на следующий уровень без изменений.
+Секреты периодов хранятся в commitment_secrets.json и не публикуются: по ним можно
+вычислить нераскрытые сиды. Если сиды периода закончились, выдается случайный сид
+без коммитмента (номер None).
+Проверка без бота:
+    python commitments.py verify <хеш сида сервера> <корень> <L:хеш|R:хеш> ...
+"""
+import functools
+import hashlib
+import hmac
+import logging
+import re
+import secrets
+import sys
+import threading
+from datetime import date
+from data_manager import load_commitment_roots, load_commitment_secrets, save_commitment_roots, save_commitment_secrets
+
+PERIOD_PATTERN = re.compile(r"\d{4}-\d{2}-\d{2}", re.ASCII)
+# Сидов на период: новые игроки и смены сидов за сутки. Дерево строится при открытии
+# периода (~50 тыс. хешей) и при запросе пути для сида прошлого периода
+SEEDS_PER_PERIOD = 16384
+
+_lock = threading.Lock()
+_period = None
+_secrets = None
+_roots = None
+
+def current_period():
+    return str(date.today())
+
+def is_period(period):
+    """
+    True, если period — дата вида ГГГГ-ММ-ДД. Период приходит от игрока, поэтому все
+    остальное отвергается.
+    """
+    if not PERIOD_PATTERN.fullmatch(period):
+        return False
+    try:
+        date.fromisoformat(period)
+    except ValueError:
+        return False
+    return True
+
+def leaf_hash(leaf):
+    return hashlib.sha256(b"\x00" + leaf.encode("utf-8")).digest()
+
+def node_hash(left, right):
+    return hashlib.sha256(b"\x01" + left + right).digest()
+
+def build_levels(leaves):
+    """
+    Уровни дерева Меркла от листьев к корню (списки хешей в байтах).
+    """
+    levels = [list(leaves)]
+    while len(levels[-1]) > 1:
+        level = levels[-1]
+        parents = [node_hash(level[i], level[i + 1]) for i in range(0, len(level) - 1, 2)]
+        if len(level) % 2:
+            parents.append(level[-1])
+        levels.append(parents)
+    return levels
+
+def merkle_proof(levels, index):
+    """
+    Путь от листа index к корню: список строк "L:хеш" / "R:хеш" — соседний узел
+    и сторона, с которой он стоит. Уровни, где узел перенесен без пары, пропускаются.
+    """
+    proof = []
+    for level in levels[:-1]:
+        sibling = index ^ 1
+        if sibling < len(level):
+            proof.append(f"{'L' if sibling < index else 'R'}:{level[sibling].hex()}")
+        index //= 2
+    return proof
+
+def verify_proof(leaf, proof, root):
+    """
+    Проверяет, что лист (хеш сида сервера) входит в дерево с корнем root (hex).
+    """
+    node = leaf_hash(leaf)
+    for step in proof:
+        side, sibling = step.split(":", 1)
+        sibling = bytes.fromhex(sibling)
+        node = node_hash(sibling, node) if side == "L" else node_hash(node, sibling)
+    return node.hex() == root
+
+def period_seed(secret, index):
+    """
+    Сид сервера с номером index периода с секретом secret (hex).
+    """
+    return hmac.new(bytes.fromhex(secret), str(index).encode("utf-8"), hashlib.sha256).hexdigest()
+
+def seed_hash(server_seed):
+    # То же, что fairness.hash_server_seed: публикуемый хеш сида
+    return hashlib.sha256(server_seed.encode("utf-8")).hexdigest()
+
+@functools.lru_cache(maxsize=2)
+def _period_levels(secret):
+    return build_levels([leaf_hash(seed_hash(period_seed(secret, index))) for index in range(SEEDS_PER_PERIOD)])
+
+def _open_period():
+    """
+    Переходит к текущему периоду. Секрет нового периода сохраняется раньше корня,
+    корень публикуется до выдачи первого сида периода.
+    """
+    global _period, _secrets, _roots
+    period = current_period()
+    if period == _period:
+        return
+    if _secrets is None:
+        _secrets, _roots = load_commitment_secrets(), load_commitment_roots()
+    if period not in _secrets:
+        _secrets[period] = {"secret": secrets.token_hex(32), "next": 0}
+        save_commitment_secrets(_secrets)
+    if period not in _roots:
+        root = _period_levels(_secrets[period]["secret"])[-1][0].hex()
+        _roots[period] = {"root": root, "count": SEEDS_PER_PERIOD}
+        save_commitment_roots(_roots)
+        logging.info(f"Опубликован корень сидов сервера за {period}: {root} ({SEEDS_PER_PERIOD} сидов)")
+    _period = period
+
+def allocate_server_seed():
+    """
+    Следующий сид сервера текущего периода: (сид, номер "период#j").
+    Если сиды периода закончились — (случайный сид, None).
+    """
+    with _lock:
+        _open_period()
+        entry = _secrets[_period]
+        index = entry["next"]
+        if index >= SEEDS_PER_PERIOD:
+            logging.warning(f"Сиды сервера за {_period} закончились, выдан сид без коммитмента")
+            return secrets.token_hex(32), None
+        entry["next"] = index + 1
+        # Номер сохраняется до выдачи сида: после перезапуска тот же сид не будет выдан повторно
+        save_commitment_secrets(_secrets)
+        return period_seed(entry["secret"], index), f"{_period}#{index}"
+
+def get_root(period):
+    """
+    Опубликованный корень периода {"root", "count"} или None, если период еще не открыт.
+    """
+    if not is_period(period):
+        return None
+    with _lock:
+        _open_period()
+        return _roots.get(period)
+
+def latest_root():
+    """
+    Корень последнего открытого периода: (период, {"root", "count"}).
+    """
+    with _lock:
+        _open_period()
+        period = max(_roots)
+        return period, _roots[period]
+
+def seed_proof(seed_id):
+    """
+    Данные для проверки сида "период#номер": {"server_seed_hash", "proof", "root"}.
+    Возвращает None для неизвестного или еще не выданного сида.
+    """
+    period, _, index = seed_id.partition("#")
+    if not index.isdigit() or not is_period(period):
+        return None
+    index = int(index)
+    with _lock:
+        _open_period()
+        entry = _secrets.get(period)
+        root = _roots.get(period)
+        if entry is None or root is None or index >= entry["next"]:
+            return None
+        secret = entry["secret"]
+    levels = _period_levels(secret)
+    return {"server_seed_hash": seed_hash(period_seed(secret, index)), "proof": merkle_proof(levels, index),
+            "root": root["root"]}
+
+def _main(argv):
+    if len(argv) >= 3 and argv[0] == "verify":
+        ok = verify_proof(argv[1], argv[3:], argv[2])
+        print("Сид входит в дерево с этим корнем." if ok else "Проверка не пройдена.")
+        return 0 if ok else 1
+    print(__doc__)
+    return 1
+
+if __name__ == "__main__":
+    sys.exit(_main(sys.argv[1:]))
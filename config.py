@@ -3,5 +3,48 @@ CONFIG = {
     "TOKEN": "vk1.a._SP5OUlvD_LXJUSUNLDJ1iMshFE0AjDB0KSEyunOa6YQ-G4COXgbOJILRdrT2_wpENsLURe3bm7vL1jqHYGA_jz51s4XzyvcZ64xi51ts4qngcguLEl2cdWhx16aNKMyUInSIErQcpDUd5k_6Gw2W_XIcrJ_XXqwsX83IuSQ2XQjoFCr0QNnL1q_BtetL9xwCth7sK8Nez9s7IgyKivOwA",
     "GROUP_ID": "229419604",
     "OWNER_ID": "376393143",
-    "CHAT_LINK": "https://vk.me/join/AZQ1d66tZw28wXUTALs1I6fc"
+    "CHAT_LINK": "https://vk.me/join/AZQ1d66tZw28wXUTALs1I6fc",
+    # Профиль кодирования изображений поля "Мины" (см. mines_visual.OUTPUT_PROFILES)
+    "MINES_IMAGE_PROFILE": "png",
+    # Число процессов для отрисовки изображений (0 — рисовать в потоке обработки событий)
+    # и время (с), после которого изображение рисуется без пула
+    "RENDER_WORKERS": 2,
+    "RENDER_TIMEOUT": 5.0,
+    # Бюджет задержки (с) на изображение поля "Мины" и длина очереди пула отрисовки
+    # или фоновой догрузки итоговых полей, после которых ходы отвечаются текстовым полем
+    "MINES_LATENCY_BUDGET": 2.0,
+    "MINES_FALLBACK_QUEUE": 4,
+    # "Орел-Решка" в групповых чатах: ставки всех игроков чата собираются в течение окна (с)
+    # и разыгрываются одним результатом (False — отдельная игра на каждую ставку)
+    "COINFLIP_CHAT_ROUNDS": True,
+    "COINFLIP_ROUND_WINDOW": 15,
+    # Интервал (с), с которым журнал балансов дописывается на диск одной пачкой
+    "LEDGER_FLUSH_INTERVAL": 1.0,
+    # Окно (с), в течение которого повторно доставленные события отбрасываются
+    "EVENT_DEDUP_WINDOW": 3600.0,
+    # Сколько раз повторять отправку сообщения при временной ошибке VK и начальная пауза (с)
+    "SEND_RETRY_ATTEMPTS": 3,
+    "SEND_RETRY_BACKOFF": 0.25,
+    # Сколько секунд всего можно ждать между повторами одного сообщения: паузы идут
+    # в потоке обработки событий и задерживают остальных игроков
+    "SEND_RETRY_MAX_WAIT": 2.0,
+    # Начальная и максимальная пауза (с) перед переподключением к Long Poll серверу
+    "LONGPOLL_BACKOFF_BASE": 1.0,
+    "LONGPOLL_BACKOFF_MAX": 60.0,
+    # Сколько секунд хранить имя пользователя, полученное через users.get
+    "NAME_CACHE_TTL": 86400,
+    # Сколько запросов messages.send в секунду тратить на уведомления о раздаче
+    "AIRDROP_NOTIFY_RATE": 5,
+    # Лимит кликов "майнинга": кликов в секунду и сколько кликов можно сделать подряд
+    "CLICK_RATE": 1.0,
+    "CLICK_BURST": 5,
+    # Интервал (с), с которым награды за клики зачисляются на балансы одной транзакцией
+    "CLICK_CREDIT_INTERVAL": 5.0,
+    # Пассивный доход: [дата начала, Glitch в час], ставка действует до следующей даты.
+    # Для смены ставки добавляйте новую строку, прежние не меняйте
+    "PASSIVE_INCOME_SCHEDULE": [["2026-10-19T00:00:00", 2]],
+    # Сколько часов без активности игрока копится пассивный доход
+    "PASSIVE_INCOME_MAX_HOURS": 24,
+    # Сколько секунд хранить состав и администраторов беседы из messages.getConversationMembers
+    "CONVERSATION_CACHE_TTL": 600
 }
\ No newline at end of file
@@ -0,0 +1,128 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from vk_api.exceptions import ApiError
+from config import CONFIG
+
+# Сведения о беседах (участники, администраторы, права бота) из messages.getConversationMembers.
+# Хранятся CONVERSATION_CACHE_TTL секунд и обновляются по служебным сообщениям беседы:
+# приглашение и исключение участника меняют состав без запроса к VK, а приглашение
+# или исключение самого бота сбрасывает запись целиком. О смене администраторов VK
+# событий не присылает — ее учитывает только истечение срока записи.
+CONVERSATION_TTL = CONFIG.get("CONVERSATION_CACHE_TTL", 600)
+# Пока у бота нет прав администратора, состав беседы VK не отдает; такой ответ хранится
+# недолго, чтобы выданные права заметились при следующей команде
+NO_ACCESS_TTL = 15
+MAX_CACHED_CONVERSATIONS = 10000
+# messages.getConversationMembers отдает не больше 200 участников за запрос
+PAGE_SIZE = 200
+NO_ACCESS_ERROR = 917
+BOT_MEMBER_ID = -int(CONFIG["GROUP_ID"])
+
+INVITE_ACTIONS = ("chat_invite_user", "chat_invite_user_by_link")
+KICK_ACTION = "chat_kick_user"
+
+# peer_id -> {"members": set, "admins": set, "bot_is_admin": bool, "expires": время устаревания}
+# в порядке последнего использования
+_cache = OrderedDict()
+_lock = threading.Lock()
+conversation_stats = {"lookups": 0, "cache_hits": 0, "api_calls": 0, "errors": 0, "invalidated": 0, "updated": 0}
+
+def fetch_conversation(vk, peer_id):
+    """
+    Запрашивает состав беседы постранично. Возвращает запись кэша без срока действия.
+    """
+    members, admins, offset = set(), set(), 0
+    while True:
+        conversation_stats["api_calls"] += 1
+        response = vk.messages.getConversationMembers(peer_id=peer_id, offset=offset, count=PAGE_SIZE)
+        items = response.get("items", [])
+        for item in items:
+            members.add(item["member_id"])
+            if item.get("is_admin") or item.get("is_owner"):
+                admins.add(item["member_id"])
+        offset += len(items)
+        if not items or offset >= response.get("count", 0):
+            break
+    return {"members": members, "admins": admins, "bot_is_admin": BOT_MEMBER_ID in admins}
+
+def cached_conversation(peer_id):
+    """
+    Запись кэша или None, если ее нет или она устарела. Запросов к VK не делает.
+    """
+    with _lock:
+        entry = _cache.get(peer_id)
+        if entry is None or entry["expires"] < time.monotonic():
+            return None
+        _cache.move_to_end(peer_id)
+        return entry
+
+def _store(peer_id, entry, ttl):
+    entry["expires"] = time.monotonic() + ttl
+    with _lock:
+        _cache[peer_id] = entry
+        _cache.move_to_end(peer_id)
+        while len(_cache) > MAX_CACHED_CONVERSATIONS:
+            _cache.popitem(last=False)
+    return entry
+
+def get_conversation(peer_id, vk):
+    """
+    Сведения о беседе из кэша, при отсутствии — из VK. Если бот не администратор,
+    возвращается запись без участников с bot_is_admin=False. При временной ошибке VK
+    возвращается устаревшая запись, если она есть, иначе None.
+    """
+    conversation_stats["lookups"] += 1
+    entry = cached_conversation(peer_id)
+    if entry is not None:
+        conversation_stats["cache_hits"] += 1
+        return entry
+    try:
+        return _store(peer_id, fetch_conversation(vk, peer_id), CONVERSATION_TTL)
+    except ApiError as e:
+        if e.code == NO_ACCESS_ERROR:
+            return _store(peer_id, {"members": set(), "admins": set(), "bot_is_admin": False}, NO_ACCESS_TTL)
+        error = e
+    except Exception as e:
+        error = e
+    conversation_stats["errors"] += 1
+    logging.error(f"Не удалось получить участников беседы {peer_id}: {error}")
+    with _lock:
+        return _cache.get(peer_id)
+
+def bot_is_admin(peer_id, vk):
+    entry = get_conversation(peer_id, vk)
+    return entry is not None and entry["bot_is_admin"]
+
+def invalidate(peer_id):
+    with _lock:
+        if _cache.pop(peer_id, None) is not None:
+            conversation_stats["invalidated"] += 1
+
+def apply_chat_action(peer_id, action, from_id=None):
+    """
+    Учитывает служебное сообщение беседы (message["action"]): приглашенный участник
+    добавляется в состав, исключенный — удаляется. Если приглашен или исключен
+    сам бот, запись сбрасывается. Возвращает True, если действие меняет состав беседы.
+    """
+    action_type = action.get("type")
+    if action_type not in INVITE_ACTIONS and action_type != KICK_ACTION:
+        return False
+    member_id = action.get("member_id", from_id)
+    if member_id is None or int(member_id) == BOT_MEMBER_ID:
+        invalidate(peer_id)
+        return True
+    member_id = int(member_id)
+    with _lock:
+        entry = _cache.get(peer_id)
+        # Без прав администратора состав беседы неизвестен, дополнять его нечем
+        if entry is None or not entry["bot_is_admin"]:
+            return True
+        if action_type == KICK_ACTION:
+            entry["members"].discard(member_id)
+            entry["admins"].discard(member_id)
+        else:
+            entry["members"].add(member_id)
+        conversation_stats["updated"] += 1
+    return True
@@ -1,10 +1,27 @@
 import json
+import os
+import threading
 from datetime import datetime
 
 # Файлы баз данных
 PLAYER_DATA_FILE = "player_data.json"
 GAMES_FILE = "games.json"
 TOP_DATA_FILE = "data.json"
+PHOTO_CACHE_FILE = "photo_cache.log"
+SEEDS_FILE = "seeds.json"
+SEEDS_LOG_FILE = "seeds.log"
+COMMITMENT_ROOTS_FILE = "commitment_roots.json"
+COMMITMENT_SECRETS_FILE = "commitment_secrets.json"
+LEDGER_FILE = "ledger.log"
+LEDGER_CHECKPOINT_FILE = "ledger_checkpoint.json"
+LONGPOLL_STATE_FILE = "longpoll_state.json"
+DELIVERY_STATE_FILE = "delivery_state.json"
+
+# Данные игроков меняет поток обработки событий; фоновые задачи, которые тоже их меняют
+# или читают целиком (итоги раундов чата по таймеру, контрольная точка журнала балансов),
+# выполняются под этой блокировкой, как и обработка событий. Блокировка повторно входимая:
+# журнал балансов берет ее и при записи пачки из обработчика события.
+player_data_lock = threading.RLock()
 
 def load_player_data():
     try:
@@ -13,14 +30,31 @@ def load_player_data():
     except FileNotFoundError:
         return {}
 
+# player_data.json пишут поток обработки событий и фоновая запись журнала балансов
+# (контрольная точка пишет снимок без player_data_lock). Запись идет через временный файл
+# под _player_data_file_lock; внутри нее другие блокировки не берутся.
+_player_data_file_lock = threading.Lock()
+
 def save_player_data(data):
-    with open(PLAYER_DATA_FILE, "w") as f:
-        json.dump(data, f, indent=4, ensure_ascii=False)
+    tmp_path = PLAYER_DATA_FILE + ".tmp"
+    with _player_data_file_lock:
+        with open(tmp_path, "w") as f:
+            json.dump(data, f, indent=4, ensure_ascii=False)
+        os.replace(tmp_path, PLAYER_DATA_FILE)
+
+def placeholder_name(user_id):
+    return f"Пользователь {user_id}"
+
+def is_placeholder(user_id, name):
+    """
+    True, если у игрока нет настоящего имени (пусто или "Пользователь {id}").
+    """
+    return not name or name == placeholder_name(user_id)
 
 def add_user(user_id, data, vk_name=None):
     if str(user_id) not in data:
         if vk_name is None:
-            vk_name = f"Пользователь {user_id}"
+            vk_name = placeholder_name(user_id)
         data[str(user_id)] = {
             "balance": 0,
             "start_date": str(datetime.now().date()),
@@ -43,7 +77,8 @@ def add_click_to_data(user_id, message, data):
         data[str(user_id)]["clicks"].append(click_info)
         save_player_data(data)
 
-# Работа с играми. В файле games.json хранятся активные игры.
+# Работа с играми. В файле games.json хранятся активные игры; игры «Орел-Решка» содержат
+# снимок сидов раунда с нераскрытым сидом сервера, поэтому файл не должен публиковаться.
 def load_games():
     try:
         with open(GAMES_FILE, "r") as f:
@@ -77,4 +112,157 @@ def load_top_data():
 
 def save_top_data(top_data):
     with open(TOP_DATA_FILE, "w") as f:
-        json.dump(top_data, f, indent=4, ensure_ascii=False)
\ No newline at end of file
+        json.dump(top_data, f, indent=4, ensure_ascii=False)
+
+# Кэш загруженных изображений поля "Мины": по строке [отпечаток поля, attachment] на загрузку,
+# файл только дописывается; при повторе отпечатка действует последняя строка.
+def load_photo_cache():
+    entries = []
+    try:
+        with open(PHOTO_CACHE_FILE, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # Недописанная строка после сбоя
+                    continue
+    except FileNotFoundError:
+        pass
+    return entries
+
+def append_photo_cache(entry):
+    with open(PHOTO_CACHE_FILE, "a", encoding="utf-8") as f:
+        f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+def save_photo_cache(entries):
+    """
+    Переписывает файл кэша только актуальными записями (сжатие журнала).
+    """
+    tmp_path = PHOTO_CACHE_FILE + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write("".join(json.dumps(entry, ensure_ascii=False) + "\n" for entry in entries))
+    os.replace(tmp_path, PHOTO_CACHE_FILE)
+
+# Сиды доказуемо честной генерации: user_id -> {"server_seed", "client_seed", "nonce"}.
+# Каждое изменение пары игрока (новый nonce, смена сидов) дописывается строкой
+# [user_id, пара] в seeds.log; при загрузке действует последняя строка игрока.
+# seeds.json — прежний формат (весь словарь одним файлом), читается, если остался.
+# Файлы содержат нераскрытые сиды сервера и не должны публиковаться.
+def load_seeds():
+    try:
+        with open(SEEDS_FILE, "r") as f:
+            seeds = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        seeds = {}
+    try:
+        with open(SEEDS_LOG_FILE, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    user_id, pair = json.loads(line)
+                except (json.JSONDecodeError, ValueError):
+                    # Недописанная строка после сбоя
+                    continue
+                seeds[user_id] = pair
+    except FileNotFoundError:
+        pass
+    return seeds
+
+def append_seeds(user_id, pair):
+    with open(SEEDS_LOG_FILE, "a", encoding="utf-8") as f:
+        f.write(json.dumps([str(user_id), pair], ensure_ascii=False) + "\n")
+
+def save_seeds(seeds):
+    """
+    Переписывает seeds.log только актуальными парами (сжатие журнала).
+    """
+    tmp_path = SEEDS_LOG_FILE + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write("".join(json.dumps([user_id, pair], ensure_ascii=False) + "\n" for user_id, pair in seeds.items()))
+    os.replace(tmp_path, SEEDS_LOG_FILE)
+
+# Общие коммитменты сидов сервера (см. commitments.py).
+# Опубликованные корни: период -> {"root": hex, "count": число сидов периода}
+def load_commitment_roots():
+    try:
+        with open(COMMITMENT_ROOTS_FILE, "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def save_commitment_roots(roots):
+    tmp_path = COMMITMENT_ROOTS_FILE + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(roots, f, indent=4, ensure_ascii=False)
+    os.replace(tmp_path, COMMITMENT_ROOTS_FILE)
+
+# Секреты периодов: период -> {"secret": hex, "next": номер следующего сида}. Не публикуются.
+def load_commitment_secrets():
+    try:
+        with open(COMMITMENT_SECRETS_FILE, "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def save_commitment_secrets(secrets):
+    tmp_path = COMMITMENT_SECRETS_FILE + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(secrets, f)
+    os.replace(tmp_path, COMMITMENT_SECRETS_FILE)
+
+# Журнал операций с балансами (см. ledger.py): одна JSON-запись на строку, только дописывается.
+# Пачка записей пишется одним вызовом write и сбрасывается на диск через fsync.
+def append_ledger_lines(lines):
+    with open(LEDGER_FILE, "a", encoding="utf-8") as f:
+        f.write("".join(line + "\n" for line in lines))
+        f.flush()
+        os.fsync(f.fileno())
+
+def read_ledger_lines():
+    try:
+        with open(LEDGER_FILE, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield line
+    except FileNotFoundError:
+        return
+
+# Контрольная точка балансов: {"seq": номер последней учтенной записи, "balances": {счет: сумма}}.
+# Пишется во временный файл и атомарно заменяет прежний.
+def load_ledger_checkpoint():
+    try:
+        with open(LEDGER_CHECKPOINT_FILE, "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {"seq": 0, "balances": {}}
+
+def save_ledger_checkpoint(checkpoint):
+    tmp_path = LEDGER_CHECKPOINT_FILE + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(checkpoint, f, ensure_ascii=False)
+    os.replace(tmp_path, LEDGER_CHECKPOINT_FILE)
+
+def load_longpoll_state():
+    try:
+        with open(LONGPOLL_STATE_FILE, "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def save_longpoll_state(state):
+    tmp_path = LONGPOLL_STATE_FILE + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, LONGPOLL_STATE_FILE)
+
+def load_delivery_state():
+    try:
+        with open(DELIVERY_STATE_FILE, "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def save_delivery_state(state):
+    tmp_path = DELIVERY_STATE_FILE + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, DELIVERY_STATE_FILE)
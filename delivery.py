@@ -0,0 +1,144 @@
+import logging
+import threading
+import time
+import requests
+from vk_api.exceptions import ApiError, ApiHttpError
+from data_manager import load_delivery_state, save_delivery_state
+from config import CONFIG
+
+# VK отбрасывает повторную отправку в беседу с уже использованным random_id,
+# поэтому идентификаторы выдаются по возрастанию отдельно для каждого peer_id.
+# Начальное значение берется из времени (RANDOM_ID_RATE значений в секунду от RANDOM_ID_EPOCH),
+# чтобы после перезапуска бота идентификаторы не начинались заново; int32 хватает до 2041 года.
+RANDOM_ID_EPOCH = 1704067200  # 2024-01-01 UTC
+RANDOM_ID_RATE = 4
+MAX_RANDOM_ID = 2 ** 31 - 1
+# Беседа, получавшая больше RANDOM_ID_RATE сообщений в секунду, обгоняет часы, поэтому
+# верхняя граница выданных идентификаторов хранится на диске и сдвигается блоками
+# по RANDOM_ID_RESERVE: идентификатор выдается, только если не превышает сохраненной
+# границы, а после перезапуска выдача начинается выше нее.
+RANDOM_ID_RESERVE = 10000
+
+# Коды ошибок VK API, после которых отправку можно повторить:
+# 1 — неизвестная ошибка, 6 — слишком много запросов в секунду, 10 — внутренняя ошибка сервера
+TRANSIENT_API_ERRORS = {1, 6, 10}
+RETRY_ATTEMPTS = CONFIG.get("SEND_RETRY_ATTEMPTS", 3)
+RETRY_BACKOFF = CONFIG.get("SEND_RETRY_BACKOFF", 0.25)
+RETRY_MAX_WAIT = CONFIG.get("SEND_RETRY_MAX_WAIT", 2.0)
+
+_lock = threading.Lock()
+_last_ids = {}
+# Сохраненная граница выданных random_id (None — еще не прочитана) и наименьший
+# идентификатор, который можно выдать после перезапуска
+_reserved = None
+_floor = 1
+delivery_stats = {"sent": 0, "delivered": 0, "retries": 0, "dropped": 0, "in_flight": 0}
+
+def _reserve(random_id):
+    """
+    Поднимает random_id до первого свободного после перезапуска и при необходимости
+    сдвигает сохраненную границу выше него. Вызывается под _lock.
+    """
+    global _reserved, _floor
+    if _reserved is None:
+        _reserved = load_delivery_state().get("reserved_random_id", 0)
+        _floor = _reserved + 1
+    random_id = max(random_id, _floor)
+    if random_id > _reserved:
+        try:
+            save_delivery_state({"reserved_random_id": random_id + RANDOM_ID_RESERVE})
+            _reserved = random_id + RANDOM_ID_RESERVE
+        except OSError as e:
+            logging.error(f"Не удалось сохранить границу random_id: {e}")
+    return random_id
+
+def next_random_id(peer_id, now=None):
+    """
+    Следующий random_id для peer_id: больше всех выданных ранее для этой беседы,
+    в том числе до перезапуска бота.
+    """
+    now = time.time() if now is None else now
+    with _lock:
+        candidate = int((now - RANDOM_ID_EPOCH) * RANDOM_ID_RATE)
+        random_id = _reserve(max(candidate, _last_ids.get(peer_id, 0) + 1))
+        if random_id > MAX_RANDOM_ID:
+            random_id = 1
+        _last_ids[peer_id] = random_id
+        return random_id
+
+def next_batch_random_id(peer_ids, now=None):
+    """
+    random_id для отправки одного сообщения нескольким peer_ids: больше всех выданных
+    ранее каждому из получателей, чтобы не совпасть с их личными сообщениями.
+    """
+    now = time.time() if now is None else now
+    with _lock:
+        random_id = int((now - RANDOM_ID_EPOCH) * RANDOM_ID_RATE)
+        for peer_id in peer_ids:
+            random_id = max(random_id, _last_ids.get(peer_id, 0) + 1)
+        random_id = _reserve(random_id)
+        if random_id > MAX_RANDOM_ID:
+            random_id = 1
+        for peer_id in peer_ids:
+            _last_ids[peer_id] = random_id
+        return random_id
+
+def is_transient(error):
+    """
+    True, если ошибка временная и отправку можно повторить с тем же random_id.
+    """
+    if isinstance(error, ApiError):
+        return error.code in TRANSIENT_API_ERRORS
+    return isinstance(error, (ApiHttpError, requests.exceptions.ConnectionError, requests.exceptions.Timeout))
+
+def _count(key, delta=1):
+    with _lock:
+        delivery_stats[key] += delta
+
+def send_message(vk, **params):
+    """
+    Отправляет сообщение через messages.send с уникальным random_id и повторяет отправку
+    при временных ошибках (с экспоненциальной паузой, всего не дольше RETRY_MAX_WAIT секунд).
+    Повторы используют тот же random_id, поэтому VK не доставит сообщение дважды,
+    даже если первый запрос дошел.
+    Если отправить не удалось, ошибка пробрасывается вызывающему, как и раньше.
+    Возвращает ответ messages.send.
+    """
+    if "random_id" not in params:
+        if "peer_ids" in params:
+            params["random_id"] = next_batch_random_id([int(peer_id) for peer_id in str(params["peer_ids"]).split(",")])
+        else:
+            params["random_id"] = next_random_id(params.get("peer_id", params.get("user_id")))
+    _count("sent")
+    _count("in_flight")
+    waited = 0.0
+    try:
+        for attempt in range(RETRY_ATTEMPTS + 1):
+            try:
+                response = vk.messages.send(**params)
+                _count("delivered")
+                return response
+            except Exception as e:
+                delay = RETRY_BACKOFF * 2 ** attempt
+                if attempt == RETRY_ATTEMPTS or not is_transient(e) or waited + delay > RETRY_MAX_WAIT:
+                    _count("dropped")
+                    logging.error(f"Сообщение в {params.get('peer_id')} не доставлено "
+                                  f"(random_id {params['random_id']}, попыток: {attempt + 1}): {e}")
+                    raise
+                _count("retries")
+                waited += delay
+                logging.warning(f"Повтор отправки в {params.get('peer_id')} через {delay} с: {e}")
+                time.sleep(delay)
+    finally:
+        _count("in_flight", -1)
+
+def delivery_report():
+    """
+    Строка со статистикой отправки: доставлено, потеряно и доля повторов.
+    """
+    with _lock:
+        stats = dict(delivery_stats)
+    sent = stats["sent"] or 1
+    return (f"Отправлено: {stats['sent']}, доставлено: {stats['delivered']} ({stats['delivered'] / sent:.1%}), "
+            f"потеряно: {stats['dropped']} ({stats['dropped'] / sent:.1%}), повторов: {stats['retries']} "
+            f"({stats['retries'] / sent:.2f} на сообщение), в процессе: {stats['in_flight']}")
@@ -0,0 +1,88 @@
+import logging
+import threading
+import time
+from collections import deque
+from vk_api.bot_longpoll import VkBotEventType
+from config import CONFIG
+
+class EventDeduplicator:
+    """
+    Индекс недавно обработанных событий для отбрасывания повторов.
+
+    Ключи хранятся в кольце из buckets множеств, каждое покрывает window / buckets секунд.
+    Проверка — поиск в нескольких множествах (O(1)), устаревшее множество удаляется целиком.
+    Память ограничена: если в текущем множестве набралось max_keys / buckets ключей,
+    начинается следующее, и самое старое вытесняется раньше срока.
+    """
+
+    def __init__(self, window=3600.0, buckets=6, max_keys=120000):
+        self.bucket_span = window / buckets
+        self.max_buckets = buckets
+        self.max_bucket_keys = max(1, max_keys // buckets)
+        self._buckets = deque()
+        self._lock = threading.Lock()
+        self.stats = {"checked": 0, "dropped": 0, "expired_buckets": 0, "early_rotations": 0}
+
+    def _current_bucket(self, now):
+        while self._buckets and now - self._buckets[0][0] >= self.bucket_span * self.max_buckets:
+            self._buckets.popleft()
+            self.stats["expired_buckets"] += 1
+        if self._buckets:
+            started, keys = self._buckets[-1]
+            if now - started < self.bucket_span and len(keys) < self.max_bucket_keys:
+                return keys
+            if len(keys) >= self.max_bucket_keys:
+                self.stats["early_rotations"] += 1
+        if len(self._buckets) >= self.max_buckets:
+            self._buckets.popleft()
+        keys = set()
+        self._buckets.append((now, keys))
+        return keys
+
+    def seen(self, key, now=None):
+        """
+        Возвращает True, если ключ уже встречался в окне; иначе запоминает его.
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self.stats["checked"] += 1
+            for _, keys in self._buckets:
+                if key in keys:
+                    self.stats["dropped"] += 1
+                    return True
+            self._current_bucket(now).add(key)
+            return False
+
+    def size(self):
+        with self._lock:
+            return sum(len(keys) for _, keys in self._buckets)
+
+def event_key(event):
+    """
+    Ключ события для поиска повторов: event_id для нажатий callback-кнопок,
+    (peer_id, conversation_message_id) для сообщений. None — событие не проверяется.
+    """
+    if event.type == VkBotEventType.MESSAGE_EVENT:
+        event_id = event.obj.get("event_id")
+        return f"e:{event_id}" if event_id else None
+    if event.type == VkBotEventType.MESSAGE_NEW:
+        message = event.obj.get("message") or {}
+        message_id = message.get("conversation_message_id")
+        if message_id:
+            return f"m:{message.get('peer_id')}:{message_id}"
+        return f"i:{message['id']}" if message.get("id") else None
+    return None
+
+# Индекс, используемый ботом в main.main
+_deduplicator = EventDeduplicator(CONFIG.get("EVENT_DEDUP_WINDOW", 3600.0))
+dedup_stats = _deduplicator.stats
+
+def is_duplicate_event(event):
+    """
+    Проверяет событие перед обработкой: True — повтор, который нужно пропустить.
+    """
+    key = event_key(event)
+    if key is None or not _deduplicator.seen(key):
+        return False
+    logging.warning(f"Повтор события {key} пропущен (всего пропущено: {dedup_stats['dropped']})")
+    return True
@@ -0,0 +1,205 @@
+"""
+Доказуемо честная генерация результатов игр.
+
+Результат раунда полностью определяется тройкой (сид сервера, сид клиента, nonce):
+    HMAC-SHA256(key=сид сервера, msg="{сид клиента}:{nonce}:{раунд}"), раунд = 0, 1, 2, ...
+Каждые 4 байта потока переводятся в число из [0, 1). Игроку заранее публикуется
+SHA-256 от сида сервера, а сам сид раскрывается при его смене (rotate_seeds) —
+после этого любой прошлый раунд можно пересчитать самостоятельно:
+
+    python fairness.py mines <сид сервера> <сид клиента> <nonce> <размер поля> <мин>
+    python fairness.py coinflip <сид сервера> <сид клиента> <nonce>
+"""
+import functools
+import hashlib
+import hmac
+import secrets
+import sys
+import threading
+from commitments import allocate_server_seed
+from data_manager import append_seeds, load_seeds, save_seeds
+
+# Журнал сидов переписывается целиком, когда в нем набирается больше строк,
+# чем 2 * число игроков + COMPACT_MIN_LINES: запись на раунд — одна строка
+COMPACT_MIN_LINES = 1000
+
+_seeds = None
+_appended = 0
+_lock = threading.Lock()
+
+def hash_server_seed(server_seed):
+    """
+    Публикуемый хеш сида сервера (SHA-256, hex).
+    """
+    return hashlib.sha256(server_seed.encode("utf-8")).hexdigest()
+
+def random_floats(server_seed, client_seed, nonce):
+    """
+    Бесконечный детерминированный поток чисел из [0, 1), построенный на HMAC-SHA256.
+    """
+    key = server_seed.encode("utf-8")
+    round_index = 0
+    while True:
+        digest = hmac.new(key, f"{client_seed}:{nonce}:{round_index}".encode("utf-8"), hashlib.sha256).digest()
+        for offset in range(0, len(digest), 4):
+            yield int.from_bytes(digest[offset:offset + 4], "big") / 2 ** 32
+        round_index += 1
+
+def coinflip_outcome(server_seed, client_seed, nonce):
+    """
+    Результат подбрасывания монеты: "heads" или "tails".
+    """
+    return "heads" if next(random_floats(server_seed, client_seed, nonce)) < 0.5 else "tails"
+
+@functools.lru_cache(maxsize=4096)
+def mines_mask(server_seed, client_seed, nonce, board_size, mine_count):
+    """
+    Маска мин поля (бит n - 1 — ячейка n). Позиции мин — первые mine_count элементов
+    перемешивания Фишера — Йетса, поэтому время не зависит от плотности мин.
+    Функция чистая, поэтому результат кэшируется и не хранится в сессии.
+    """
+    cells = list(range(board_size * board_size))
+    floats = random_floats(server_seed, client_seed, nonce)
+    mask = 0
+    for i in range(mine_count):
+        j = i + int(next(floats) * (len(cells) - i))
+        cells[i], cells[j] = cells[j], cells[i]
+        mask |= 1 << cells[i]
+    return mask
+
+def _new_seed_pair(client_seed=None):
+    # Сид сервера берется из заранее опубликованного набора периода (см. commitments.py)
+    server_seed, seed_id = allocate_server_seed()
+    return {
+        "server_seed": server_seed,
+        "seed_id": seed_id,
+        "client_seed": client_seed or secrets.token_hex(8),
+        "nonce": 0,
+    }
+
+def _persist(user_id):
+    """
+    Сохраняет пару сидов игрока строкой журнала; время не зависит от числа игроков,
+    кроме редкого сжатия журнала.
+    """
+    global _appended
+    append_seeds(user_id, _seeds[str(user_id)])
+    _appended += 1
+    if _appended >= 2 * len(_seeds) + COMPACT_MIN_LINES:
+        save_seeds(_seeds)
+        _appended = 0
+
+def _user_seeds(user_id):
+    global _seeds
+    if _seeds is None:
+        _seeds = load_seeds()
+        if _seeds:
+            save_seeds(_seeds)
+    key = str(user_id)
+    if key not in _seeds:
+        _seeds[key] = _new_seed_pair()
+        _persist(key)
+    return _seeds[key]
+
+def get_public_seeds(user_id):
+    """
+    Публичные данные текущей пары сидов: хеш сида сервера, его номер в общих коммитментах,
+    сид клиента и следующий nonce.
+    """
+    with _lock:
+        seeds = _user_seeds(user_id)
+        return {
+            "server_seed_hash": hash_server_seed(seeds["server_seed"]),
+            "seed_id": seeds.get("seed_id"),
+            "client_seed": seeds["client_seed"],
+            "nonce": seeds["nonce"],
+        }
+
+def describe_commitment(seed_id):
+    """
+    Подсказка о проверке сида сервера по опубликованному корню; пустая строка,
+    если сид выдан без коммитмента.
+    """
+    if not seed_id:
+        return ""
+    return f" Сид сервера заранее включен в корень дня — «проверить {seed_id}»."
+
+def describe_round(round_seeds):
+    """
+    Текст для игрока с данными, по которым можно проверить раунд (снимок из start_round).
+    """
+    return (f"Хеш сида сервера (SHA-256): {round_seeds['server_seed_hash']}\n"
+            f"Сид клиента: {round_seeds['client_seed']}, nonce: {round_seeds['nonce']}")
+
+def start_round(user_id, game):
+    """
+    Начинает раунд игры game: выдает nonce. Возвращает снимок раунда {"nonce", "round",
+    "server_seed", "server_seed_hash", "client_seed"}, где "round" — номер сида сервера
+    "период#номер" в общих коммитментах (None, если сид выдан без коммитмента).
+    Исход раунда вычисляется по снимку, поэтому смена сидов во время раунда его не меняет.
+    Сид сервера из снимка нельзя показывать игроку до раскрытия.
+    """
+    with _lock:
+        seeds = _user_seeds(user_id)
+        nonce = seeds["nonce"]
+        seeds["nonce"] += 1
+        _persist(user_id)
+        round_seeds = {
+            "nonce": nonce,
+            "server_seed": seeds["server_seed"],
+            "server_seed_hash": hash_server_seed(seeds["server_seed"]),
+            "client_seed": seeds["client_seed"],
+            "round": seeds.get("seed_id"),
+        }
+    return round_seeds
+
+def current_round_seeds(user_id, nonce):
+    """
+    Снимок раунда с данным nonce по текущей паре сидов игрока — для раундов,
+    начатых до появления снимков.
+    """
+    with _lock:
+        seeds = _user_seeds(user_id)
+        return {"nonce": nonce, "server_seed": seeds["server_seed"],
+                "server_seed_hash": hash_server_seed(seeds["server_seed"]), "client_seed": seeds["client_seed"],
+                "round": seeds.get("seed_id")}
+
+def rotate_seeds(user_id, client_seed=None):
+    """
+    Раскрывает текущую пару сидов и заменяет ее новой.
+    Возвращает словарь раскрытой пары (server_seed, client_seed, nonce — число сыгранных раундов).
+    """
+    with _lock:
+        previous = dict(_user_seeds(user_id))
+        _seeds[str(user_id)] = _new_seed_pair(client_seed)
+        _persist(user_id)
+        return previous
+
+def round_outcome_mines(round_seeds, board_size, mine_count):
+    """
+    Маска мин раунда по снимку сидов из start_round.
+    """
+    return mines_mask(round_seeds["server_seed"], round_seeds["client_seed"], round_seeds["nonce"],
+                      board_size, mine_count)
+
+def round_outcome_coinflip(round_seeds):
+    """
+    Результат подбрасывания монеты для раунда по снимку сидов из start_round.
+    """
+    return coinflip_outcome(round_seeds["server_seed"], round_seeds["client_seed"], round_seeds["nonce"])
+
+def _main(argv):
+    if len(argv) >= 4 and argv[0] == "coinflip":
+        print(coinflip_outcome(argv[1], argv[2], int(argv[3])))
+        return 0
+    if len(argv) >= 6 and argv[0] == "mines":
+        board_size = int(argv[4])
+        mask = mines_mask(argv[1], argv[2], int(argv[3]), board_size, int(argv[5]))
+        cells = [cell for cell in range(1, board_size * board_size + 1) if mask >> (cell - 1) & 1]
+        print("Мины в ячейках:", ", ".join(map(str, cells)))
+        return 0
+    print(__doc__)
+    return 1
+
+if __name__ == "__main__":
+    sys.exit(_main(sys.argv[1:]))
@@ -4,6 +4,7 @@ import random
 import logging
 from vk_api.keyboard import VkKeyboard, VkKeyboardColor
 from data_manager import save_data
+from delivery import send_message
 
 def show_games_keyboard():
     keyboard = VkKeyboard(one_time=False)
@@ -13,29 +14,29 @@ def show_games_keyboard():
 
 def start_coinflip(user_id, amount, vk, peer_id):
     if amount <= 0:
-        vk.messages.send(
+        send_message(
+            vk,
             peer_id=peer_id,
-            message="Ставка должна быть больше нуля.",
-            random_id=random.randint(1, 1000)
+            message="Ставка должна быть больше нуля."
         )
         return
 
     keyboard = VkKeyboard(inline=True)
     keyboard.add_callback_button("Орел", color=VkKeyboardColor.PRIMARY, payload={"command": "coinflip_choice", "choice": "heads", "amount": amount})
     keyboard.add_callback_button("Решка", color=VkKeyboardColor.PRIMARY, payload={"command": "coinflip_choice", "choice": "tails", "amount": amount})
-    vk.messages.send(
+    send_message(
+        vk,
         peer_id=peer_id,
         message=f"Вы выбрали ставку {amount}. Выберите на что ставите:",
-        keyboard=keyboard.get_keyboard(),
-        random_id=random.randint(1, 1000)
+        keyboard=keyboard.get_keyboard()
     )
 
 def process_coinflip_choice(user_id, choice, amount, player_data, vk, peer_id):
     if player_data[user_id]["balance"] < amount:
-        vk.messages.send(
+        send_message(
+            vk,
             peer_id=peer_id,
-            message="Недостаточно средств на балансе для этой ставки.",
-            random_id=random.randint(1, 1000)
+            message="Недостаточно средств на балансе для этой ставки."
         )
         return
 
@@ -49,9 +50,9 @@ def process_coinflip_choice(user_id, choice, amount, player_data, vk, peer_id):
     else:
         message = f"Вы проиграли. Выпало {result}. Баланс: {player_data[user_id]['balance']} Glitch⚡."
 
-    vk.messages.send(
+    send_message(
+        vk,
         peer_id=peer_id,
-        message=message,
-        random_id=random.randint(1, 1000)
+        message=message
     )
     save_data(player_data)
\ No newline at end of file
@@ -0,0 +1,185 @@
+import logging
+import queue
+import re
+import threading
+import time
+from datetime import datetime, timedelta
+from data_manager import add_user, player_data_lock
+from ledger import account_totals, flush, record_airdrop
+from delivery import send_message
+from games.transfers import parse_recipient_text
+from names import display_name
+from config import CONFIG
+
+# Раздача Glitch владельцем бота (CONFIG["OWNER_ID"]). Форматы команды:
+#   раздача                      — далее по строке на получателя: "<получатель> <сумма>",
+#   id123 100                      получатель — как в переводах (id, ссылка, @ник);
+#   раздача 50 топ 100 майнеров [дня|недели|месяца] — по 50 Glitch лучшим майнерам периода.
+# Получатели определяются в потоке раздачи, а не в потоке обработки событий: выбор майнеров
+# читает весь журнал балансов, а "@ник" в списке проверяется запросом к VK.
+COMMAND = "раздача"
+SELECTOR_PATTERN = re.compile(r'(\d+)\s+топ\s+(\d+)\s+майнеров(?:\s+(дня|недели|месяца))?$')
+PERIODS = {"дня": timedelta(days=1), "недели": timedelta(weeks=1), "месяца": timedelta(days=30)}
+MAX_RECIPIENTS = 100000
+
+# messages.send принимает до 100 peer_ids; не больше NOTIFY_RATE запросов в секунду,
+# чтобы уведомления не занимали лимит запросов, нужный для ответов игрокам
+NOTIFY_BATCH = 100
+NOTIFY_RATE = CONFIG.get("AIRDROP_NOTIFY_RATE", 5)
+
+_jobs = queue.Queue()
+_worker = None
+_notifications = queue.Queue()
+_sender = None
+airdrop_stats = {"airdrops": 0, "credited": 0, "notify_calls": 0, "notified": 0, "notify_errors": 0}
+
+def is_owner(user_id):
+    return str(user_id) == str(CONFIG["OWNER_ID"])
+
+def parse_airdrop_list(lines, vk=None):
+    """
+    Разбирает строки "<получатель> <сумма>". Возвращает ({user_id: сумма}, ошибки).
+    Повторяющиеся получатели суммируются.
+    """
+    credits, errors = {}, []
+    for number, line in enumerate(lines, 1):
+        parts = line.split()
+        if not parts:
+            continue
+        try:
+            amount = int(parts[-1])
+        except ValueError:
+            amount = 0
+        target = " ".join(parts[:-1])
+        recipient = target if target.isdigit() else parse_recipient_text(target, vk)
+        if len(parts) < 2 or amount <= 0 or not recipient:
+            errors.append(f"строка {number}: «{line.strip()}»")
+            continue
+        credits[recipient] = credits.get(recipient, 0) + amount
+    return credits, errors
+
+def select_top_miners(count, period, amount, now=None):
+    """
+    {user_id: amount} для count игроков с наибольшей суммой наград за клики за период.
+    """
+    since = (now or datetime.now()) - PERIODS[period]
+    totals = account_totals("farm_reward", since=since.timestamp())
+    top = sorted(totals.items(), key=lambda item: item[1], reverse=True)[:count]
+    return {user_id: amount for user_id, _total in top}
+
+def settle_airdrop(credits, player_data, ref=None):
+    """
+    Начисляет всем получателям одной транзакцией журнала и одной записью на диск.
+    Новые получатели добавляются в player_data (имя запрашивается в фоне), их записи
+    сохраняются в журнале вместе с раздачей. Данные игроков меняются под player_data_lock;
+    транзакция проводится без записи на диск, пачка пишется flush() после освобождения блокировки.
+    """
+    with player_data_lock:
+        fields = {}
+        for user_id in credits:
+            if user_id not in player_data:
+                add_user(user_id, player_data, vk_name=display_name(user_id))
+                fields[user_id] = {key: value for key, value in player_data[user_id].items() if key != "balance"}
+        record_airdrop(player_data, credits, ref=ref, fields=fields or None)
+    flush()
+    airdrop_stats["airdrops"] += 1
+    airdrop_stats["credited"] += len(credits)
+
+def queue_notifications(vk, credits, owner_peer_id=None):
+    """
+    Ставит уведомления получателям в очередь фоновой отправки: получатели с одинаковой
+    суммой уведомляются одним messages.send на NOTIFY_BATCH человек.
+    """
+    global _sender
+    by_amount = {}
+    for user_id, amount in credits.items():
+        by_amount.setdefault(amount, []).append(user_id)
+    batches = [(amount, user_ids[i:i + NOTIFY_BATCH])
+               for amount, user_ids in by_amount.items() for i in range(0, len(user_ids), NOTIFY_BATCH)]
+    _notifications.put((vk, batches, owner_peer_id))
+    if _sender is None:
+        _sender = threading.Thread(target=_notify_loop, name="airdrop-notifier", daemon=True)
+        _sender.start()
+
+def _notify_loop():
+    while True:
+        vk, batches, owner_peer_id = _notifications.get()
+        delivered = 0
+        for amount, user_ids in batches:
+            started = time.monotonic()
+            try:
+                send_message(vk, peer_ids=",".join(user_ids),
+                             message=f"Вам начислено {amount} Glitch⚡ в раздаче от администрации!")
+                delivered += len(user_ids)
+                airdrop_stats["notified"] += len(user_ids)
+            except Exception as e:
+                airdrop_stats["notify_errors"] += 1
+                logging.error(f"Раздача: не удалось уведомить {len(user_ids)} получателей: {e}")
+            airdrop_stats["notify_calls"] += 1
+            time.sleep(max(0.0, 1 / NOTIFY_RATE - (time.monotonic() - started)))
+        if owner_peer_id is not None:
+            try:
+                send_message(vk, peer_id=owner_peer_id,
+                             message=f"Уведомления о раздаче отправлены: {delivered} получателей.")
+            except Exception as e:
+                logging.error(f"Раздача: не удалось отправить отчет владельцу: {e}")
+        _notifications.task_done()
+
+def process_airdrop_command(user_id, text, player_data, vk, peer_id):
+    """
+    Обрабатывает команду "раздача": передает ее потоку раздачи и сразу возвращается.
+    Возвращает True, если сообщение — команда раздачи владельца.
+    """
+    global _worker
+    if not is_owner(user_id) or not text.lower().startswith(COMMAND):
+        return False
+    _jobs.put((text[len(COMMAND):], player_data, vk, peer_id))
+    if _worker is None:
+        _worker = threading.Thread(target=_airdrop_loop, name="airdrop", daemon=True)
+        _worker.start()
+    return True
+
+def _airdrop_loop():
+    while True:
+        command, player_data, vk, peer_id = _jobs.get()
+        try:
+            run_airdrop(command, player_data, vk, peer_id)
+        except Exception as e:
+            logging.error(f"Раздача не выполнена: {e}", exc_info=True)
+            try:
+                send_message(vk, peer_id=peer_id, message="Раздача не выполнена из-за ошибки, подробности в логе.")
+            except Exception as send_error:
+                logging.error(f"Раздача: не удалось сообщить владельцу об ошибке: {send_error}")
+        _jobs.task_done()
+
+def run_airdrop(command, player_data, vk, peer_id):
+    """
+    Выполняет команду раздачи (текст после "раздача") в потоке раздачи.
+    """
+    first_line, *lines = command.split("\n")
+    match = SELECTOR_PATTERN.match(first_line.strip().lower())
+    if match:
+        amount, count, period = int(match.group(1)), int(match.group(2)), match.group(3) or "недели"
+        credits, errors = select_top_miners(count, period, amount), []
+        if amount <= 0 or not credits:
+            send_message(vk, peer_id=peer_id, message="Раздача: подходящих игроков нет.")
+            return
+    else:
+        credits, errors = parse_airdrop_list([first_line] + lines, vk)
+    if errors or not credits or len(credits) > MAX_RECIPIENTS:
+        details = "\n".join(errors[:10]) if errors else f"получателей: {len(credits)} (не больше {MAX_RECIPIENTS})"
+        send_message(
+            vk,
+            peer_id=peer_id,
+            message=("Раздача не выполнена. Формат: «раздача 50 топ 100 майнеров недели» или «раздача», "
+                     f"затем строки «получатель сумма».\n{details}")
+        )
+        return
+    total = sum(credits.values())
+    settle_airdrop(credits, player_data, ref=f"airdrop:{int(time.time())}")
+    send_message(
+        vk,
+        peer_id=peer_id,
+        message=f"Раздача выполнена: {len(credits)} получателей, всего {total} Glitch⚡. Уведомления отправляются."
+    )
+    queue_notifications(vk, credits, owner_peer_id=peer_id)
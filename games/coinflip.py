@@ -1,8 +1,32 @@
-import random
-import hashlib
+import json
+import re
+import logging
+import threading
 from vk_api.keyboard import VkKeyboard, VkKeyboardColor
-from data_manager import save_player_data, add_game, remove_game, load_games
-from utils import generate_result, generate_random_string
+from data_manager import add_game, remove_game, load_games, player_data_lock
+from ledger import InsufficientFunds, flush, record_payout, record_stake
+from delivery import send_message
+from fairness import current_round_seeds, describe_commitment, describe_round, rotate_seeds, round_outcome_coinflip, start_round
+from config import CONFIG
+from utils import format_user_tag, is_group_chat
+
+# Раунды на весь чат: ставки игроков группового чата собираются CHAT_ROUND_WINDOW секунд,
+# затем разыгрываются одним результатом. Раунды открываются только в групповых чатах:
+# сиды раунда — пара сидов чата (ключ peer_id), а в личных сообщениях peer_id совпадает
+# с user_id, и итоги раунда сменили бы личные сиды игрока. На раунд приходится одно сообщение об открытии,
+# одна запись данных игроков и одно итоговое сообщение независимо от числа игроков.
+CHAT_ROUNDS_ENABLED = CONFIG.get("COINFLIP_CHAT_ROUNDS", False)
+CHAT_ROUND_WINDOW = CONFIG.get("COINFLIP_ROUND_WINDOW", 15)
+# Сколько игроков перечисляется в итоговом сообщении (ограничение длины сообщения VK)
+MAX_LISTED_BETTORS = 30
+SIDE_NAMES = {"heads": "Орел", "tails": "Решка"}
+CHAT_BET_PATTERN = re.compile(r"^(орел|орёл|решка)\s+(\d+)$")
+
+# peer_id -> {"nonce", "round", "bets": {user_id: (сумма, сторона)}, "timer"}
+chat_rounds = {}
+# (peer_id, user_id) -> сумма ставки, для которой игрок еще не выбрал сторону
+pending_chat_bets = {}
+_chat_lock = threading.Lock()
 
 def show_games_keyboard():
     keyboard = VkKeyboard(one_time=False)
@@ -12,33 +36,38 @@ def show_games_keyboard():
     return keyboard.get_keyboard()
 
 def start_coinflip(user_id, amount, player_data, vk, peer_id):
-    if peer_id < 2000000000:
-        vk.messages.send(
+    if not is_group_chat(peer_id):
+        send_message(
+            vk,
             peer_id=peer_id,
-            message="Играть можно только в игровом чате.",
-            random_id=random.randint(1, 1000)
+            message="Играть можно только в игровом чате."
         )
         return
 
     if amount <= 0:
-        vk.messages.send(
+        send_message(
+            vk,
             peer_id=peer_id,
-            message="Ставка должна быть больше нуля.",
-            random_id=random.randint(1, 1000)
+            message="Ставка должна быть больше нуля."
         )
         return
 
-    # Генерируем результат и вычисляем хэш игры единожды
-    result, _ = generate_result()
-    random_string = generate_random_string()
-    # Вычисляем неизменяемый хэш игры
-    game_hash = hashlib.md5(f"{result}|{random_string}".encode()).hexdigest()
+    if CHAT_ROUNDS_ENABLED:
+        # Сторона выбирается кнопками сообщения раунда; отдельное сообщение отправляется,
+        # только если в чате еще нет открытого раунда
+        with _chat_lock:
+            pending_chat_bets[(peer_id, user_id)] = amount
+        open_chat_round(peer_id, player_data, vk)
+        return
+
+    # Результат не хранится: он вычисляется по снимку сидов раунда при выборе стороны
+    round_seeds = start_round(user_id, "coinflip")
     game_info = {
         "user_id": user_id,
         "amount": amount,
-        "result": result,
-        "game_hash": game_hash,
-        "random_string": random_string,
+        "nonce": round_seeds["nonce"],
+        "round": round_seeds["round"],
+        "seeds": round_seeds,
         "timestamp": None
     }
     add_game(game_info)
@@ -46,54 +75,207 @@ def start_coinflip(user_id, amount, player_data, vk, peer_id):
     keyboard = VkKeyboard(inline=True)
     keyboard.add_callback_button("Орел", color=VkKeyboardColor.PRIMARY, payload={"command": "coinflip_choice", "choice": "heads"})
     keyboard.add_callback_button("Решка", color=VkKeyboardColor.PRIMARY, payload={"command": "coinflip_choice", "choice": "tails"})
-    vk.messages.send(
+    send_message(
+        vk,
         peer_id=peer_id,
-        message=f"Вы выбрали ставку {amount}.\nХэш игры (для проверки честности): {game_hash}\nВыберите, на что ставите:",
-        keyboard=keyboard.get_keyboard(),
-        random_id=random.randint(1, 1000)
+        message=f"Вы выбрали ставку {amount}.\n{describe_round(round_seeds)}\nВыберите, на что ставите:",
+        keyboard=keyboard.get_keyboard()
     )
 
 def process_coinflip_choice(user_id, choice, player_data, vk, peer_id):
     games = load_games()
     game = games.get(str(user_id))
     if not game:
-        vk.messages.send(
+        send_message(
+            vk,
             peer_id=peer_id,
-            message="Игра не найдена или уже завершена.",
-            random_id=random.randint(1, 1000)
+            message="Игра не найдена или уже завершена."
         )
         return
 
     amount = game["amount"]
-    result = game["result"]
-    game_hash = game["game_hash"]
+    if "nonce" in game:
+        round_seeds = game.get("seeds") or current_round_seeds(user_id, game["nonce"])
+        result = round_outcome_coinflip(round_seeds)
+        fairness_text = (f"{describe_round(round_seeds)}\n"
+                         f"Сид сервера раскрывается командой «сменить сид».{describe_commitment(game.get('round'))}")
+    else:
+        # Игра, начатая до перехода на сиды: результат сохранен вместе с хешем MD5
+        result = game["result"]
+        fairness_text = f"Хэш игры: {game['game_hash']}\nПроверка честности: {result}|{game['random_string']}"
     remove_game(user_id)
 
-    if int(player_data.get(str(user_id), {}).get("balance", 0)) < amount:
-        vk.messages.send(
+    try:
+        record_stake(player_data, user_id, amount, "coinflip")
+    except InsufficientFunds:
+        send_message(
+            vk,
             peer_id=peer_id,
-            message="Недостаточно средств на балансе для этой ставки.",
-            random_id=random.randint(1, 1000)
+            message="Недостаточно средств на балансе для этой ставки."
         )
         return
 
-    player_data[str(user_id)]["balance"] -= amount
-
     if choice == result:
         winnings = amount * 2
-        player_data[str(user_id)]["balance"] += winnings
+        record_payout(player_data, user_id, winnings, "coinflip")
         message = (
             f"Поздравляем! Вы выиграли {winnings}. Баланс: {player_data[str(user_id)]['balance']} Glitch⚡.\n"
-            f"Хэш игры: {game_hash}\nПроверка честности: {result}|{game['random_string']}"
+            f"{fairness_text}"
         )
     else:
         message = (
             f"Вы проиграли. Выпало: {result}. Баланс: {player_data[str(user_id)]['balance']} Glitch⚡.\n"
-            f"Хэш игры: {game_hash}\nПроверка честности: {result}|{game['random_string']}"
+            f"{fairness_text}"
+        )
+    send_message(
+        vk,
+        peer_id=peer_id,
+        message=message
+    )
+
+def open_chat_round(peer_id, player_data, vk):
+    """
+    Открывает раунд чата, если он еще не открыт. Для раунда используется пара сидов чата
+    (ключ — peer_id): хеш сида сервера публикуется при открытии, сам сид — в итогах раунда.
+    """
+    if not is_group_chat(peer_id):
+        return False
+    with _chat_lock:
+        if peer_id in chat_rounds:
+            return False
+        round_seeds = start_round(peer_id, "coinflip_chat")
+        timer = threading.Timer(CHAT_ROUND_WINDOW, settle_chat_round, args=(peer_id, player_data, vk))
+        timer.daemon = True
+        chat_rounds[peer_id] = {"nonce": round_seeds["nonce"], "round": round_seeds["round"], "seeds": round_seeds,
+                                "bets": {}, "timer": timer}
+    keyboard = VkKeyboard(inline=True)
+    keyboard.add_callback_button("Орел", color=VkKeyboardColor.PRIMARY, payload={"command": "coinflip_chat_bet", "choice": "heads"})
+    keyboard.add_callback_button("Решка", color=VkKeyboardColor.PRIMARY, payload={"command": "coinflip_chat_bet", "choice": "tails"})
+    send_message(
+        vk,
+        peer_id=peer_id,
+        message=(f"Раунд «Орел-Решка» открыт на {CHAT_ROUND_WINDOW} с.\n"
+                 f"Ставка: нажмите «Орел-Решка» и введите сумму или напишите «орел 100» / «решка 100».\n"
+                 f"{describe_round(round_seeds)}"),
+        keyboard=keyboard.get_keyboard()
+    )
+    timer.start()
+    return True
+
+def place_chat_bet(user_id, amount, choice, player_data, peer_id):
+    """
+    Принимает ставку в открытый раунд чата. Ставка сразу проводится по журналу балансов
+    (ledger), который пишет записи на диск пачками.
+    Возвращает текст ошибки или None.
+    """
+    if choice not in SIDE_NAMES:
+        return "Неверный выбор стороны."
+    if amount <= 0:
+        return "Ставка должна быть больше нуля."
+    with _chat_lock:
+        chat_round = chat_rounds.get(peer_id)
+        if chat_round is None:
+            return "Раунд уже завершен. Сделайте ставку заново."
+        if user_id in chat_round["bets"]:
+            return "Вы уже сделали ставку в этом раунде."
+        if str(user_id) not in player_data:
+            return "Недостаточно средств на балансе для этой ставки."
+        try:
+            record_stake(player_data, user_id, amount, "coinflip_chat")
+        except InsufficientFunds:
+            return "Недостаточно средств на балансе для этой ставки."
+        chat_round["bets"][user_id] = (amount, choice)
+    return None
+
+def process_chat_text_bet(user_id, text, player_data, vk, peer_id):
+    """
+    Ставка сообщением вида "орел 100" / "решка 100" в групповом чате.
+    При успехе бот ничего не отвечает (итог придет общим сообщением раунда).
+    Возвращает True, если сообщение было ставкой.
+    """
+    match = CHAT_BET_PATTERN.match(text.lower())
+    if not CHAT_ROUNDS_ENABLED or not is_group_chat(peer_id) or not match:
+        return False
+    choice = "tails" if match.group(1) == "решка" else "heads"
+    open_chat_round(peer_id, player_data, vk)
+    error = place_chat_bet(user_id, int(match.group(2)), choice, player_data, peer_id)
+    if error:
+        send_message(
+            vk,
+            peer_id=peer_id,
+            message=f"{format_user_tag(user_id, player_data.get(str(user_id), {}))}\n{error}"
         )
-    vk.messages.send(
+    return True
+
+def process_chat_bet_choice(event, user_id, choice, player_data, vk, peer_id):
+    """
+    Обрабатывает нажатие "Орел"/"Решка" в сообщении раунда: ставка берется из суммы,
+    введенной игроком после кнопки "Орел-Решка". Игроку отвечает только всплывающее уведомление.
+    """
+    with _chat_lock:
+        amount = pending_chat_bets.pop((peer_id, user_id), None)
+    if amount is None:
+        text = "Сначала нажмите «Орел-Решка» и введите ставку."
+    else:
+        text = place_chat_bet(user_id, amount, choice, player_data, peer_id) or f"Ставка {amount} на «{SIDE_NAMES[choice]}» принята."
+    vk.messages.sendMessageEventAnswer(
+        event_id=event.obj.event_id,
+        user_id=user_id,
+        peer_id=peer_id,
+        event_data=json.dumps({"type": "show_snackbar", "text": text})
+    )
+
+def settle_chat_round(peer_id, player_data, vk):
+    """
+    Подводит итоги раунда чата: один результат для всех ставок, выплаты одной пачкой
+    журнала балансов и одно итоговое сообщение. После раунда сид сервера раскрывается, и пара сидов чата сменяется.
+    Вызывается таймером раунда, поэтому данные игроков и сиды меняет под player_data_lock,
+    а записывает журнал балансов уже после нее.
+    """
+    with player_data_lock:
+        with _chat_lock:
+            chat_round = chat_rounds.pop(peer_id, None)
+            if chat_round is None:
+                return
+            for key in [key for key in pending_chat_bets if key[0] == peer_id]:
+                del pending_chat_bets[key]
+            result = round_outcome_coinflip(chat_round["seeds"])
+            winners, losers = [], []
+            for user_id, (amount, choice) in chat_round["bets"].items():
+                if choice == result:
+                    record_payout(player_data, user_id, amount * 2, "coinflip_chat")
+                    # В итогах — чистый выигрыш: выплата amount * 2 включает возвращенную ставку
+                    winners.append((user_id, amount))
+                else:
+                    losers.append((user_id, amount))
+        # Пара сидов чата сменяется после каждого раунда; раскрывается сид, по которому сыгран раунд
+        rotate_seeds(peer_id)
+    # Пачка пишется после освобождения player_data_lock, как и в раздаче
+    flush()
+    revealed = chat_round["seeds"]
+    logging.info(f"Раунд «Орел-Решка» в чате {peer_id}: {result}, ставок {len(chat_round['bets'])}")
+    if not chat_round["bets"]:
+        message = "Раунд «Орел-Решка» завершен без ставок."
+    else:
+        message = (f"Выпало: {SIDE_NAMES[result]}!\n"
+                   f"Выиграли: {format_bettors(winners, player_data, '+')}\n"
+                   f"Проиграли: {format_bettors(losers, player_data, '-')}")
+    send_message(
+        vk,
         peer_id=peer_id,
-        message=message,
-        random_id=random.randint(1, 1000)
+        message=(f"{message}\n"
+                 f"Сид сервера: {revealed['server_seed']}\n"
+                 f"Сид клиента: {revealed['client_seed']}, nonce: {chat_round['nonce']}\n"
+                 f"Проверка: python fairness.py coinflip <сид сервера> <сид клиента> <nonce>."
+                 f"{describe_commitment(chat_round['round'])}")
     )
-    save_player_data(player_data)
\ No newline at end of file
+
+def format_bettors(bettors, player_data, sign):
+    if not bettors:
+        return "никто"
+    bettors = sorted(bettors, key=lambda bettor: -bettor[1])
+    listed = ", ".join(f"{format_user_tag(user_id, player_data.get(str(user_id), {}))} {sign}{amount}"
+                       for user_id, amount in bettors[:MAX_LISTED_BETTORS])
+    if len(bettors) > MAX_LISTED_BETTORS:
+        listed += f" и еще {len(bettors) - MAX_LISTED_BETTORS}"
+    return listed
@@ -1,166 +1,515 @@
 import json
-import random
+import math
+import re
 import logging
-import hashlib
-import string
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from fractions import Fraction
+from concurrent.futures import ThreadPoolExecutor
 from vk_api.keyboard import VkKeyboard, VkKeyboardColor
-from data_manager import save_player_data
-from mines_visual import generate_field_image
+from ledger import InsufficientFunds, record_payout, record_stake
+from delivery import send_message
+from fairness import describe_commitment, describe_round, round_outcome_mines, start_round
+from mines_visual import generate_field_image, compose_field, create_field_canvas, paste_cell, encode_field
+from photo_cache import masks_fingerprint, get_cached_attachment, remember_attachment
+from render_pool import get_render_pool
 from vk_api import VkUpload
+from config import CONFIG
 
 # Константы для состояний ячеек
 MINE = "\u041c"  # Кириллическая "М"
 SAFE = "0"
 
-# Глобальный словарь для активных сессий игры "Мины"
+# Глобальный словарь для активных сессий игры "Мины".
+# Поле и выбранные ячейки хранятся битовыми масками: ячейке с номером n (от 1)
+# соответствует бит n - 1 (нумерация по строкам, как на изображении поля).
+#   "seeds"  — снимок сидов раунда из fairness.start_round; мины вычисляются по нему
+#              и в сессии не хранятся, смена сидов игрока во время раунда поле не меняет;
+#   "nonce"  — номер раунда игрока;
+#   "round"  — номер сида сервера раунда в общих коммитментах (см. commitments), None — сид без коммитмента;
+#   "picked" — маска выбранных игроком безопасных ячеек;
+#   "selected" — ячейки, отмеченные кнопками клавиатуры для следующего хода (см. cell_keyboard).
 mines_sessions = {}
 
-# Фиксированные настройки поля: размер 5x5
+# Состояние поля для отрисовки: маски нажатых ячеек, нераскрытых мин и взорванной мины
+BoardMasks = namedtuple("BoardMasks", ["press", "bomb", "explosion"])
+EMPTY_BOARD = BoardMasks(0, 0, 0)
+
+# Отрисованные холсты активных сессий (user_id -> PIL.Image) в порядке последнего использования.
+# Холст 1440x1440 RGBA занимает ~8 МБ, поэтому их число ограничено: вытесненный холст
+# при следующем ходе пересобирается целиком по выбранным ячейкам.
+mines_canvases = OrderedDict()
+MAX_SESSION_CANVASES = 32
+
+# Настройки поля: размер по умолчанию 5x5, игрок может выбрать от 3x3 до 8x8
 BOARD_SIZE = 5
 TOTAL_CELLS = BOARD_SIZE * BOARD_SIZE
+MIN_BOARD_SIZE = 3
+MAX_BOARD_SIZE = 8
+# Inline-клавиатура VK вмещает не больше 10 кнопок, поэтому ячейки в ней листаются
+# страницами по CELLS_PER_PAGE нераскрытых ячеек (см. cell_keyboard)
+CELLS_PER_PAGE = 5
 COEFF_FILE = "coefficients.json"
+DEFAULT_HOUSE_EDGE = "0.07"
+
+# Профиль кодирования изображений поля (см. mines_visual.OUTPUT_PROFILES)
+IMAGE_PROFILE = CONFIG.get("MINES_IMAGE_PROFILE", "png")
+
+# Бюджет задержки на отрисовку и загрузку изображения поля (в секундах).
+# Если сглаженная задержка превышает бюджет или в очереди пула отрисовки либо фоновой
+# догрузки итоговых полей накопилось FALLBACK_QUEUE_LIMIT изображений,
+# ход отвечается сразу текстовым полем; итоговые поля догружаются картинкой позже,
+# промежуточные — пропускаются. Раз в FALLBACK_PROBE_INTERVAL секунд выполняется
+# пробная отрисовка, чтобы вернуться к изображениям, когда задержка снизится.
+LATENCY_BUDGET = CONFIG.get("MINES_LATENCY_BUDGET", 2.0)
+FALLBACK_QUEUE_LIMIT = CONFIG.get("MINES_FALLBACK_QUEUE", 4)
+FALLBACK_PROBE_INTERVAL = 30.0
+LATENCY_SMOOTHING = 0.3
+
+# Состояние адаптивного режима и счетчики для мониторинга
+image_latency = {"ewma": 0.0, "last_probe": 0.0, "text_mode": False}
+text_fallback_stats = {"images": 0, "text_boards": 0, "deferred": 0, "skipped": 0, "switches": 0, "latency_saved": 0.0}
+_fallback_lock = threading.Lock()
+_deferred_sender = None
+# Изображения, поставленные в очередь фоновой догрузки и еще не отправленные
+_deferred_pending = 0
+
+# Поля из пула отрисовки готовы в произвольном порядке; в беседу они отправляются в порядке
+# ходов: peer_id -> {"next": номер следующего отправляемого поля, "last": последний выданный
+# номер, "ready": {номер: отправка или None, если поле не удалось загрузить},
+# "sending": поле беседы уже отправляет другой поток}
+_image_order = {}
+_image_order_lock = threading.Lock()
 
 def load_coefficients():
+    """
+    Загружает настройки коэффициентов. Сейчас в файле задается только преимущество
+    казино house_edge (доля от справедливого коэффициента), таблицы вычисляются.
+    """
     try:
         with open(COEFF_FILE, "r", encoding="utf-8") as f:
             data = json.load(f)
-        # Возвращаем коэффициенты для поля 5x5
-        return data.get("5", {})
+        return {"house_edge": str(data.get("house_edge", DEFAULT_HOUSE_EDGE))}
     except Exception as e:
         logging.error(f"Ошибка загрузки коэффициентов: {e}")
-        return {
-            "default": [1.0, 1.25, 1.50, 1.75, 2.00, 2.25, 2.50],
-            "custom": {}
-        }
+        return {"house_edge": DEFAULT_HOUSE_EDGE}
 
 COEFFICIENTS = load_coefficients()
 
-def build_grid_plain_with_random(grid_plain):
+def build_coefficient_table(board_size, mine_count, house_edge):
+    """
+    Таблица коэффициентов для поля board_size x board_size с mine_count минами.
+    Элемент k - 1 — коэффициент после k безопасных ходов:
+      (1 - house_edge) / P(k безопасных ходов подряд), P = C(N - M, k) / C(N, k)
+    (гипергеометрическая вероятность не задеть ни одной мины), с округлением вниз до сотых.
+    Вычисления ведутся в рациональных числах, поэтому округление не зависит от погрешности float.
+    """
+    total_cells = board_size * board_size
+    payout = 1 - Fraction(house_edge)
+    table = []
+    for picks in range(1, total_cells - mine_count + 1):
+        fair = Fraction(math.comb(total_cells, picks), math.comb(total_cells - mine_count, picks))
+        table.append(math.floor(payout * fair * 100) / 100)
+    return tuple(table)
+
+def build_coefficient_tables(house_edge, min_size=MIN_BOARD_SIZE, max_size=MAX_BOARD_SIZE):
+    """
+    Предвычисляет таблицы коэффициентов для всех поддерживаемых размеров поля и количеств мин.
+    Ключ — (board_size, mine_count).
+    """
+    tables = {}
+    for board_size in range(min_size, max_size + 1):
+        for mine_count in range(1, board_size * board_size):
+            tables[(board_size, mine_count)] = build_coefficient_table(board_size, mine_count, house_edge)
+    return tables
+
+COEFFICIENT_TABLES = build_coefficient_tables(COEFFICIENTS["house_edge"])
+
+def cell_bit(cell):
+    """
+    Бит ячейки с номером cell (от 1) в маске поля.
+    """
+    return 1 << (cell - 1)
+
+def mask_to_cells(mask):
+    """
+    Возвращает список номеров ячеек (от 1), биты которых установлены в маске.
+    """
+    cells = []
+    while mask:
+        low = mask & -mask
+        cells.append(low.bit_length())
+        mask ^= low
+    return cells
+
+def mask_to_grid_plain(mines_mask, board_size):
+    """
+    Строковое представление поля по строкам (безопасная ячейка = SAFE, мина = MINE).
+    """
+    return ''.join(MINE if mines_mask >> i & 1 else SAFE for i in range(board_size * board_size))
+
+def mask_to_grid(mines_mask, board_size):
+    """
+    Двумерный список поля (для текстовых функций раскрытия).
+    """
+    plain = mask_to_grid_plain(mines_mask, board_size)
+    return [list(plain[row * board_size:(row + 1) * board_size]) for row in range(board_size)]
+
+def session_mines(user_id, session):
+    """
+    Маска мин сессии, вычисленная по снимку сидов раунда.
+    """
+    return round_outcome_mines(session["seeds"], session.get("board_size", BOARD_SIZE), session["mine_count"])
+
+def reveal_text(user_id, session):
+    """
+    Данные для проверки завершенного раунда: сиды, nonce и расположение мин.
+    """
+    board_size = session.get("board_size", BOARD_SIZE)
+    return (f"{describe_round(session['seeds'])}\n"
+            f"Поле: {mask_to_grid_plain(session_mines(user_id, session), board_size)}\n"
+            f"Сид сервера раскрывается командой «сменить сид».{describe_commitment(session['round'])}")
+
+def board_state_from_masks(board, board_size):
+    """
+    Переводит BoardMasks в словарь состояний ячеек для mines_visual (только непустые ячейки).
+    """
+    state = {}
+    for status, mask in (("press", board.press), ("bomb", board.bomb), ("explosion", board.explosion)):
+        for cell in mask_to_cells(mask):
+            state[cell] = status
+    return state
+
+def start_mines_round(user_id, session, board_size, mine_count):
+    """
+    Начинает раунд: выдает игроку nonce и заполняет сессию для этапа выбора ячеек.
+    Возвращает строку с хешем сида сервера, сидом клиента и nonce для проверки честности.
+    """
+    session["mine_count"] = mine_count
+    session["state"] = "choose_cell"
+    session["safe_moves"] = 0
+    session["coef"] = 1.0
+    session["picked"] = 0
+    session["seeds"] = start_round(user_id, "mines")
+    session["nonce"], session["round"] = session["seeds"]["nonce"], session["seeds"]["round"]
+    return describe_round(session["seeds"])
+
+def get_session_canvas(user_id, session):
+    """
+    Возвращает отрисованный холст сессии, создавая его при необходимости.
+    Если холст был вытеснен из кэша, он собирается заново по маске выбранных ячеек.
+    """
+    key = str(user_id)
+    canvas = mines_canvases.get(key)
+    if canvas is not None:
+        mines_canvases.move_to_end(key)
+        return canvas
+    board_size = session.get("board_size", BOARD_SIZE)
+    picked = session.get("picked", 0)
+    if picked:
+        canvas = compose_field({cell: "press" for cell in mask_to_cells(picked)}, board_size=board_size)
+    else:
+        canvas = create_field_canvas(board_size=board_size)
+    mines_canvases[key] = canvas
+    while len(mines_canvases) > MAX_SESSION_CANVASES:
+        mines_canvases.popitem(last=False)
+    return canvas
+
+def end_mines_session(user_id):
+    """
+    Завершает сессию игры "Мины" и освобождает её холст.
+    """
+    mines_sessions.pop(str(user_id), None)
+    mines_canvases.pop(str(user_id), None)
+
+def record_image_latency(seconds):
+    """
+    Учитывает задержку отрисовки и загрузки одного изображения (экспоненциальное сглаживание).
+    """
+    with _fallback_lock:
+        if image_latency["ewma"] == 0.0:
+            image_latency["ewma"] = seconds
+        else:
+            image_latency["ewma"] += LATENCY_SMOOTHING * (seconds - image_latency["ewma"])
+
+def should_send_text_board():
     """
-    Формирует расширенное строковое представление поля.
-    К исходной строке (где безопасная ячейка = '0', а мина = MINE)
-    добавляется символ '|' и 10 случайных букво-цифровых символов.
-    Пример: "0000М00000М0000|jCNUIjnjnHUun"
+    Решает, отвечать ли на ход текстовым полем вместо изображения.
+    Текстовый режим включается, если сглаженная задержка превышает бюджет
+    или очередь пула отрисовки либо фоновой догрузки заполнена; раз в FALLBACK_PROBE_INTERVAL секунд
+    ход отправляется с изображением, чтобы обновить оценку задержки.
     """
-    random_chars = ''.join(random.choices(string.ascii_letters + string.digits, k=10))
-    return f"{grid_plain}|{random_chars}"
+    now = time.monotonic()
+    pool = get_render_pool()
+    with _fallback_lock:
+        queue_full = _deferred_pending >= FALLBACK_QUEUE_LIMIT or (pool is not None and pool.pending() >= FALLBACK_QUEUE_LIMIT)
+        use_text = queue_full or image_latency["ewma"] > LATENCY_BUDGET
+        if use_text != image_latency["text_mode"]:
+            image_latency["text_mode"] = use_text
+            text_fallback_stats["switches"] += 1
+            logging.info(f"Мины: {'текстовый' if use_text else 'графический'} режим поля "
+                         f"(задержка {image_latency['ewma']:.2f} с, бюджет {LATENCY_BUDGET} с)")
+        if use_text and not queue_full and now - image_latency["last_probe"] >= FALLBACK_PROBE_INTERVAL:
+            # Пробный ход с изображением обновит оценку задержки
+            image_latency["last_probe"] = now
+            return False
+    return use_text
 
-def encrypt_hash(plain_text):
+def upload_field_image(vk, board, game_over=False, canvas=None, board_size=BOARD_SIZE):
     """
-    Шифрует переданную строку с помощью MD5 и возвращает хеш в шестнадцатеричном виде.
+    Возвращает attachment изображения поля (board — BoardMasks): из кэша по отпечатку поля,
+    либо отрисовывает и загружает изображение в VK.
     """
-    return hashlib.md5(plain_text.encode("utf-8")).hexdigest()
+    fingerprint = masks_fingerprint(board_size, game_over, *board, profile=IMAGE_PROFILE)
+    attachment = get_cached_attachment(fingerprint)
+    if attachment is not None:
+        return attachment
+    started = time.perf_counter()
+    # Изображение формируется в памяти: без общего временного файла параллельные игры
+    # не перезаписывают друг другу поле, а диск не участвует в обработке хода.
+    # Холст сессии уже содержит все открытые ячейки, его остается только закодировать.
+    if canvas is not None:
+        image = encode_field(canvas, IMAGE_PROFILE)
+    else:
+        image = generate_field_image(board_state_from_masks(board, board_size), board_size=board_size,
+                                     game_over=game_over, profile=IMAGE_PROFILE)
+    upload = VkUpload(vk)
+    photo = upload.photo_messages(image)[0]
+    attachment = f"photo{photo['owner_id']}_{photo['id']}"
+    remember_attachment(fingerprint, attachment)
+    record_image_latency(time.perf_counter() - started)
+    return attachment
 
-def send_field_image(peer_id, vk, board_state, game_over=False, keyboard=None, message_text="Обновлённое игровое поле:"):
+def send_deferred_field_image(peer_id, vk, board, game_over=True, message_text="Итоговое поле:", board_size=BOARD_SIZE):
+    """
+    Отрисовывает и отправляет изображение поля в фоновом потоке, не задерживая обработку событий.
+    """
+    global _deferred_sender, _deferred_pending
+    if _deferred_sender is None:
+        _deferred_sender = ThreadPoolExecutor(max_workers=1, thread_name_prefix="mines-images")
+    def job():
+        global _deferred_pending
+        try:
+            attachment = upload_field_image(vk, board, game_over=game_over, board_size=board_size)
+            send_message(
+                vk,
+                peer_id=peer_id,
+                message=message_text,
+                attachment=attachment
+            )
+        except Exception as e:
+            logging.error(f"send_deferred_field_image: ошибка отправки поля в {peer_id}: {e}")
+        finally:
+            with _fallback_lock:
+                _deferred_pending -= 1
+    # Счетчик увеличивается до постановки задания: иначе задание могло бы завершиться
+    # и уменьшить его раньше
+    with _fallback_lock:
+        _deferred_pending += 1
+    try:
+        _deferred_sender.submit(job)
+    except Exception:
+        with _fallback_lock:
+            _deferred_pending -= 1
+        raise
+
+def _reserve_image_slot(peer_id):
+    with _image_order_lock:
+        order = _image_order.setdefault(peer_id, {"next": 1, "last": 0, "ready": {}, "sending": False})
+        order["last"] += 1
+        return order["last"]
+
+def _release_image_slot(peer_id, slot, send):
+    """
+    Отмечает поле slot беседы готовым (send — отправка или None) и отправляет готовые поля
+    по порядку. Отправляет один поток за раз (флаг "sending"), вне блокировки порядка:
+    поток обработки событий выдает номера, не дожидаясь запросов к VK.
+    """
+    with _image_order_lock:
+        order = _image_order[peer_id]
+        order["ready"][slot] = send
+        if order["sending"]:
+            return
+        order["sending"] = True
+    while True:
+        with _image_order_lock:
+            if order["next"] not in order["ready"]:
+                order["sending"] = False
+                if order["next"] > order["last"]:
+                    del _image_order[peer_id]
+                return
+            send = order["ready"].pop(order["next"])
+            order["next"] += 1
+        if send is not None:
+            try:
+                send()
+            except Exception as e:
+                logging.error(f"send_field_image: ошибка отправки поля в {peer_id}: {e}")
+
+def submit_field_image(pool, peer_id, vk, board, game_over=False, keyboard=None, message_text="Обновлённое игровое поле:", board_size=BOARD_SIZE):
+    """
+    Ставит отрисовку поля в пул процессов и сразу возвращается. Готовое изображение
+    загружается в VK и отправляется в потоке результатов пула, в порядке ходов беседы.
+    Возвращает False, если очередь пула заполнена.
+    """
+    fingerprint = masks_fingerprint(board_size, game_over, *board, profile=IMAGE_PROFILE)
+    keyboard_json = keyboard.get_keyboard() if keyboard else None
+    started = time.perf_counter()
+    slot = _reserve_image_slot(peer_id)
+    def on_done(image):
+        send = None
+        try:
+            photo = VkUpload(vk).photo_messages(image)[0]
+            attachment = f"photo{photo['owner_id']}_{photo['id']}"
+            remember_attachment(fingerprint, attachment)
+            record_image_latency(time.perf_counter() - started)
+            send = lambda: send_message(vk, peer_id=peer_id, message=message_text, attachment=attachment,
+                                        keyboard=keyboard_json)
+            with _fallback_lock:
+                text_fallback_stats["images"] += 1
+        finally:
+            _release_image_slot(peer_id, slot, send)
+    try:
+        accepted = pool.submit(board_state_from_masks(board, board_size), on_done, board_size=board_size,
+                               game_over=game_over, profile=IMAGE_PROFILE)
+    except Exception:
+        accepted = False
+    if not accepted:
+        _release_image_slot(peer_id, slot, None)
+    return accepted
+
+def send_field_image(peer_id, vk, board, game_over=False, keyboard=None, message_text="Обновлённое игровое поле:", canvas=None, text_board=None, board_size=BOARD_SIZE):
     """
     Генерирует изображение игрового поля с помощью generate_field_image,
     выгружает его на VK, и отправляет сообщение с прикрепленным изображением.
     Если передан параметр keyboard, то кнопки отображаются в том же сообщении.
     
+    Одинаковые поля (например, пустое стартовое) загружаются один раз: attachment
+    запоминается по отпечатку поля, и при повторе отрисовка и загрузка пропускаются.
+    
     Параметры:
-      - board_state: словарь состояний ячеек.
+      - board: состояние поля BoardMasks (маски нажатых ячеек, мин и взорванной мины).
       - game_over: если True, поле считается раскрытым.
       - keyboard: объект VkKeyboard (или None).
       - message_text: текст сообщения.
+      - canvas: уже отрисованный холст сессии; если передан, поле не пересобирается
+                по board, а только кодируется. Не используется, если запущен пул отрисовки:
+                тогда поле собирается и кодируется в процессе пула, а сообщение отправляется
+                после загрузки, не задерживая обработку событий (см. submit_field_image).
+      - text_board: текстовое представление поля. Если передано и отрисовка не укладывается
+                    в бюджет задержки (см. should_send_text_board), сообщение отправляется
+                    сразу с текстовым полем, а изображение догружается позже (game_over)
+                    или пропускается.
+      - board_size: размер поля (число ячеек по строке/столбцу).
     """
-    image_path = generate_field_image(board_state, board_size=BOARD_SIZE, game_over=game_over)
-    upload = VkUpload(vk)
-    photo = upload.photo_messages(image_path)[0]
-    attachment = f"photo{photo['owner_id']}_{photo['id']}"
-    vk.messages.send(
+    fingerprint = masks_fingerprint(board_size, game_over, *board, profile=IMAGE_PROFILE)
+    attachment = get_cached_attachment(fingerprint)
+    if attachment is None and text_board is not None and should_send_text_board():
+        send_message(
+            vk,
+            peer_id=peer_id,
+            message=f"{message_text}\n{text_board}",
+            keyboard=keyboard.get_keyboard() if keyboard else None
+        )
+        with _fallback_lock:
+            text_fallback_stats["text_boards"] += 1
+            text_fallback_stats["latency_saved"] += image_latency["ewma"]
+            text_fallback_stats["deferred" if game_over else "skipped"] += 1
+        if game_over:
+            send_deferred_field_image(peer_id, vk, board, board_size=board_size)
+        return
+    if attachment is None:
+        pool = get_render_pool()
+        if pool is not None and submit_field_image(pool, peer_id, vk, board, game_over=game_over, keyboard=keyboard,
+                                                   message_text=message_text, board_size=board_size):
+            return
+        # Пул не запущен или его очередь заполнена: поле рисуется в потоке обработки событий
+        attachment = upload_field_image(vk, board, game_over=game_over, canvas=canvas, board_size=board_size)
+    with _fallback_lock:
+        text_fallback_stats["images"] += 1
+    send_message(
+        vk,
         peer_id=peer_id,
         message=message_text,
         attachment=attachment,
-        keyboard=keyboard.get_keyboard() if keyboard else None,
-        random_id=random.randint(1, 1000)
+        keyboard=keyboard.get_keyboard() if keyboard else None
     )
 
-def build_final_board_state(grid, chosen_cells, board_size):
-    """
-    Формирует итоговое состояние поля для финального раскрытия.
-    Для каждой ячейки:
-      - Если в клетке находится мина: статус "bomb"
-      - Если клетка безопасна и была выбрана: статус "press"
-      - Иначе: статус "empty"
-    """
-    state = {}
-    cell = 1
-    for i in range(board_size):
-        for j in range(board_size):
-            if grid[i][j] == MINE:
-                state[cell] = "bomb"
-            else:
-                if cell in chosen_cells:
-                    state[cell] = "press"
-                else:
-                    state[cell] = "empty"
-            cell += 1
-    return state
-
 def start_mines(user_id, stake, player_data, vk, peer_id):
     # Проверяем, что ставка не меньше 1
     if stake < 1:
-        vk.messages.send(
+        send_message(
+            vk,
             peer_id=peer_id,
-            message="Ставка должна быть не меньше 1.",
-            random_id=random.randint(1, 1000)
+            message="Ставка должна быть не меньше 1."
         )
         return
 
-    # Проверяем баланс игрока
-    current_balance = int(player_data.get(str(user_id), {}).get("balance", 0))
-    if current_balance < stake:
-        vk.messages.send(
+    # Ставка списывается, только если на балансе достаточно средств (проверка и списание атомарны)
+    logging.debug(f"start_mines: пользователь {user_id} начинает игру 'Мины' со ставкой {stake}.")
+    try:
+        record_stake(player_data, user_id, stake, "mines")
+    except InsufficientFunds:
+        send_message(
+            vk,
             peer_id=peer_id,
-            message="Недостаточно средств для игры 'Мины'.",
-            random_id=random.randint(1, 1000)
+            message="Недостаточно средств для игры 'Мины'."
         )
         return
-
-    logging.debug(f"start_mines: пользователь {user_id} начинает игру 'Мины' со ставкой {stake}.")
-    player_data[str(user_id)]["balance"] -= stake
     logging.debug(f"start_mines: новый баланс пользователя {user_id}: {player_data[str(user_id)]['balance']}")
 
-    # Поле фиксированное 5x5, сразу запрашиваем количество мин.
+    # Сначала игрок выбирает размер поля (кнопками или вводом числа)
     mines_sessions[str(user_id)] = {
         "stake": stake,
-        "state": "choose_mine_count",
+        "state": "choose_field",
         "board_size": BOARD_SIZE
     }
-    vk.messages.send(
+    keyboard = VkKeyboard(inline=True)
+    for size in range(MIN_BOARD_SIZE, MAX_BOARD_SIZE + 1):
+        if size > MIN_BOARD_SIZE and (size - MIN_BOARD_SIZE) % 3 == 0:
+            keyboard.add_line()
+        color = VkKeyboardColor.PRIMARY if size == BOARD_SIZE else VkKeyboardColor.SECONDARY
+        keyboard.add_callback_button(f"{size}x{size}", color=color,
+                                     payload={"command": "mines_field", "size": size})
+    send_message(
+        vk,
         peer_id=peer_id,
-        message=(f"Ставка {stake} принята. Игра проводится на поле {BOARD_SIZE}x{BOARD_SIZE}.\n"
-                 f"Введите количество мин (от 1 до {TOTAL_CELLS - 1}):"),
-        random_id=random.randint(1, 1000)
+        message=(f"Ставка {stake} принята. Выберите размер поля "
+                 f"(от {MIN_BOARD_SIZE} до {MAX_BOARD_SIZE}):"),
+        keyboard=keyboard.get_keyboard()
     )
     logging.debug(f"start_mines: сессия для пользователя {user_id} -> {mines_sessions[str(user_id)]}")
 
 def process_mines_field(event, user_id, size, player_data, vk, peer_id):
     """
-    Функция для выбора размера поля (для совместимости).
-    Поскольку поле фиксированное 5x5, данная функция не используется для логики игры.
+    Обрабатывает выбор размера поля (кнопкой или текстом; для текста event = None).
+    Допустимы размеры от MIN_BOARD_SIZE до MAX_BOARD_SIZE.
     """
     try:
         size = int(size)
-    except ValueError:
-        vk.messages.send(
+    except (TypeError, ValueError):
+        size = None
+    if size is None or not MIN_BOARD_SIZE <= size <= MAX_BOARD_SIZE:
+        send_message(
+            vk,
             peer_id=peer_id,
-            message="Ошибка: неверный размер поля.",
-            random_id=random.randint(1, 1000)
+            message=f"Ошибка: размер поля должен быть от {MIN_BOARD_SIZE} до {MAX_BOARD_SIZE}."
         )
         return
-    vk.messages.sendMessageEventAnswer(
-        event_id=event.obj.event_id,
-        user_id=user_id,
-        peer_id=peer_id,
-        event_data=json.dumps({"type": "show_snackbar", "text": f"Размер {size}x{size} выбран."})
-    )
+    if event is not None:
+        vk.messages.sendMessageEventAnswer(
+            event_id=event.obj.event_id,
+            user_id=user_id,
+            peer_id=peer_id,
+            event_data=json.dumps({"type": "show_snackbar", "text": f"Размер {size}x{size} выбран."})
+        )
     session = mines_sessions.get(str(user_id))
     if not session or session.get("state") != "choose_field":
-        vk.messages.send(
+        send_message(
+            vk,
             peer_id=peer_id,
-            message="Сессия игры не найдена. Начните игру заново.",
-            random_id=random.randint(1, 1000)
+            message="Сессия игры не найдена. Начните игру заново."
         )
         logging.error(f"process_mines_field: сессия не найдена или неправильное состояние для пользователя {user_id}")
         return
@@ -174,11 +523,11 @@ def process_mines_field(event, user_id, size, player_data, vk, peer_id):
                                  payload={"command": "mines_option", "option": "default"})
     keyboard.add_callback_button("Выбрать количество мин", color=VkKeyboardColor.SECONDARY,
                                  payload={"command": "mines_option", "option": "custom"})
-    vk.messages.send(
+    send_message(
+        vk,
         peer_id=peer_id,
         message=f"Вы выбрали поле {size}x{size}. Выберите опцию:",
-        keyboard=keyboard.get_keyboard(),
-        random_id=random.randint(1, 1000)
+        keyboard=keyboard.get_keyboard()
     )
 
 def process_mines_option(event, user_id, option, player_data, vk, peer_id):
@@ -191,10 +540,10 @@ def process_mines_option(event, user_id, option, player_data, vk, peer_id):
     )
     session = mines_sessions.get(str(user_id))
     if not session or session.get("state") not in ["choose_option", "choose_mine_count"]:
-        vk.messages.send(
+        send_message(
+            vk,
             peer_id=peer_id,
-            message="Сессия игры не найдена. Начните игру заново.",
-            random_id=random.randint(1, 1000)
+            message="Сессия игры не найдена. Начните игру заново."
         )
         logging.error(f"process_mines_option: сессия не найдена или неправильное состояние для пользователя {user_id}")
         return
@@ -203,45 +552,37 @@ def process_mines_option(event, user_id, option, player_data, vk, peer_id):
     if option == "default":
         mine_count = 2
         if total_cells - mine_count < 1:
-            vk.messages.send(
+            send_message(
+                vk,
                 peer_id=peer_id,
-                message="Невозможно разместить столько мин на поле.",
-                random_id=random.randint(1, 1000)
+                message="Невозможно разместить столько мин на поле."
             )
             logging.error(f"process_mines_option: недопустимое количество мин для поля {board_size}x{board_size}")
             return
-        session["mine_count"] = mine_count
-        session["state"] = "choose_cell"
-        session["safe_moves"] = 0
-        session["coef"] = 1.0
-        session["chosen_cells"] = []
-        grid, grid_plain = generate_mines_grid(board_size, mine_count)
-        grid_plain_ext = build_grid_plain_with_random(grid_plain)
-        encrypted_hash = encrypt_hash(grid_plain_ext)
-        session["grid"] = grid
-        session["grid_hash"] = encrypted_hash
-        session["grid_plain"] = grid_plain_ext
-        # Начальное состояние поля: все ячейки "empty"
-        board_state = {cell: "empty" for cell in range(1, total_cells + 1)}
+        commitment = start_mines_round(user_id, session, board_size, mine_count)
+        # Начальное состояние поля: все ячейки "empty". Оно одинаково для всех игр,
+        # поэтому после первой загрузки берется из кэша изображений.
         # Отправляем сообщение с картинкой поля и хешем в одном сообщении
         initial_message = (f"Игра началась с {board_size}x{board_size} и {mine_count} минами.\n"
-                           f"Хеш (MD5): {encrypted_hash}\n"
-                           f"Введите номер ячейки (от 1 до {total_cells}):")
-        send_field_image(peer_id, vk, board_state, message_text=initial_message)
+                           f"{commitment}\n"
+                           f"Введите номер ячейки (от 1 до {total_cells}) или несколько через пробел:")
+        send_field_image(peer_id, vk, EMPTY_BOARD, message_text=initial_message, keyboard=cell_keyboard(session),
+                         text_board=format_full_board(board_size, []), board_size=board_size)
     elif option == "custom":
         session["state"] = "choose_mine_count"
-        vk.messages.send(
+        send_message(
+            vk,
             peer_id=peer_id,
-            message=f"Введите количество мин (от 1 до {total_cells - 1}):",
-            random_id=random.randint(1, 1000)
+            message=f"Введите количество мин (от 1 до {total_cells - 1}):"
         )
     else:
-        vk.messages.send(
+        send_message(
+            vk,
             peer_id=peer_id,
-            message="Неверная опция.",
-            random_id=random.randint(1, 1000)
+            message="Неверная опция."
         )
-    logging.debug(f"process_mines_option: обновлена сессия для пользователя {user_id}: {session}")
+    # Сессия содержит нераскрытый сид сервера, поэтому в лог пишется только ее состояние
+    logging.debug(f"process_mines_option: пользователь {user_id}, состояние {session.get('state')}")
 
 def process_mines_text(user_id, text, player_data, vk, peer_id):
     logging.debug(f"process_mines_text: получен текст '{text}' от пользователя {user_id}")
@@ -254,43 +595,38 @@ def process_mines_text(user_id, text, player_data, vk, peer_id):
     total_cells = board_size * board_size
     logging.debug(f"process_mines_text: состояние для пользователя {user_id} = {state}, поле: {board_size}x{board_size}")
 
+    # Фаза: ввод размера поля текстом
+    if state == "choose_field":
+        process_mines_field(None, user_id, text, player_data, vk, peer_id)
+        return True
+
     # Фаза: ввод количества мин
     if state == "choose_mine_count":
         try:
             mine_count = int(text)
         except ValueError:
-            vk.messages.send(
+            send_message(
+                vk,
                 peer_id=peer_id,
-                message="Введите корректное число для количества мин.",
-                random_id=random.randint(1, 1000)
+                message="Введите корректное число для количества мин."
             )
             return True
         if mine_count < 1 or mine_count >= total_cells:
-            vk.messages.send(
+            send_message(
+                vk,
                 peer_id=peer_id,
-                message=f"Количество мин должно быть от 1 до {total_cells - 1}.",
-                random_id=random.randint(1, 1000)
+                message=f"Количество мин должно быть от 1 до {total_cells - 1}."
             )
             return True
-        session["mine_count"] = mine_count
-        session["state"] = "choose_cell"
-        session["safe_moves"] = 0
-        session["coef"] = 1.0
-        session["chosen_cells"] = []
-        grid, grid_plain = generate_mines_grid(board_size, mine_count)
-        grid_plain_ext = build_grid_plain_with_random(grid_plain)
-        encrypted_hash = encrypt_hash(grid_plain_ext)
-        session["grid"] = grid
-        session["grid_hash"] = encrypted_hash
-        session["grid_plain"] = grid_plain_ext
-        board_state = {cell: "empty" for cell in range(1, total_cells + 1)}
-        send_field_image(peer_id, vk, board_state)
-        vk.messages.send(
+        commitment = start_mines_round(user_id, session, board_size, mine_count)
+        send_field_image(peer_id, vk, EMPTY_BOARD, text_board=format_full_board(board_size, []), board_size=board_size)
+        send_message(
+            vk,
             peer_id=peer_id,
             message=(f"Игра началась на поле {board_size}x{board_size} с {mine_count} минами.\n"
-                     f"Хеш (MD5): {encrypted_hash}\n"
-                     f"Введите номер ячейки (от 1 до {total_cells}):"),
-            random_id=random.randint(1, 1000)
+                     f"{commitment}\n"
+                     f"Введите номер ячейки (от 1 до {total_cells}) или несколько через пробел:"),
+            keyboard=cell_keyboard(session).get_keyboard()
         )
         return True
 
@@ -300,135 +636,256 @@ def process_mines_text(user_id, text, player_data, vk, peer_id):
             coef = session.get("coef", 1.0)
             stake = session.get("stake")
             win = stake * coef
-            player_data[str(user_id)]["balance"] += win
-            final_board_state = build_final_board_state(session["grid"], session.get("chosen_cells", []), board_size)
-            send_field_image(peer_id, vk, final_board_state, game_over=True)
-            vk.messages.send(
+            record_payout(player_data, user_id, win, "mines")
+            mines = session_mines(user_id, session)
+            send_field_image(peer_id, vk, BoardMasks(session["picked"], mines, 0), game_over=True,
+                             text_board=reveal_board_on_complete(mask_to_grid(mines, board_size),
+                                                                 mask_to_cells(session["picked"])),
+                             board_size=board_size)
+            send_message(
+                vk,
                 peer_id=peer_id,
                 message=(f"Поздравляем! Вы забрали выигрыш {win:.2f} Glitch⚡.\n"
                          f"Ваш баланс: {player_data[str(user_id)]['balance']} Glitch⚡.\n"
-                         f"Хеш (MD5): {session.get('grid_hash')}\n"
-                         f"Расшифровка: {session.get('grid_plain')}"),
-                random_id=random.randint(1, 1000)
+                         f"{reveal_text(user_id, session)}")
             )
-            del mines_sessions[str(user_id)]
+            end_mines_session(user_id)
             return True
         else:
             try:
-                cell_number = int(text)
-                logging.debug(f"process_mines_text: распознано число ячейки {cell_number} для пользователя {user_id}")
+                cells = parse_cells(text)
+                logging.debug(f"process_mines_text: распознаны ячейки {cells} для пользователя {user_id}")
             except ValueError:
-                vk.messages.send(
-                    peer_id=peer_id,
-                    message="Введите корректный номер ячейки или 'забрать', чтобы завершить игру.",
-                    random_id=random.randint(1, 1000)
-                )
-                return True
-            if cell_number < 1 or cell_number > total_cells:
-                vk.messages.send(
-                    peer_id=peer_id,
-                    message=f"Номер ячейки должен быть от 1 до {total_cells}.",
-                    random_id=random.randint(1, 1000)
-                )
-                return True
-            if cell_number in session.get("chosen_cells", []):
-                vk.messages.send(
+                send_message(
+                    vk,
                     peer_id=peer_id,
-                    message="Эта ячейка уже была выбрана. Выберите другую.",
-                    random_id=random.randint(1, 1000)
+                    message="Введите номер ячейки (или несколько через пробел) или 'забрать', чтобы завершить игру."
                 )
                 return True
-            row = (cell_number - 1) // board_size
-            col = (cell_number - 1) % board_size
-            grid = session.get("grid")
-            if grid[row][col] == MINE:
-                # Если игрок нажал на мину, формируем финальное состояние поля:
-                # Все мины раскрыты, а для ячейки, в которую нажали, статус "explosion"
-                board_state = build_final_board_state(session["grid"], session.get("chosen_cells", []), board_size)
-                board_state[cell_number] = "explosion"
-                send_field_image(peer_id, vk, board_state, game_over=True)
-                vk.messages.send(
+            error = check_cells(session, cells)
+            if error:
+                send_message(
+                    vk,
                     peer_id=peer_id,
-                    message=(f"Вы проиграли! Вы попали на мину в ячейке {cell_number}.\n"
-                             f"Хеш (MD5): {session.get('grid_hash')}\n"
-                             f"Расшифровка: {session.get('grid_plain')}"),
-                    random_id=random.randint(1, 1000)
-                )
-                del mines_sessions[str(user_id)]
-                return True
-            else:
-                session["chosen_cells"].append(cell_number)
-                session["safe_moves"] = session.get("safe_moves", 0) + 1
-                mine_count = session.get("mine_count")
-                coef = get_current_coefficient(mine_count, session["safe_moves"])
-                session["coef"] = coef
-                board_state = {cell: "empty" for cell in range(1, total_cells + 1)}
-                for cell in session.get("chosen_cells", []):
-                    board_state[cell] = "press"
-                # Создаем клавиатуру с кнопкой "Забрать"
-                keyboard = VkKeyboard(inline=True)
-                keyboard.add_callback_button("Забрать", color=VkKeyboardColor.POSITIVE,
-                                             payload={"command": "mines_move", "option": "take"})
-                send_field_image(
-                    peer_id, vk, board_state,
-                    keyboard=keyboard,
-                    message_text=(f"В ячейке {cell_number} мины нет.\n"
-                                  f"Текущий коэффициент: {coef:.2f}\n"
-                                  f"Хеш (MD5): {session.get('grid_hash')}\n"
-                                  "Нажмите 'Забрать', чтобы забрать выигрыш.")
+                    message=error
                 )
                 return True
+            reveal_cells(user_id, session, cells, vk, peer_id)
+            return True
     else:
         logging.debug(f"process_mines_text: необрабатываемое состояние {state} для пользователя {user_id}")
         return False
 
+def parse_cells(text):
+    """
+    Номера ячеек из сообщения вида "3 7 12" (разделители — пробелы, запятые, точки с запятой).
+    Бросает ValueError, если сообщение содержит что-то кроме чисел.
+    """
+    parts = [part for part in re.split(r"[\s,;]+", text) if part]
+    if not parts:
+        raise ValueError("нет номеров ячеек")
+    return [int(part) for part in parts]
+
+def check_cells(session, cells):
+    """
+    Проверяет набор ячеек перед открытием. Возвращает текст ошибки или None.
+    """
+    total_cells = session.get("board_size", BOARD_SIZE) ** 2
+    for cell_number in cells:
+        if cell_number < 1 or cell_number > total_cells:
+            return f"Номер ячейки должен быть от 1 до {total_cells}."
+    if len(set(cells)) != len(cells):
+        return "Ячейки в одном ходе не должны повторяться."
+    for cell_number in cells:
+        if session["picked"] & cell_bit(cell_number):
+            return f"Ячейка {cell_number} уже была выбрана. Выберите другую."
+    return None
+
+def cell_pages(session):
+    """
+    Нераскрытые ячейки поля, разбитые на страницы клавиатуры по CELLS_PER_PAGE.
+    """
+    board_size = session.get("board_size", BOARD_SIZE)
+    cells = [cell_number for cell_number in range(1, board_size * board_size + 1)
+             if not session.get("picked", 0) & cell_bit(cell_number)]
+    return [cells[start:start + CELLS_PER_PAGE] for start in range(0, len(cells), CELLS_PER_PAGE)]
+
+def cell_keyboard(session, page=0):
+    """
+    Inline-клавиатура хода: страница page нераскрытых ячеек (нажатие отмечает ячейку,
+    не отправляя сообщений), листание страниц, открытие отмеченных ячеек и, когда
+    открыта хотя бы одна ячейка, "Забрать". Кнопок не больше 9 при любом размере поля.
+    """
+    pages = cell_pages(session)
+    page = min(max(page, 0), len(pages) - 1)
+    keyboard = VkKeyboard(inline=True)
+    for cell_number in pages[page]:
+        keyboard.add_callback_button(str(cell_number), color=VkKeyboardColor.PRIMARY,
+                                     payload={"command": "mines_move", "option": "select", "cell": cell_number})
+    keyboard.add_line()
+    if page > 0:
+        keyboard.add_callback_button("◀", color=VkKeyboardColor.SECONDARY,
+                                     payload={"command": "mines_move", "option": "page", "page": page - 1})
+    keyboard.add_callback_button("Открыть", color=VkKeyboardColor.PRIMARY,
+                                 payload={"command": "mines_move", "option": "reveal"})
+    if page + 1 < len(pages):
+        keyboard.add_callback_button("▶", color=VkKeyboardColor.SECONDARY,
+                                     payload={"command": "mines_move", "option": "page", "page": page + 1})
+    if session.get("picked", 0):
+        keyboard.add_line()
+        keyboard.add_callback_button("Забрать", color=VkKeyboardColor.POSITIVE,
+                                     payload={"command": "mines_move", "option": "take"})
+    return keyboard
+
+def reveal_cells(user_id, session, cells, vk, peer_id):
+    """
+    Открывает ячейки cells по порядку до первой мины.
+    Поле отрисовывается, загружается и отправляется один раз на весь набор ячеек.
+    """
+    board_size = session.get("board_size", BOARD_SIZE)
+    mines = session_mines(user_id, session)
+    session.pop("selected", None)
+    canvas = None
+    # С пулом отрисовки поле собирается в его процессах по маскам, холст сессии не нужен
+    use_canvas = get_render_pool() is None
+    opened = []
+    for cell_number in cells:
+        bit = cell_bit(cell_number)
+        if mines & bit:
+            # Если игрок нажал на мину, формируем финальное состояние поля:
+            # Все мины раскрыты, а для ячейки, в которую нажали, статус "explosion"
+            board = BoardMasks(session["picked"], mines & ~bit, bit)
+            send_field_image(peer_id, vk, board, game_over=True,
+                             text_board=reveal_board_on_loss(mask_to_grid(mines, board_size),
+                                                             mask_to_cells(session["picked"]), cell_number),
+                             board_size=board_size)
+            opened_text = f"Без мин: {', '.join(map(str, opened))}.\n" if opened else ""
+            send_message(
+                vk,
+                peer_id=peer_id,
+                message=(f"{opened_text}Вы проиграли! Вы попали на мину в ячейке {cell_number}.\n"
+                         f"{reveal_text(user_id, session)}")
+            )
+            end_mines_session(user_id)
+            return
+        # Дорисовываем только новые ячейки на холсте сессии вместо пересборки всего поля.
+        # Холст берется до добавления ячеек в маску выбранных, чтобы при его пересборке
+        # новые ячейки не были наложены дважды.
+        if use_canvas:
+            if canvas is None:
+                canvas = get_session_canvas(user_id, session)
+            paste_cell(canvas, cell_number, "press", board_size=board_size)
+        session["picked"] |= bit
+        opened.append(cell_number)
+    session["safe_moves"] = session.get("safe_moves", 0) + len(opened)
+    coef = get_current_coefficient(session.get("mine_count"), session["safe_moves"], board_size)
+    session["coef"] = coef
+    if len(opened) == 1:
+        opened_text = f"В ячейке {opened[0]} мины нет."
+    else:
+        opened_text = f"В ячейках {', '.join(map(str, opened))} мин нет."
+    send_field_image(
+        peer_id, vk, BoardMasks(session["picked"], 0, 0),
+        keyboard=cell_keyboard(session),
+        canvas=canvas,
+        text_board=format_full_board(board_size, mask_to_cells(session["picked"])),
+        board_size=board_size,
+        message_text=(f"{opened_text}\n"
+                      f"Текущий коэффициент: {coef:.2f}\n"
+                      f"{describe_round(session['seeds'])}\n"
+                      "Нажмите 'Забрать', чтобы забрать выигрыш.")
+    )
+
+def answer_move(event, user_id, peer_id, vk, text):
+    vk.messages.sendMessageEventAnswer(
+        event_id=event.obj.event_id,
+        user_id=user_id,
+        peer_id=peer_id,
+        event_data=json.dumps({"type": "show_snackbar", "text": text})
+    )
+
 def handle_mines_move(event, user_id, player_data, vk, peer_id):
     """
-    Обрабатывает callback, когда игрок нажимает кнопку "Забрать".
+    Обрабатывает callback-кнопки хода: "Забрать" (take), отметку ячейки (select),
+    листание страниц ячеек (page) и открытие всех отмеченных ячеек одним ходом (reveal).
     """
     session = mines_sessions.get(str(user_id))
     if not session or session.get("state") != "choose_cell":
-        vk.messages.send(
+        send_message(
+            vk,
             peer_id=peer_id,
-            message="Сессия игры не найдена. Начните игру заново.",
-            random_id=random.randint(1, 1000)
+            message="Сессия игры не найдена. Начните игру заново."
         )
         return
     option = event.obj.payload.get("option")
-    if option == "take":
+    if option == "select":
+        cell_number = int(event.obj.payload.get("cell", 0))
+        selected = session.setdefault("selected", [])
+        if cell_number in selected:
+            selected.remove(cell_number)
+        else:
+            error = check_cells(session, [cell_number])
+            if error:
+                answer_move(event, user_id, peer_id, vk, error)
+                return
+            selected.append(cell_number)
+        if selected:
+            answer_move(event, user_id, peer_id, vk, f"Отмечены ячейки: {', '.join(map(str, selected))}. Нажмите 'Открыть'.")
+        else:
+            answer_move(event, user_id, peer_id, vk, "Отметка снята.")
+    elif option == "page":
+        page = int(event.obj.payload.get("page", 0))
+        pages = cell_pages(session)
+        page = min(max(page, 0), len(pages) - 1)
+        answer_move(event, user_id, peer_id, vk, f"Страница {page + 1} из {len(pages)}.")
+        send_message(
+            vk,
+            peer_id=peer_id,
+            message=f"Ячейки {pages[page][0]}–{pages[page][-1]}:",
+            keyboard=cell_keyboard(session, page).get_keyboard()
+        )
+    elif option == "reveal":
+        cells = session.pop("selected", [])
+        error = check_cells(session, cells) if cells else "Сначала отметьте ячейки."
+        answer_move(event, user_id, peer_id, vk, error or "Открываем ячейки.")
+        if not error:
+            reveal_cells(user_id, session, cells, vk, peer_id)
+    elif option == "take":
         coef = session.get("coef", 1.0)
         stake = session.get("stake")
         win = stake * coef
-        player_data[str(user_id)]["balance"] += win
-        total_cells = BOARD_SIZE * BOARD_SIZE
-        board_state = build_final_board_state(session["grid"], session.get("chosen_cells", []), BOARD_SIZE)
-        send_field_image(peer_id, vk, board_state, game_over=True)
-        vk.messages.send(
+        record_payout(player_data, user_id, win, "mines")
+        board_size = session.get("board_size", BOARD_SIZE)
+        mines = session_mines(user_id, session)
+        send_field_image(peer_id, vk, BoardMasks(session["picked"], mines, 0), game_over=True,
+                         text_board=reveal_board_on_complete(mask_to_grid(mines, board_size),
+                                                             mask_to_cells(session["picked"])),
+                         board_size=board_size)
+        send_message(
+            vk,
             peer_id=peer_id,
             message=(f"Поздравляем! Вы забрали выигрыш {win:.2f} Glitch⚡.\n"
                      f"Ваш баланс: {player_data[str(user_id)]['balance']} Glitch⚡.\n"
-                     f"Хеш (MD5): {session.get('grid_hash')}\n"
-                     f"Расшифровка: {session.get('grid_plain')}"),
-            random_id=random.randint(1, 1000)
+                     f"{reveal_text(user_id, session)}")
         )
-        del mines_sessions[str(user_id)]
+        end_mines_session(user_id)
     else:
-        vk.messages.send(
+        send_message(
+            vk,
             peer_id=peer_id,
-            message="Неверный выбор. Попробуйте снова.",
-            random_id=random.randint(1, 1000)
+            message="Неверный выбор. Попробуйте снова."
         )
 
-def get_current_coefficient(mine_count, safe_moves):
+def get_current_coefficient(mine_count, safe_moves, board_size=BOARD_SIZE):
     """
-    Возвращает текущий коэффициент на основе количества безопасных ходов.
-    Если для заданного числа мин есть свой список коэффициентов, используется он,
-    иначе возвращается список по умолчанию.
+    Возвращает текущий коэффициент на основе количества безопасных ходов
+    по предвычисленной таблице для размера поля и количества мин.
+    Таблицы заполняются один раз при загрузке модуля; для сочетания вне них
+    таблица вычисляется без сохранения, общие таблицы не меняются.
     """
-    if str(mine_count) in COEFFICIENTS.get("custom", {}):
-        coeff_list = COEFFICIENTS["custom"][str(mine_count)]
-    else:
-        coeff_list = COEFFICIENTS.get("default", [1.0])
+    coeff_list = COEFFICIENT_TABLES.get((board_size, mine_count))
+    if coeff_list is None:
+        coeff_list = build_coefficient_table(board_size, mine_count, COEFFICIENTS["house_edge"])
     index = safe_moves - 1
     if index < 0:
         index = 0
@@ -436,24 +893,6 @@ def get_current_coefficient(mine_count, safe_moves):
         index = len(coeff_list) - 1
     return coeff_list[index]
 
-def generate_mines_grid(board_size, mine_count):
-    """
-    Генерирует игровое поле для "Мины" с заданным числом мин.
-    Возвращает:
-      - grid: двумерный список, представляющий поле;
-      - grid_str: строковое представление поля, где безопасная ячейка = SAFE, а мина = MINE.
-    """
-    grid = [[SAFE for _ in range(board_size)] for _ in range(board_size)]
-    placed = 0
-    while placed < mine_count:
-        r = random.randint(0, board_size - 1)
-        c = random.randint(0, board_size - 1)
-        if grid[r][c] != MINE:
-            grid[r][c] = MINE
-            placed += 1
-    grid_str = ''.join([''.join(row) for row in grid])
-    return grid, grid_str
-
 def format_full_board(board_size, chosen_cells):
     """
     Форматирует текущее состояние поля для текстового отображения.
@@ -1,18 +1,39 @@
 import re
 import json
-import random
 import logging
 from vk_api.keyboard import VkKeyboard, VkKeyboardColor
-from data_manager import save_player_data, load_player_data, add_user
+from data_manager import load_player_data, add_user
+from ledger import InsufficientFunds, record_transfer
+from delivery import send_message
+from names import display_name
+from name_index import SCREEN_NAME_PATTERN, find_player, lookup_screen_name, resolve_screen_name
+from utils import format_user_tag
 
 # Глобальный словарь для отслеживания сессий перевода
 transfer_sessions = {}
 
-def parse_recipient(text, event):
+# Упоминание, в которое VK превращает "@ник" при выборе пользователя: [id12345|Имя]
+MENTION_PATTERN = re.compile(r'\[id(\d+)\|[^\]]*\]')
+VK_ID_LINK_PATTERN = re.compile(r'vk\.com/id(\d+)')
+SLASH_ID_PATTERN = re.compile(r'/id(\d+)')
+ID_PATTERN = re.compile(r'\bid(\d+)\b')
+# Короткое имя страницы: vk.com/durov
+SCREEN_NAME_LINK_PATTERN = re.compile(r'vk\.(?:com|ru)/([A-Za-z0-9_.]{2,32})\b')
+# Упоминание текстом: @ник (имя игрока или короткое имя страницы)
+AT_NAME_PATTERN = re.compile(r'@([\w.]+)')
+# Имя игрока из нескольких слов: @"Иван Петров" или @«Иван Петров»
+AT_QUOTED_NAME_PATTERN = re.compile(r'@(?:"([^"]+)"|«([^»]+)»)')
+# Без кавычек после "@" берется до MAX_NAME_WORDS слов до суммы перевода
+AT_WORDS_PATTERN = re.compile(r'@([^\n@]+)')
+MAX_NAME_WORDS = 5
+
+def parse_recipient(text, event, vk=None):
     """
     Определяет ID получателя по тексту сообщения или по пересланному/ответному сообщению.
     Сначала проверяются пересланные (fwd_messages) и ответные (reply_message) сообщения.
-    Если их нет, производится поиск по шаблонам: vk.com/id12345, /id12345 или standalone id12345.
+    Если их нет, производится поиск по шаблонам: упоминание [id12345|Имя], vk.com/id12345,
+    /id12345 или standalone id12345. Затем короткие имена: vk.com/durov и @ник (см. find_at_name);
+    имена игроков из нескольких слов — @"Иван Петров" или @Иван Петров (см. find_multiword_name).
     Возвращает ID получателя в виде строки, если найден; иначе None.
     """
     message = event.obj.message or {}
@@ -28,18 +49,67 @@ def parse_recipient(text, event):
         recipient_id = reply.get('from_id')
         if recipient_id:
             return str(recipient_id)
-    # Поиск по шаблонам
-    match = re.search(r'vk\.com/id(\d+)', text)
+    return parse_recipient_text(text, vk)
+
+def parse_recipient_text(text, vk=None):
+    """
+    Определяет ID получателя только по тексту (шаблоны parse_recipient без учета
+    пересланных и ответных сообщений). Возвращает ID в виде строки или None.
+    """
+    for pattern in (MENTION_PATTERN, VK_ID_LINK_PATTERN, SLASH_ID_PATTERN, ID_PATTERN):
+        match = pattern.search(text)
+        if match:
+            return match.group(1)
+    match = SCREEN_NAME_LINK_PATTERN.search(text)
+    if match:
+        return resolve_screen_name(vk, match.group(1))
+    match = AT_QUOTED_NAME_PATTERN.search(text)
     if match:
-        return match.group(1)
-    match = re.search(r'/id(\d+)', text)
+        return find_player((match.group(1) or match.group(2)).strip())
+    match = AT_WORDS_PATTERN.search(text)
     if match:
-        return match.group(1)
-    match = re.search(r'\bid(\d+)\b', text)
+        recipient = find_multiword_name(match.group(1))
+        if recipient:
+            return recipient
+    match = AT_NAME_PATTERN.search(text)
     if match:
-        return match.group(1)
+        return find_at_name(match.group(1), vk)
+    return None
+
+def find_multiword_name(text):
+    """
+    Получатель по словам после "@" без кавычек ("@Иван Петров 100"): самое длинное имя
+    игрока из двух и более слов, с которого начинается текст. Слова берутся до суммы
+    (первого числа). Однословные имена проверяет find_at_name.
+    """
+    words = []
+    for word in text.split()[:MAX_NAME_WORDS]:
+        if word.isdigit():
+            break
+        words.append(word)
+    for count in range(len(words), 1, -1):
+        recipient = find_player(" ".join(words[:count]))
+        if recipient:
+            return recipient
     return None
 
+def find_at_name(name, vk=None):
+    """
+    Получатель по "@ник". Ник, который может быть коротким именем страницы VK, сначала
+    проверяется через кэшированный utils.resolveScreenName (нужен vk): имя игрока
+    выбирает сам, и игрок, назвавшийся "durov", не должен получать переводы для
+    vk.com/durov. Среди имен игроков ищется только точное совпадение, и только если
+    такого короткого имени в VK нет. Если VK не ответил, получатель не определяется.
+    """
+    if SCREEN_NAME_PATTERN.fullmatch(name):
+        page = lookup_screen_name(vk, name)
+        if page is None:
+            return None
+        page_type, user_id = page
+        if page_type is not None:
+            return user_id
+    return find_player(name)
+
 def initiate_transfer(sender_id, event, vk):
     """
     Инициирует сессию перевода.
@@ -75,13 +145,13 @@ def initiate_transfer(sender_id, event, vk):
             send_transfer_confirmation(sender_id, vk, peer_id)
         else:
             transfer_sessions[str(sender_id)]["stage"] = "amount"
-            vk.messages.send(
+            send_message(
+                vk,
                 peer_id=peer_id,
-                message="Введите сумму Glitch для перевода:",
-                random_id=random.randint(1, 1000)
+                message="Введите сумму Glitch для перевода:"
             )
     else:
-        recipient = parse_recipient(text, event)
+        recipient = parse_recipient(text, event, vk)
         if recipient:
             transfer_sessions[str(sender_id)]["recipient"] = recipient
             if sum_in_text is not None:
@@ -90,16 +160,16 @@ def initiate_transfer(sender_id, event, vk):
                 send_transfer_confirmation(sender_id, vk, peer_id)
             else:
                 transfer_sessions[str(sender_id)]["stage"] = "amount"
-                vk.messages.send(
+                send_message(
+                    vk,
                     peer_id=peer_id,
-                    message="Введите сумму Glitch для перевода:",
-                    random_id=random.randint(1, 1000)
+                    message="Введите сумму Glitch для перевода:"
                 )
         else:
-            vk.messages.send(
+            send_message(
+                vk,
                 peer_id=peer_id,
-                message="Введите ссылку или тег игрока, которому нужно перевести Glitch. Либо ответьте на сообщение этого игрока.",
-                random_id=random.randint(1, 1000)
+                message="Введите ссылку или тег игрока, которому нужно перевести Glitch. Либо ответьте на сообщение этого игрока."
             )
 
 def send_transfer_confirmation(sender_id, vk, peer_id):
@@ -114,18 +184,19 @@ def send_transfer_confirmation(sender_id, vk, peer_id):
     amount = session.get("amount")
     recipient = session.get("recipient")
     sender_tag = f"vk.com/id{sender_id}"
-    recipient_tag = f"vk.com/id{recipient}"
+    # Числовой ID показывается явно: имя в теге игрок выбирает сам
+    recipient_tag = f"{format_user_tag(recipient, {})}, ID {recipient}"
     keyboard = VkKeyboard(inline=True)
     keyboard.add_callback_button("Подтвердить", color=VkKeyboardColor.POSITIVE,
                                  payload={"command": "transfer_confirm", "action": "confirm"})
     keyboard.add_callback_button("Отменить", color=VkKeyboardColor.NEGATIVE,
                                  payload={"command": "transfer_confirm", "action": "cancel"})
     confirmation_msg = (f"Подтвердите перевод: вы ({sender_tag}) хотите отправить {amount} Glitch игроку ({recipient_tag}).")
-    vk.messages.send(
+    send_message(
+        vk,
         peer_id=peer_id,
         message=confirmation_msg,
-        keyboard=keyboard.get_keyboard(),
-        random_id=random.randint(1, 1000)
+        keyboard=keyboard.get_keyboard()
     )
 
 def process_transfer(bot_event, sender_id, text, player_data, vk):
@@ -149,20 +220,20 @@ def process_transfer(bot_event, sender_id, text, player_data, vk):
         peer_id = sender_id
     
     if stage == "recipient":
-        recipient = parse_recipient(text, bot_event)
+        recipient = parse_recipient(text, bot_event, vk)
         if not recipient:
-            vk.messages.send(
+            send_message(
+                vk,
                 peer_id=peer_id,
-                message="Не удалось определить получателя. Укажите ссылку/тег или ответьте на сообщение игрока.",
-                random_id=random.randint(1, 1000)
+                message="Не удалось определить получателя. Укажите ссылку/тег или ответьте на сообщение игрока."
             )
             return True
         session["recipient"] = recipient
         session["stage"] = "amount"
-        vk.messages.send(
+        send_message(
+            vk,
             peer_id=peer_id,
-            message="Введите сумму Glitch для перевода:",
-            random_id=random.randint(1, 1000)
+            message="Введите сумму Glitch для перевода:"
         )
         return True
 
@@ -172,18 +243,18 @@ def process_transfer(bot_event, sender_id, text, player_data, vk):
             if amount <= 0:
                 raise ValueError()
         except ValueError:
-            vk.messages.send(
+            send_message(
+                vk,
                 peer_id=peer_id,
-                message="Введите корректное число для суммы перевода.",
-                random_id=random.randint(1, 1000)
+                message="Введите корректное число для суммы перевода."
             )
             return True
         sender_balance = int(player_data.get(str(sender_id), {}).get("balance", 0))
         if sender_balance < amount:
-            vk.messages.send(
+            send_message(
+                vk,
                 peer_id=peer_id,
-                message="Недостаточно средств для перевода.",
-                random_id=random.randint(1, 1000)
+                message="Недостаточно средств для перевода."
             )
             del transfer_sessions[str(sender_id)]
             return True
@@ -202,18 +273,18 @@ def process_transfer_confirmation(sender_id, action, player_data, vk, peer_id):
     """
     session = transfer_sessions.get(str(sender_id))
     if not session or session.get("stage") != "confirm":
-        vk.messages.send(
+        send_message(
+            vk,
             peer_id=peer_id,
-            message="Сессия перевода не найдена или уже завершена.",
-            random_id=random.randint(1, 1000)
+            message="Сессия перевода не найдена или уже завершена."
         )
         return
 
     if action == "cancel":
-        vk.messages.send(
+        send_message(
+            vk,
             peer_id=peer_id,
-            message="Перевод отменён.",
-            random_id=random.randint(1, 1000)
+            message="Перевод отменён."
         )
         del transfer_sessions[str(sender_id)]
         return
@@ -221,31 +292,37 @@ def process_transfer_confirmation(sender_id, action, player_data, vk, peer_id):
     if action == "confirm":
         amount = session.get("amount")
         recipient = session.get("recipient")
-        sender_balance = int(player_data.get(str(sender_id), {}).get("balance", 0))
-        if sender_balance < amount:
-            vk.messages.send(
+        # Списание средств у отправителя и зачисление получателю; баланс отправителя
+        # проверяется под блокировкой счетов, поэтому параллельные списания не уводят его в минус
+        # Запись нового получателя сохраняется в журнале вместе с переводом
+        # и восстанавливается из него при запуске, без перезаписи player_data.json
+        # Если перевод не прошел, новый получатель удаляется, чтобы не оставлять игрока с нулевым балансом
+        fields = None
+        if str(recipient) not in player_data:
+            add_user(recipient, player_data, vk_name=display_name(recipient))
+            fields = {recipient: {key: value for key, value in player_data[str(recipient)].items() if key != "balance"}}
+        try:
+            record_transfer(player_data, sender_id, recipient, amount, fields=fields)
+        except InsufficientFunds:
+            if fields:
+                del player_data[str(recipient)]
+            send_message(
+                vk,
                 peer_id=peer_id,
-                message="Недостаточно средств для перевода.",
-                random_id=random.randint(1, 1000)
+                message="Недостаточно средств для перевода."
             )
             del transfer_sessions[str(sender_id)]
             return
-        # Списание средств у отправителя и зачисление получателю
-        player_data[str(sender_id)]["balance"] -= amount
-        if str(recipient) not in player_data:
-            add_user(recipient, player_data, vk_name=f"Пользователь {recipient}")
-        player_data[str(recipient)]["balance"] += amount
-        save_player_data(player_data)
-        vk.messages.send(
+        send_message(
+            vk,
             peer_id=peer_id,
-            message=(f"Перевод выполнен успешно! С вашего счета списано {amount} Glitch. Новый баланс: {player_data[str(sender_id)]['balance']} Glitch."),
-            random_id=random.randint(1, 1000)
+            message=(f"Перевод выполнен успешно! С вашего счета списано {amount} Glitch. Новый баланс: {player_data[str(sender_id)]['balance']} Glitch.")
         )
         # Теперь уведомляем получателя только если перевод выполнен успешно
-        vk.messages.send(
+        send_message(
+            vk,
             peer_id=int(recipient),
-            message=f"Вам переведен {amount} Glitch от vk.com/id{sender_id}.",
-            random_id=random.randint(1, 1000)
+            message=f"Вам переведен {amount} Glitch от {format_user_tag(sender_id, player_data.get(str(sender_id), {}))}."
         )
         del transfer_sessions[str(sender_id)]
         return
\ No newline at end of file
@@ -1,34 +1,50 @@
 import json
-import random
 import logging
 from vk_api.keyboard import VkKeyboard, VkKeyboardColor
-from data_manager import load_player_data, save_player_data, add_click_to_data, update_user_name, add_user
-from games.coinflip import show_games_keyboard, start_coinflip, process_coinflip_choice
+from data_manager import load_player_data, add_click_to_data, update_user_name, add_user, load_games
+from fairness import describe_commitment, get_public_seeds, rotate_seeds
+from click_limiter import display_balance, farm_click, throttle_notice_due
+from passive_income import current_rate, settle_passive_income
+from delivery import send_message
+from name_index import index_player_name
+from conversations import apply_chat_action, bot_is_admin
+from commitments import get_root, latest_root, seed_proof
+from games.coinflip import (show_games_keyboard, start_coinflip, process_coinflip_choice,
+                            process_chat_bet_choice, process_chat_text_bet)
 from games.mines import (start_mines, process_mines_field, process_mines_option, 
                          process_mines_text, process_mines_choice, mines_sessions, handle_mines_move)
+from games.airdrop import process_airdrop_command
 from games.transfers import initiate_transfer, process_transfer_confirmation, process_transfer, transfer_sessions
 from config import CONFIG
-from utils import format_user_tag
+from utils import format_user_tag, is_group_chat
 
 # Dictionaries to track waiting states outside of game sessions
 awaiting_name_change = {}
 awaiting_bet = {}
 
-def is_group_chat(peer_id):
-    return peer_id >= 2000000000
-
 def handle_message(event, player_data, vk):
     # Получаем и очищаем входящее сообщение
     raw_text = event.obj.message.get('text', '')
     message_text = raw_text.replace("\xa0", " ").replace("\u200b", "").replace("\uFEFF", "").strip()
     user_id = event.obj.message.get('from_id')
     peer_id = event.obj.message.get('peer_id')
+    # Служебные сообщения беседы (приглашение, исключение) обновляют кэш состава беседы
+    action = event.obj.message.get('action')
+    if action:
+        apply_chat_action(peer_id, action, from_id=user_id)
+        return
+    # Пассивный доход зачисляется до того, как баланс игрока будет прочитан или изменен
+    settle_passive_income(user_id, player_data)
     
     # Если уже запущена сессия перевода, обрабатываем сообщение переводом
     if str(user_id) in transfer_sessions:
         if process_transfer(event, user_id, message_text, player_data, vk):
             return
 
+    # Раздача Glitch владельцем бота
+    if process_airdrop_command(user_id, message_text, player_data, vk, peer_id):
+        return
+
     # Если сообщение начинается со слова "перевод", инициируем перевод
     if message_text.lower().startswith(("перевод", "send")):
         initiate_transfer(user_id, event, vk)
@@ -47,17 +63,19 @@ def handle_message(event, player_data, vk):
     # Обработка смены имени
     if str(user_id) in awaiting_name_change:
         if message_text.lower() == "отмена":
-            vk.messages.send(
+            send_message(
+                vk,
                 peer_id=peer_id,
-                message=f"{tag}\nСмена имени отменена.",
-                random_id=random.randint(1, 1000)
+                message=f"{tag}\nСмена имени отменена."
             )
         else:
+            old_name = player_data.get(str(user_id), {}).get("name")
             update_user_name(user_id, message_text, player_data)
-            vk.messages.send(
+            index_player_name(user_id, message_text, old_name)
+            send_message(
+                vk,
                 peer_id=peer_id,
-                message=f"{tag}\nИмя изменено на {message_text}.",
-                random_id=random.randint(1, 1000)
+                message=f"{tag}\nИмя изменено на {message_text}."
             )
         del awaiting_name_change[str(user_id)]
         add_click_to_data(user_id, "change_name", player_data)
@@ -73,10 +91,10 @@ def handle_message(event, player_data, vk):
             # Сразу проверяем баланс перед созданием игровой сессии.
             current_balance = int(player_data.get(str(user_id), {}).get("balance", 0))
             if current_balance < amount:
-                vk.messages.send(
+                send_message(
+                    vk,
                     peer_id=peer_id,
-                    message=f"{tag}\nНедостаточно средств для ставки.",
-                    random_id=random.randint(1, 1000)
+                    message=f"{tag}\nНедостаточно средств для ставки."
                 )
                 return
             if game_type == "coinflip":
@@ -85,24 +103,40 @@ def handle_message(event, player_data, vk):
                 start_mines(user_id, amount, player_data, vk, peer_id)
         except ValueError as e:
             logging.error(f"Ошибка преобразования ставки '{message_text}' для пользователя {user_id} {tag}: {e}")
-            vk.messages.send(
+            send_message(
+                vk,
                 peer_id=peer_id,
-                message=f"{tag}\nПожалуйста, введите корректную ставку.",
-                random_id=random.randint(1, 1000)
+                message=f"{tag}\nПожалуйста, введите корректную ставку."
             )
         return
 
+    # Команды проверки честности доступны и в личных сообщениях, и в игровом чате
+    if message_text.lower() == "сид":
+        show_seeds(user_id, vk, peer_id)
+        return
+    if message_text.lower().startswith("сменить сид"):
+        change_seeds(user_id, message_text[len("сменить сид"):].strip(), vk, peer_id)
+        return
+    if message_text.lower().startswith("проверить "):
+        show_seed_proof(message_text[len("проверить "):].strip(), vk, peer_id)
+        return
+    if message_text.lower().startswith("корень"):
+        show_commitment_root(message_text[len("корень"):].strip(), vk, peer_id)
+        return
+
     # Сообщения из группового чата
     if is_group_chat(peer_id):
         lower_text = message_text.lower()
+        if process_chat_text_bet(user_id, message_text, player_data, vk, peer_id):
+            return
         if lower_text == "начать":
             if bot_has_admin_permissions(peer_id, vk):
                 start_games_in_chat(vk, peer_id)
             else:
-                vk.messages.send(
+                send_message(
+                    vk,
                     peer_id=peer_id,
-                    message=f"{tag}\nБот требует права администратора для управления чатом и запуска игр. Дайте боту админ-права.",
-                    random_id=random.randint(1, 1000)
+                    message=f"{tag}\nБот требует права администратора для управления чатом и запуска игр. Дайте боту админ-права."
                 )
             return
         elif lower_text in ["игры", "бонус"]:
@@ -114,7 +148,9 @@ def handle_message(event, player_data, vk):
         if lower_text in ["начать", "меню"]:
             start_game(user_id, player_data, vk, peer_id)
         elif lower_text == "клики":
+            # Клики не записываются в историю команд: это сохраняло бы player_data на каждое нажатие
             farm_clicks(user_id, player_data, vk, peer_id)
+            return
         elif lower_text == "баланс":
             show_balance(user_id, player_data, vk, peer_id)
         elif lower_text == "профиль":
@@ -148,99 +184,188 @@ def start_game(user_id, player_data, vk, peer_id):
         menu_keyboard = keyboard.get_keyboard()
     else:
         menu_keyboard = None
-    vk.messages.send(
+    send_message(
+        vk,
         peer_id=peer_id,
         message=f"{tag}\nПривет! Я Glitch, возможно это как биткоин, а возможно как хомяк. \n Майнить или нет – это твоё дело.",
-        keyboard=menu_keyboard,
-        random_id=random.randint(1, 1000)
+        keyboard=menu_keyboard
     )
     logging.info(f"Пользователю {user_id} {tag} отправлено стартовое сообщение.")
 
+def show_seeds(user_id, vk, peer_id):
+    seeds = get_public_seeds(user_id)
+    send_message(
+        vk,
+        peer_id=peer_id,
+        message=(f"Хеш сида сервера (SHA-256): {seeds['server_seed_hash']}\n"
+                 f"Сид клиента: {seeds['client_seed']}\n"
+                 f"Следующий nonce: {seeds['nonce']}.{describe_commitment(seeds['seed_id'])}\n"
+                 "Напишите «сменить сид [ваш сид]», чтобы раскрыть сид сервера и начать новую пару.")
+    )
+
+def change_seeds(user_id, client_seed, vk, peer_id):
+    # Результат активной игры вычисляется по текущим сидам, поэтому менять их во время игры нельзя
+    session = mines_sessions.get(str(user_id))
+    if (session and "nonce" in session) or str(user_id) in load_games():
+        send_message(
+            vk,
+            peer_id=peer_id,
+            message="Сначала завершите текущую игру."
+        )
+        return
+    if len(client_seed) > 64 or len(client_seed.split()) > 1:
+        send_message(
+            vk,
+            peer_id=peer_id,
+            message="Сид клиента — одно слово не длиннее 64 символов."
+        )
+        return
+    previous = rotate_seeds(user_id, client_seed or None)
+    seeds = get_public_seeds(user_id)
+    send_message(
+        vk,
+        peer_id=peer_id,
+        message=(f"Раскрыт сид сервера: {previous['server_seed']}\n"
+                 f"Сид клиента: {previous['client_seed']}, сыграно раундов: {previous['nonce']}\n"
+                 f"Проверка: python fairness.py mines|coinflip <сид сервера> <сид клиента> <nonce> ...\n"
+                 f"Новый хеш сида сервера: {seeds['server_seed_hash']}\n"
+                 f"Новый сид клиента: {seeds['client_seed']}.{describe_commitment(seeds['seed_id'])}")
+    )
+    logging.info(f"Пользователь {user_id} сменил пару сидов после {previous['nonce']} раундов")
+
+def show_seed_proof(seed_id, vk, peer_id):
+    proof = seed_proof(seed_id)
+    if proof is None:
+        message = "Сид не найден. Укажите его номер как в сообщении игры, например «проверить 2024-01-31#17»."
+    else:
+        message = (f"Хеш сида сервера: {proof['server_seed_hash']}\n"
+                   f"Корень дня: {proof['root']}\n"
+                   f"Путь к корню: {' '.join(proof['proof'])}\n"
+                   "Проверка: python commitments.py verify <хеш сида сервера> <корень> <путь>\n"
+                   "Хеш должен совпадать с хешем сида, который показывает бот.")
+    send_message(
+        vk,
+        peer_id=peer_id,
+        message=message
+    )
+
+def show_commitment_root(period, vk, peer_id):
+    if period:
+        root = get_root(period)
+    else:
+        period, root = latest_root()
+    if root is None:
+        message = f"Корень за {period} не опубликован."
+    else:
+        message = (f"Корень сидов сервера за {period}: {root['root']} (сидов: {root['count']}). "
+                   "Опубликован при открытии дня, до первого раунда на его сидах.")
+    send_message(
+        vk,
+        peer_id=peer_id,
+        message=message
+    )
+
 def farm_clicks(user_id, player_data, vk, peer_id):
+    """
+    Начисляет награду за клик с учетом лимита кликов. Награда зачисляется на баланс
+    в фоне вместе с другими (click_limiter), игроку сразу показывается баланс с ее учетом.
+    Возвращает True, если клик принят.
+    """
     if str(user_id) not in player_data:
-        return
-    earned_glitch = random.randint(5, 17)
-    player_data[str(user_id)]["balance"] += earned_glitch
-    save_player_data(player_data)
+        return False
     tag = format_user_tag(user_id, player_data.get(str(user_id), {}))
-    logging.info(f"Пользователь {user_id} {tag}: найдено {earned_glitch} Glitch⚡. Баланс: {player_data[str(user_id)]['balance']}")
-    vk.messages.send(
+    earned_glitch, retry_after = farm_click(user_id, player_data)
+    if earned_glitch is None:
+        # О лимите сообщаем один раз на серию отказов, чтобы спам не порождал ответы
+        if throttle_notice_due(user_id):
+            send_message(
+                vk,
+                peer_id=peer_id,
+                message=f"{tag}\nСлишком часто! Следующий клик через {retry_after:.0f} с."
+            )
+        return False
+    balance = display_balance(user_id, player_data)
+    logging.info(f"Пользователь {user_id} {tag}: найдено {earned_glitch} Glitch⚡. Баланс: {balance}")
+    send_message(
+        vk,
         peer_id=peer_id,
-        message=f"{tag}\nВы нашли {earned_glitch} Glitch⚡! Ваш баланс: {player_data[str(user_id)]['balance']} Glitch⚡.",
-        random_id=random.randint(1, 1000)
+        message=f"{tag}\nВы нашли {earned_glitch} Glitch⚡! Ваш баланс: {balance} Glitch⚡."
     )
+    return True
 
 def show_balance(user_id, player_data, vk, peer_id):
     tag = format_user_tag(user_id, player_data.get(str(user_id), {}))
     if str(user_id) in player_data:
-        balance = player_data[str(user_id)]["balance"]
-        vk.messages.send(
+        balance = display_balance(user_id, player_data)
+        send_message(
+            vk,
             peer_id=peer_id,
-            message=f"{tag}\nВаш баланс: {balance} Glitch⚡.",
-            random_id=random.randint(1, 1000)
+            message=f"{tag}\nВаш баланс: {balance} Glitch⚡."
         )
     else:
-        vk.messages.send(
+        send_message(
+            vk,
             peer_id=peer_id,
-            message=f"{tag}\nВы ещё не начали игру. Напишите 'начать', чтобы начать!",
-            random_id=random.randint(1, 1000)
+            message=f"{tag}\nВы ещё не начали игру. Напишите 'начать', чтобы начать!"
         )
 
 def show_profile(user_id, player_data, vk, peer_id):
     tag = format_user_tag(user_id, player_data.get(str(user_id), {}))
     if str(user_id) in player_data:
-        profile = (f"{tag}\nПрофиль:\nБаланс: {player_data[str(user_id)]['balance']} Glitch⚡\n"
+        profile = (f"{tag}\nПрофиль:\nБаланс: {display_balance(user_id, player_data)} Glitch⚡\n"
+                   f"Пассивный доход: {current_rate()} Glitch⚡ в час\n"
                    f"Дата начала: {player_data[str(user_id)]['start_date']}\n"
                    f"Имя: {player_data[str(user_id)]['name']}\nНажмите [Сменить имя] для изменения.")
         keyboard = VkKeyboard(inline=True)
         keyboard.add_callback_button("Сменить имя", color=VkKeyboardColor.PRIMARY, payload={"command": "change_name"})
         menu = keyboard.get_keyboard()
-        vk.messages.send(
+        send_message(
+            vk,
             peer_id=peer_id,
             message=profile,
-            keyboard=menu,
-            random_id=random.randint(1, 1000)
+            keyboard=menu
         )
     else:
-        vk.messages.send(
+        send_message(
+            vk,
             peer_id=peer_id,
-            message=f"{tag}\nВы ещё не начали игру. Напишите 'начать', чтобы начать!",
-            random_id=random.randint(1, 1000)
+            message=f"{tag}\nВы ещё не начали игру. Напишите 'начать', чтобы начать!"
         )
 
 def show_top_balances(user_id, player_data, vk, peer_id):
     top = sorted(player_data.items(), key=lambda x: x[1].get("balance", 0), reverse=True)[:5]
     message = "Топ 5 балансов:\n"
     for i, (uid, data) in enumerate(top, 1):
-        tag_user = f"[vk.com/id{uid}|{data.get('name', f'Пользователь {uid}')}]"
+        tag_user = format_user_tag(uid, data)
         message += f"{i}. {tag_user}: {data.get('balance', 0)} Glitch⚡\n"
-    vk.messages.send(
+    send_message(
+        vk,
         peer_id=peer_id,
-        message=message,
-        random_id=random.randint(1, 1000)
+        message=message
     )
 
 def show_top_miners(user_id, player_data, vk, peer_id):
     message = "Топ майнеров пока не доступен, но скоро будет!"
-    vk.messages.send(
+    send_message(
+        vk,
         peer_id=peer_id,
-        message=message,
-        random_id=random.randint(1, 1000)
+        message=message
     )
 
 def bot_has_admin_permissions(peer_id, vk):
-    # Здесь должна быть логика проверки прав админа в чате.
-    return True
+    # Права бота берутся из кэша сведений о беседе (conversations), VK запрашивается
+    # только при его отсутствии или устаревании
+    return bot_is_admin(peer_id, vk)
 
 def start_games_in_chat(vk, peer_id):
     keyboard = VkKeyboard(one_time=False)
     keyboard.add_callback_button("Орел-Решка", color=VkKeyboardColor.PRIMARY, payload={"command": "coinflip"})
     keyboard.add_callback_button("Мины", color=VkKeyboardColor.PRIMARY, payload={"command": "mines"})
-    vk.messages.send(
+    send_message(
+        vk,
         peer_id=peer_id,
         message="Выберите игру:",
-        keyboard=keyboard.get_keyboard(),
-        random_id=random.randint(1, 1000)
+        keyboard=keyboard.get_keyboard()
     )
 
 def handle_callback(event, player_data, vk):
@@ -249,14 +374,16 @@ def handle_callback(event, player_data, vk):
     peer_id = event.obj.peer_id
     command = payload.get("command")
     tag = format_user_tag(user_id, player_data.get(str(user_id), {}))
+    settle_passive_income(user_id, player_data)
     
     if command == "get_glitch":
-        farm_clicks(user_id, player_data, vk, peer_id)
+        accepted = farm_clicks(user_id, player_data, vk, peer_id)
         vk.messages.sendMessageEventAnswer(
             event_id=event.obj.event_id,
             user_id=user_id,
             peer_id=peer_id,
-            event_data=json.dumps({"type": "show_snackbar", "text": f"{tag} Вы получили Glitch⚡!"})
+            event_data=json.dumps({"type": "show_snackbar",
+                                   "text": f"{tag} Вы получили Glitch⚡!" if accepted else f"{tag} Слишком часто!"})
         )
     elif command == "баланс":
         show_balance(user_id, player_data, vk, peer_id)
@@ -292,10 +419,10 @@ def handle_callback(event, player_data, vk):
         )
     elif command == "change_name":
         awaiting_name_change[str(user_id)] = True
-        vk.messages.send(
+        send_message(
+            vk,
             peer_id=peer_id,
-            message=f"{tag}\nВведите новое имя или 'отмена' для отказа.",
-            random_id=random.randint(1, 1000)
+            message=f"{tag}\nВведите новое имя или 'отмена' для отказа."
         )
         vk.messages.sendMessageEventAnswer(
             event_id=event.obj.event_id,
@@ -305,10 +432,10 @@ def handle_callback(event, player_data, vk):
         )
     elif command == "coinflip":
         awaiting_bet[str(user_id)] = "coinflip"
-        vk.messages.send(
+        send_message(
+            vk,
             peer_id=peer_id,
-            message=f"{tag}\nВведите вашу ставку для 'Орел-Решка':",
-            random_id=random.randint(1, 1000)
+            message=f"{tag}\nВведите вашу ставку для 'Орел-Решка':"
         )
         vk.messages.sendMessageEventAnswer(
             event_id=event.obj.event_id,
@@ -318,10 +445,10 @@ def handle_callback(event, player_data, vk):
         )
     elif command == "mines":
         awaiting_bet[str(user_id)] = "mines"
-        vk.messages.send(
+        send_message(
+            vk,
             peer_id=peer_id,
-            message=f"{tag}\nВведите вашу ставку для игры 'Мины':",
-            random_id=random.randint(1, 1000)
+            message=f"{tag}\nВведите вашу ставку для игры 'Мины':"
         )
         vk.messages.sendMessageEventAnswer(
             event_id=event.obj.event_id,
@@ -342,10 +469,10 @@ def handle_callback(event, player_data, vk):
         handle_mines_move(event, user_id, player_data, vk, peer_id)
     elif command == "join_chat":
         link = payload.get("link", CONFIG.get("CHAT_LINK", ""))
-        vk.messages.send(
+        send_message(
+            vk,
             peer_id=peer_id,
-            message=f"Присоединяйтесь к игровому чату по ссылке:\n{link}",
-            random_id=random.randint(1, 1000)
+            message=f"Присоединяйтесь к игровому чату по ссылке:\n{link}"
         )
         vk.messages.sendMessageEventAnswer(
             event_id=event.obj.event_id,
@@ -362,6 +489,8 @@ def handle_callback(event, player_data, vk):
             event_data=json.dumps({"type": "show_snackbar", "text": "Запуск перевода"})
         )
         transfers.initiate_transfer(user_id, event, vk)
+    elif command == "coinflip_chat_bet":
+        process_chat_bet_choice(event, user_id, payload.get("choice"), player_data, vk, peer_id)
     elif command == "transfer_confirm":
         action = payload.get("action")
         from games import transfers
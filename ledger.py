@@ -0,0 +1,412 @@
+"""
+Журнал операций с балансами по двойной записи.
+
+Каждое изменение баланса — транзакция из проводок [счет, сумма, тип], сумма проводок
+равна нулю. Счета игроков — их user_id, служебные счета начинаются с "@":
+    @house  — казино (ставки и выигрыши), @faucet — награды за клики,
+    @opening — начальные балансы, перенесенные из player_data.json при первом запуске,
+    @airdrop — раздачи владельца бота, @mining — пассивный доход (passive_income.py).
+Типы проводок: stake, payout, transfer_out, transfer_in, farm_reward, opening, airdrop,
+passive_income.
+
+Транзакция может нести поля игроков (fields), которые меняются вместе с балансом
+(например, отметка last_bonus пассивного дохода или запись нового игрока-получателя
+перевода): они применяются к player_data в той же записи и восстанавливаются из хвоста
+журнала при запуске.
+
+Транзакции сразу применяются к балансам в памяти (материализованное представление,
+которым пользуется бот через player_data), а на диск пишутся пачками (group commit):
+фоновый поток раз в LEDGER_FLUSH_INTERVAL секунд дописывает накопленные записи одним
+write + fsync. Раз в CHECKPOINT_EVERY записей сохраняется контрольная точка балансов,
+и при запуске баланс восстанавливается по ней и хвосту журнала. Запись на диск идет
+вне блокировки журнала: под ней пачка только забирается, и проводки не ждут fsync.
+
+Конкурентный доступ: у каждого счета игрока есть номер версии, который растет с каждой
+транзакцией. Списания с одного счета (ставки) выполняются как compare-and-swap:
+баланс и версия читаются без блокировки, транзакция проводится, только если версия
+не изменилась, иначе попытка повторяется. Транзакции нескольких игроков (переводы)
+берут блокировки счетов из LOCK_STRIPES полос всегда в порядке возрастания номера полосы,
+поэтому встречные переводы не взаимоблокируются. Глобальная блокировка держится
+только на время присвоения номера записи.
+
+Порядок блокировок (любой поток берет их только в этом порядке, пропуская ненужные):
+    player_data_lock -> _flush_lock -> полосы счетов -> _lock.
+Обработчики событий проводят транзакции и вызывают flush() под player_data_lock, поэтому
+flush() берет player_data_lock для снимка player_data до _flush_lock, а не внутри нее.
+Снимок записывается в player_data.json без player_data_lock: запись файла в data_manager
+идет под собственной блокировкой, общей с обработчиками событий.
+
+Пересчет балансов по всему журналу:
+    python ledger.py balance [user_id]
+"""
+import atexit
+import contextlib
+import json
+import logging
+import sys
+import threading
+import time
+from data_manager import (append_ledger_lines, load_ledger_checkpoint, player_data_lock, read_ledger_lines,
+                          save_ledger_checkpoint, save_player_data)
+from config import CONFIG
+
+HOUSE = "@house"
+FAUCET = "@faucet"
+OPENING = "@opening"
+AIRDROP = "@airdrop"
+MINING = "@mining"
+
+FLUSH_INTERVAL = CONFIG.get("LEDGER_FLUSH_INTERVAL", 1.0)
+# При накоплении стольких записей фоновый поток пишет пачку сразу, не дожидаясь интервала
+MAX_BATCH = 500
+CHECKPOINT_EVERY = 1000
+LOCK_STRIPES = 64
+CAS_ATTEMPTS = 100
+
+class InsufficientFunds(Exception):
+    """
+    На счете игрока недостаточно средств для списания.
+    """
+
+class VersionConflict(Exception):
+    """
+    Счет изменился после чтения версии (compare-and-swap не удался).
+    """
+
+_lock = threading.Lock()
+# Порядок записи пачек на диск; держится вместо _lock на время записи и контрольной точки
+_flush_lock = threading.Lock()
+_pending = []
+_balances = {}
+_versions = {}
+_stripes = [threading.Lock() for _ in range(LOCK_STRIPES)]
+_seq = 0
+_checkpoint_seq = 0
+_player_data = None
+_initialized = False
+_flusher = None
+_stop = threading.Event()
+# Будит фоновую запись, когда пачка заполнена
+_batch_full = threading.Event()
+
+def apply_entry(balances, entry):
+    """
+    Применяет транзакцию журнала к словарю балансов счетов.
+    """
+    for account, amount, _entry_type in entry["legs"]:
+        balances[account] = round(balances.get(account, 0) + amount, 2)
+
+def replay(lines, balances=None, after_seq=0, fields=None):
+    """
+    Пересчитывает балансы по строкам журнала, пропуская записи с номером <= after_seq.
+    Если передан словарь fields, в него собираются последние значения полей игроков
+    ({счет: {поле: значение}}) из учтенных записей.
+    Возвращает (balances, номер последней записи).
+    """
+    balances = {} if balances is None else balances
+    seq = after_seq
+    for line in lines:
+        entry = json.loads(line)
+        if entry["seq"] <= after_seq:
+            continue
+        apply_entry(balances, entry)
+        if fields is not None and "fields" in entry:
+            for account, values in entry["fields"].items():
+                fields.setdefault(account, {}).update(values)
+        seq = entry["seq"]
+    return balances, seq
+
+def _set_player_balance(account, balance):
+    player = _player_data.get(account) if _player_data is not None else None
+    if player is not None:
+        player["balance"] = balance
+
+def init_ledger(player_data):
+    """
+    Восстанавливает балансы по контрольной точке и журналу, переносит их в player_data
+    и запускает фоновую запись. При первом запуске текущие балансы player_data
+    записываются в журнал начальными проводками (opening).
+    """
+    global _balances, _seq, _checkpoint_seq, _player_data, _initialized, _flusher
+    checkpoint = load_ledger_checkpoint()
+    # Поля из записей до контрольной точки уже сохранены в player_data.json (он пишется раньше точки)
+    fields = {}
+    _balances, _seq = replay(read_ledger_lines(), dict(checkpoint["balances"]), checkpoint["seq"], fields)
+    _checkpoint_seq = checkpoint["seq"]
+    _player_data = player_data
+    _initialized = True
+    if _seq == 0:
+        for user_id, player in player_data.items():
+            if player.get("balance"):
+                post(player_data, "opening", [(user_id, player["balance"], "opening"), (OPENING, -player["balance"], "opening")])
+        flush()
+    # Игрок, добавленный транзакцией (получатель перевода), мог не попасть в player_data.json
+    for account, values in fields.items():
+        player_data.setdefault(account, {}).update(values)
+    for account, balance in _balances.items():
+        if not account.startswith("@"):
+            _set_player_balance(account, balance)
+    logging.info(f"Журнал балансов: восстановлено {len(_balances)} счетов, последняя запись {_seq}")
+    if _flusher is None:
+        _flusher = threading.Thread(target=_flush_loop, name="ledger-flusher", daemon=True)
+        _flusher.start()
+        atexit.register(flush)
+    return _balances
+
+@contextlib.contextmanager
+def _account_locks(accounts):
+    """
+    Блокировки полос для счетов игроков, взятые в порядке возрастания номера полосы.
+    Служебные счета ("@...") не блокируются: их меняют под общей блокировкой журнала.
+    """
+    stripes = sorted({hash(account) % LOCK_STRIPES for account in accounts if not account.startswith("@")})
+    for stripe in stripes:
+        _stripes[stripe].acquire()
+    try:
+        yield
+    finally:
+        for stripe in reversed(stripes):
+            _stripes[stripe].release()
+
+def get_account(account):
+    """
+    Баланс и версия счета. Версия растет с каждой транзакцией, затрагивающей счет.
+    """
+    account = str(account)
+    with _lock:
+        return _balances.get(account, 0), _versions.get(account, 0)
+
+def post(player_data, entry_type, legs, ref=None, expected_versions=None, require_funds=False, fields=None):
+    """
+    Проводит транзакцию: legs — список (счет, сумма, тип проводки) с нулевой суммой.
+    Балансы в памяти и в player_data меняются сразу, запись на диск — с ближайшей пачкой.
+    Если журнал еще не открыт, он открывается для этого player_data.
+    expected_versions — {счет: версия} для compare-and-swap (VersionConflict при несовпадении);
+    require_funds — не допускать отрицательного баланса игроков (InsufficientFunds);
+    fields — {счет: {поле: значение}}, поля игроков, меняющиеся вместе с балансом.
+    Возвращает номер записи.
+    """
+    global _seq
+    if not _initialized:
+        init_ledger(player_data)
+    legs = [[str(account), round(amount, 2), leg_type] for account, amount, leg_type in legs]
+    if abs(sum(amount for _, amount, _ in legs)) > 1e-9:
+        raise ValueError(f"Несбалансированная транзакция {entry_type}: {legs}")
+    accounts = [account for account, _, _ in legs if not account.startswith("@")]
+    with _account_locks(accounts):
+        # Счета игроков меняются только под их блокировками, поэтому проверки ниже
+        # остаются верными до применения транзакции
+        for account, version in (expected_versions or {}).items():
+            if _versions.get(str(account), 0) != version:
+                raise VersionConflict(f"Счет {account} изменился")
+        if require_funds:
+            for account, amount, _ in legs:
+                if amount < 0 and not account.startswith("@") and _balances.get(account, 0) + amount < -1e-9:
+                    raise InsufficientFunds(f"Недостаточно средств на счете {account}")
+        with _lock:
+            _seq += 1
+            entry = {"seq": _seq, "ts": round(time.time(), 3), "type": entry_type, "legs": legs}
+            if ref is not None:
+                entry["ref"] = ref
+            if fields:
+                entry["fields"] = {str(account): values for account, values in fields.items()}
+                for account, values in entry["fields"].items():
+                    player_data[account].update(values)
+            apply_entry(_balances, entry)
+            for account in accounts:
+                _versions[account] = _versions.get(account, 0) + 1
+                _set_player_balance(account, _balances[account])
+            _pending.append(json.dumps(entry, ensure_ascii=False, separators=(",", ":")))
+            batch_full = len(_pending) >= MAX_BATCH
+    if batch_full:
+        # Запись идет в фоновом потоке: post вызывается и под player_data_lock,
+        # и большие транзакции (раздачи) не должны ждать записи на диск
+        _batch_full.set()
+    return entry["seq"]
+
+def flush():
+    """
+    Дописывает накопленные записи в журнал одной операцией и при необходимости
+    сохраняет контрольную точку балансов.
+    """
+    global _checkpoint_seq
+    checkpoint = snapshot = None
+    with _lock:
+        checkpoint_due = _seq - _checkpoint_seq >= CHECKPOINT_EVERY
+    if checkpoint_due:
+        # player_data.json пишется раньше точки: поля игроков из записей до точки при запуске
+        # берутся из него, а не из журнала. Снимок player_data, балансы и номер записи
+        # снимаются вместе под player_data_lock и _lock (поля меняются в post под _lock),
+        # до _flush_lock — см. порядок блокировок в описании модуля.
+        with player_data_lock:
+            with _lock:
+                if _player_data is not None:
+                    snapshot = {account: dict(player) for account, player in _player_data.items()}
+                checkpoint = {"seq": _seq, "balances": dict(_balances)}
+    with _flush_lock:
+        with _lock:
+            if not _pending:
+                return 0
+            lines = list(_pending)
+            _pending.clear()
+        try:
+            append_ledger_lines(lines)
+        except OSError as e:
+            # Пачки пишутся по одной под _flush_lock, поэтому новые записи в _pending идут после этих
+            with _lock:
+                _pending[:0] = lines
+            logging.error(f"Ошибка записи журнала балансов: {e}")
+            return 0
+        # Записи до checkpoint["seq"] уже на диске: они были в этой пачке или в предыдущих,
+        # а неудачная пачка возвращается в _pending до освобождения _flush_lock
+        if checkpoint is not None and checkpoint["seq"] > _checkpoint_seq:
+            try:
+                if snapshot is not None:
+                    save_player_data(snapshot)
+                save_ledger_checkpoint(checkpoint)
+                _checkpoint_seq = checkpoint["seq"]
+            except Exception as e:
+                # Точка будет сохранена при следующей пачке; записи журнала уже на диске
+                logging.error(f"Ошибка сохранения контрольной точки журнала балансов: {e}")
+        return len(lines)
+
+def _flush_loop():
+    while not _stop.is_set():
+        _batch_full.wait(FLUSH_INTERVAL)
+        _batch_full.clear()
+        # Ошибка одной пачки не должна останавливать фоновую запись
+        try:
+            flush()
+        except Exception as e:
+            logging.error(f"Ошибка фоновой записи журнала балансов: {e}", exc_info=True)
+
+def get_balance(account):
+    with _lock:
+        return _balances.get(str(account), 0)
+
+def compare_and_post(player_data, entry_type, legs, expected_versions, ref=None):
+    """
+    Проводит транзакцию, только если версии счетов совпадают с expected_versions.
+    Возвращает номер записи или None, если счет успел измениться.
+    """
+    try:
+        return post(player_data, entry_type, legs, ref=ref, expected_versions=expected_versions)
+    except VersionConflict:
+        return None
+
+def update_account(player_data, account, build_legs, entry_type, ref=None):
+    """
+    Оптимистичное изменение счета: build_legs(баланс) возвращает проводки (или None —
+    ничего не делать) и может выбросить исключение; проводки проводятся через
+    compare_and_post, при изменении счета между чтением и записью попытка повторяется.
+    """
+    if not _initialized:
+        init_ledger(player_data)
+    for _ in range(CAS_ATTEMPTS):
+        balance, version = get_account(account)
+        legs = build_legs(balance)
+        if legs is None:
+            return None
+        seq = compare_and_post(player_data, entry_type, legs, {str(account): version}, ref=ref)
+        if seq is not None:
+            return seq
+    raise VersionConflict(f"Не удалось изменить счет {account} за {CAS_ATTEMPTS} попыток")
+
+def record_stake(player_data, user_id, amount, game):
+    """
+    Списывает ставку, если на счете достаточно средств (иначе InsufficientFunds).
+    """
+    def stake_legs(balance):
+        if balance < amount:
+            raise InsufficientFunds(f"Недостаточно средств на счете {user_id}")
+        return [(user_id, -amount, "stake"), (HOUSE, amount, "stake")]
+    return update_account(player_data, user_id, stake_legs, "stake", ref=game)
+
+def record_payout(player_data, user_id, amount, game):
+    return post(player_data, "payout", [(user_id, amount, "payout"), (HOUSE, -amount, "payout")], ref=game)
+
+def record_transfer(player_data, sender_id, recipient_id, amount, fields=None):
+    """
+    Перевод между игроками под блокировками обоих счетов (InsufficientFunds, если средств мало).
+    fields — поля игроков, записываемые вместе с переводом (например, запись нового получателя).
+    """
+    return post(player_data, "transfer", [(sender_id, -amount, "transfer_out"), (recipient_id, amount, "transfer_in")],
+                require_funds=True, fields=fields)
+
+def record_farm_reward(player_data, user_id, amount):
+    return post(player_data, "farm_reward", [(user_id, amount, "farm_reward"), (FAUCET, -amount, "farm_reward")])
+
+def account_totals(entry_type, since=None):
+    """
+    Сумма проводок типа entry_type по каждому счету игрока за время после since (unix time).
+    Учитываются и еще не записанные на диск транзакции.
+    """
+    flush()
+    totals = {}
+    marker = f'"{entry_type}"'
+    for line in read_ledger_lines():
+        # Строки других типов не разбираются
+        if marker not in line:
+            continue
+        entry = json.loads(line)
+        if since is not None and entry["ts"] < since:
+            continue
+        for account, amount, leg_type in entry["legs"]:
+            if leg_type == entry_type and not account.startswith("@"):
+                totals[account] = round(totals.get(account, 0) + amount, 2)
+    return totals
+
+def record_farm_rewards(player_data, credits):
+    """
+    Награды за клики нескольких игроков одной транзакцией: credits — {user_id: сумма}.
+    """
+    legs = [(user_id, amount, "farm_reward") for user_id, amount in credits.items()]
+    legs.append((FAUCET, -sum(credits.values()), "farm_reward"))
+    return post(player_data, "farm_reward", legs)
+
+def record_airdrop(player_data, credits, ref=None, fields=None):
+    """
+    Раздача одной транзакцией: credits — {user_id: сумма}, источник — счет @airdrop.
+    fields — поля игроков, записываемые вместе с раздачей (записи новых получателей).
+    """
+    legs = [(user_id, amount, "airdrop") for user_id, amount in credits.items()]
+    legs.append((AIRDROP, -sum(credits.values()), "airdrop"))
+    return post(player_data, "airdrop", legs, ref=ref, fields=fields)
+
+def record_passive_income(player_data, user_id, accrue):
+    """
+    Зачисляет пассивный доход вместе с новой отметкой last_bonus одной записью журнала.
+    accrue(last_bonus) возвращает (сумма, новая отметка) или None, если начислять нечего.
+    Отметка читается после версии счета, поэтому при параллельном начислении
+    compare-and-swap не даст зачислить один и тот же период дважды.
+    """
+    user_id = str(user_id)
+    if not _initialized:
+        init_ledger(player_data)
+    for _ in range(CAS_ATTEMPTS):
+        _balance, version = get_account(user_id)
+        accrual = accrue(player_data[user_id].get("last_bonus"))
+        if accrual is None:
+            return None
+        amount, last_bonus = accrual
+        try:
+            return post(player_data, "passive_income",
+                        [(user_id, amount, "passive_income"), (MINING, -amount, "passive_income")],
+                        expected_versions={user_id: version}, fields={user_id: {"last_bonus": last_bonus}})
+        except VersionConflict:
+            continue
+    raise VersionConflict(f"Не удалось начислить пассивный доход {user_id} за {CAS_ATTEMPTS} попыток")
+
+def _main(argv):
+    if argv and argv[0] == "balance":
+        balances, seq = replay(read_ledger_lines())
+        accounts = argv[1:] or sorted(balances)
+        for account in accounts:
+            print(f"{account}: {balances.get(account, 0)}")
+        print(f"Записей: {seq}, сумма всех счетов: {round(sum(balances.values()), 2)}")
+        return 0
+    print(__doc__)
+    return 1
+
+if __name__ == "__main__":
+    sys.exit(_main(sys.argv[1:]))
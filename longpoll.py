@@ -0,0 +1,138 @@
+import logging
+import random
+import time
+from collections import deque
+import requests
+from vk_api.bot_longpoll import VkBotLongPoll
+from vk_api.exceptions import VkApiError
+from data_manager import load_longpoll_state, save_longpoll_state
+from config import CONFIG
+
+# ts сохраняется после обработки каждой пачки событий, до следующего запроса к серверу:
+# индекс повторов event_dedup хранится только в памяти, и события, полученные после
+# сохраненного ts, после перезапуска были бы обработаны повторно (ставки, переводы, клики).
+# Повторно придет только пачка, обработка которой прервалась падением процесса.
+# После стольких ошибок подряд ключ и адрес сервера запрашиваются заново
+REFRESH_AFTER_ERRORS = 2
+
+class ResilientLongPoll(VkBotLongPoll):
+    """
+    Bots Long Poll с продолжением с сохраненного ts и восстановлением после сбоев.
+
+    Ответы failed обрабатываются по документации VK:
+        1 — история событий устарела: продолжаем с новым ts из ответа;
+        2 — истек ключ: запрашиваем новый ключ, ts сохраняется;
+        3 — информация утеряна: запрашиваем новые ключ и ts.
+    Сетевые ошибки и ошибки HTTP не прерывают listen(): запрос повторяется через паузу,
+    растущую экспоненциально (со случайным разбросом, чтобы переподключения не совпадали).
+    События полученной пачки, не выданные из-за исключения в обработчике, выдаются
+    при следующем вызове listen(), а не теряются.
+    """
+
+    def __init__(self, vk, group_id, wait=25, persist_ts=True, backoff_base=None, backoff_max=None):
+        self.persist_ts = persist_ts
+        self.backoff_base = backoff_base if backoff_base is not None else CONFIG.get("LONGPOLL_BACKOFF_BASE", 1.0)
+        self.backoff_max = backoff_max if backoff_max is not None else CONFIG.get("LONGPOLL_BACKOFF_MAX", 60.0)
+        self.stats = {"polls": 0, "events": 0, "failed_1": 0, "failed_2": 0, "failed_3": 0, "errors": 0,
+                      "reconnects": 0, "reconnect_latency_total": 0.0, "reconnect_latency_max": 0.0}
+        self._backlog = deque()
+        self._errors = 0
+        self._outage_started = None
+        self._saved_ts = None
+        super().__init__(vk, group_id, wait)
+        if persist_ts:
+            saved_ts = load_longpoll_state().get("ts")
+            if saved_ts is not None:
+                logging.info(f"Long Poll: продолжение с сохраненного ts {saved_ts} (сервер выдал {self.ts})")
+                self.ts = saved_ts
+                self._saved_ts = saved_ts
+
+    def _outage(self):
+        if self._outage_started is None:
+            self._outage_started = time.monotonic()
+
+    def _recovered(self):
+        self._errors = 0
+        if self._outage_started is None:
+            return
+        latency = time.monotonic() - self._outage_started
+        self._outage_started = None
+        self.stats["reconnects"] += 1
+        self.stats["reconnect_latency_total"] += latency
+        self.stats["reconnect_latency_max"] = max(self.stats["reconnect_latency_max"], latency)
+        logging.info(f"Long Poll: соединение восстановлено за {latency:.2f} с")
+
+    def backoff_delay(self):
+        """
+        Пауза перед следующей попыткой: base * 2^(ошибок - 1), не больше backoff_max,
+        умноженная на случайный множитель от 0.5 до 1.
+        """
+        delay = min(self.backoff_max, self.backoff_base * 2 ** max(self._errors - 1, 0))
+        return delay * random.uniform(0.5, 1.0)
+
+    def check(self):
+        """
+        Один запрос к серверу. Возвращает список событий (пустой при ответе failed).
+        """
+        values = {"act": "a_check", "key": self.key, "ts": self.ts, "wait": self.wait}
+        response = self.session.get(self.url, params=values, timeout=self.wait + 10)
+        response.raise_for_status()
+        response = response.json()
+        failed = response.get("failed")
+        if failed is None:
+            self._recovered()
+            self.ts = response["ts"]
+            self.stats["polls"] += 1
+            self.stats["events"] += len(response["updates"])
+            return [self._parse_event(raw_event) for raw_event in response["updates"]]
+        self.stats[f"failed_{failed}" if failed in (1, 2, 3) else "errors"] += 1
+        if failed == 1:
+            logging.warning(f"Long Poll: история событий устарела, продолжение с ts {response['ts']}")
+            self.ts = response["ts"]
+        elif failed == 2:
+            self._outage()
+            self.update_longpoll_server(update_ts=False)
+        else:
+            self._outage()
+            logging.warning(f"Long Poll: сервер вернул failed={failed}, запрашиваются новые ключ и ts")
+            self.update_longpoll_server()
+        return []
+
+    def save_ts(self):
+        """
+        Сохраняет ts, с которого нужно продолжить после перезапуска. Вызывается, когда
+        все события предыдущей пачки обработаны; ts без новых событий не перезаписывается.
+        """
+        if not self.persist_ts or self.ts == self._saved_ts:
+            return
+        try:
+            save_longpoll_state({"ts": self.ts})
+        except OSError as e:
+            logging.error(f"Long Poll: не удалось сохранить ts: {e}")
+            return
+        self._saved_ts = self.ts
+
+    def listen(self):
+        """
+        Бесконечный поток событий; сбои соединения обрабатываются внутри.
+        """
+        while True:
+            while self._backlog:
+                yield self._backlog.popleft()
+            self.save_ts()
+            try:
+                events = self.check()
+            except (requests.exceptions.RequestException, ValueError, KeyError, VkApiError) as e:
+                self._outage()
+                self._errors += 1
+                self.stats["errors"] += 1
+                delay = self.backoff_delay()
+                logging.warning(f"Long Poll: ошибка запроса ({e}), повтор через {delay:.2f} с")
+                time.sleep(delay)
+                if self._errors >= REFRESH_AFTER_ERRORS:
+                    try:
+                        self.update_longpoll_server(update_ts=False)
+                    except (requests.exceptions.RequestException, VkApiError) as refresh_error:
+                        logging.warning(f"Long Poll: не удалось обновить сервер: {refresh_error}")
+                continue
+            self._backlog.extend(events)
@@ -1,10 +1,16 @@
 import time
 import logging
 import vk_api
-from vk_api.bot_longpoll import VkBotLongPoll, VkBotEventType
+from vk_api.bot_longpoll import VkBotEventType
 from config import CONFIG
-from data_manager import load_player_data
+from data_manager import load_player_data, player_data_lock
+from ledger import init_ledger
 from handlers import handle_message, handle_callback
+from render_pool import start_render_pool
+from event_dedup import is_duplicate_event
+from longpoll import ResilientLongPoll
+from names import start_name_resolver
+from name_index import build_name_index
 
 def main():
     logging.basicConfig(level=logging.DEBUG)
@@ -15,20 +21,34 @@ def main():
     vk_session = vk_api.VkApi(token=CONFIG["TOKEN"])
     vk = vk_session.get_api()
     player_data = load_player_data()
+    init_ledger(player_data)
+    build_name_index(player_data)
+    start_name_resolver(vk, player_data)
+    start_render_pool(CONFIG.get("RENDER_WORKERS", 0), timeout=CONFIG.get("RENDER_TIMEOUT", 5.0))
 
-    longpoll = VkBotLongPoll(vk_session, CONFIG["GROUP_ID"])
+    longpoll = ResilientLongPoll(vk_session, CONFIG["GROUP_ID"])
     logger.debug("Бот запущен и ожидает сообщений...")
 
     while True:
         try:
             for event in longpoll.listen():
-                if event.type == VkBotEventType.MESSAGE_NEW:
-                    handle_message(event, player_data, vk)
-                elif event.type == VkBotEventType.MESSAGE_EVENT:
-                    handle_callback(event, player_data, vk)
+                # Повторно доставленные события (после переподключения или повторной
+                # отправки VK) отбрасываются до обработки, чтобы не менять балансы дважды
+                if is_duplicate_event(event):
+                    continue
+                # Ошибка в обработчике не должна прерывать прослушивание: сбои соединения
+                # ResilientLongPoll обрабатывает сам, а событие пропускается с записью в лог
+                try:
+                    with player_data_lock:
+                        if event.type == VkBotEventType.MESSAGE_NEW:
+                            handle_message(event, player_data, vk)
+                        elif event.type == VkBotEventType.MESSAGE_EVENT:
+                            handle_callback(event, player_data, vk)
+                except Exception as e:
+                    logger.error(f"Ошибка обработки события {event.type}: {e}", exc_info=True)
         except Exception as e:
             logger.error(f"Ошибка в прослушивании событий: {e}", exc_info=True)
-            time.sleep(3)  # Задержка перед повторной попыткой подключения
+            time.sleep(longpoll.backoff_delay())  # Задержка перед повторной попыткой подключения
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
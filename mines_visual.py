@@ -1,7 +1,97 @@
 from PIL import Image
+import functools
+import io
 import os
 
-def generate_field_image(game_state, board_size=5, field_width=1440, field_height=1440, padding=10, images_path="images", output_path="updated_field.png", game_over=False):
+# Статусы ячеек, для которых есть отдельное изображение в папке images
+CELL_STATUSES = ("press", "explosion", "bomb", "empty")
+
+# Профили кодирования итогового изображения поля.
+#   format   — формат PIL ("PNG", "JPEG", "WEBP");
+#   size     — сторона итогового изображения в пикселях (None — без масштабирования);
+#   quantize — перевести изображение в палитру из 256 цветов перед сохранением (только PNG);
+#   params   — дополнительные параметры Image.save.
+# VK официально принимает для сообщений JPG, PNG и GIF; профили WebP оставлены для замеров
+# и включаются только после проверки загрузки (python -m benchmarks.mines_images --upload).
+OUTPUT_PROFILES = {
+    "png": {"format": "PNG", "size": None, "quantize": False, "params": {}},
+    "png_palette": {"format": "PNG", "size": None, "quantize": True, "params": {"optimize": True}},
+    "jpeg_high": {"format": "JPEG", "size": None, "quantize": False, "params": {"quality": 90}},
+    "jpeg_medium": {"format": "JPEG", "size": None, "quantize": False, "params": {"quality": 75}},
+    "webp_high": {"format": "WEBP", "size": None, "quantize": False, "params": {"quality": 90, "method": 4}},
+    "webp_medium": {"format": "WEBP", "size": None, "quantize": False, "params": {"quality": 75, "method": 4}},
+    "mobile_jpeg": {"format": "JPEG", "size": 720, "quantize": False, "params": {"quality": 80}},
+    "mobile_webp": {"format": "WEBP", "size": 720, "quantize": False, "params": {"quality": 80, "method": 4}},
+}
+DEFAULT_PROFILE = "png"
+
+@functools.lru_cache(maxsize=8)
+def load_field_assets(board_size=5, field_width=1440, field_height=1440, padding=10, images_path="images"):
+    """
+    Загружает фон и изображения ячеек, приводит их к нужным размерам и вычисляет координаты ячеек.
+    Результат кэшируется для каждой комбинации параметров, поэтому диск читается один раз,
+    а не при каждом ходе. Возвращаемые изображения нельзя изменять — рисовать нужно на копии фона.
+    """
+    # Определяем размер ячейки так, чтобы с учетом отступов заполнить поле заданного размера
+    cell_size = int((field_width - (board_size + 1) * padding) / board_size)
+    
+    # Загружаем фон и изменяем его размер
+    field_path = os.path.join(images_path, "field.png")
+    field_img = Image.open(field_path).convert("RGBA")
+    field_img = field_img.resize((field_width, field_height))
+    
+    # Загружаем изображения ячеек и меняем их размер, конвертируя в RGBA.
+    # Вместе с изображением храним его альфа-канал, чтобы не вычислять маску при каждой вставке.
+    tiles = {}
+    for status in CELL_STATUSES:
+        tile = Image.open(os.path.join(images_path, f"{status}.png")).convert("RGBA").resize((cell_size, cell_size))
+        tiles[status] = (tile, tile.split()[3])
+    
+    # Генерируем координаты для каждой ячейки
+    cell_positions = {}
+    for row in range(board_size):
+        for col in range(board_size):
+            cell_number = row * board_size + col + 1
+            x = col * (cell_size + padding) + padding
+            y = row * (cell_size + padding) + padding
+            cell_positions[cell_number] = (x, y)
+    
+    return {"field": field_img, "tiles": tiles, "positions": cell_positions, "cell_size": cell_size}
+
+def create_field_canvas(board_size=5, field_width=1440, field_height=1440, padding=10, images_path="images"):
+    """
+    Возвращает новую копию фона игрового поля, на которой можно рисовать ячейки.
+    """
+    assets = load_field_assets(board_size, field_width, field_height, padding, images_path)
+    return assets["field"].copy()
+
+def paste_cell(canvas, cell, status, board_size=5, field_width=1440, field_height=1440, padding=10, images_path="images", game_over=False):
+    """
+    Накладывает изображение одной ячейки на холст canvas (изменяет его на месте).
+    Для статуса "empty" изображение накладывается только при game_over,
+    иначе на месте ячейки остается фон.
+    """
+    if status == "empty" and not game_over:
+        return canvas
+    if status not in CELL_STATUSES:
+        return canvas
+    assets = load_field_assets(board_size, field_width, field_height, padding, images_path)
+    tile, mask = assets["tiles"][status]
+    canvas.paste(tile, assets["positions"][cell], mask)
+    return canvas
+
+def compose_field(game_state, board_size=5, field_width=1440, field_height=1440, padding=10, images_path="images", game_over=False):
+    """
+    Собирает полное изображение поля (объект PIL.Image) по словарю состояний ячеек.
+    Параметры совпадают с generate_field_image.
+    """
+    updated_field = create_field_canvas(board_size, field_width, field_height, padding, images_path)
+    for cell in range(1, board_size * board_size + 1):
+        status = game_state.get(cell, "empty")
+        paste_cell(updated_field, cell, status, board_size, field_width, field_height, padding, images_path, game_over)
+    return updated_field
+
+def generate_field_image(game_state, board_size=5, field_width=1440, field_height=1440, padding=10, images_path="images", output_path=None, game_over=False, profile=DEFAULT_PROFILE):
     """
     Генерирует изображение игрового поля для игры "Мины".
     
@@ -22,59 +112,58 @@ def generate_field_image(game_state, board_size=5, field_width=1440, field_heigh
                       explosion.png– изображение для ячейки с миной, на которую нажали;
                       bomb.png     – изображение для не взорвавшейся мины;
                       empty.png    – изображение для безопасной (пустой) ячейки;
-      output_path — путь для сохранения итогового изображения;
+      output_path — путь для сохранения итогового изображения; если None, изображение
+                    не пишется на диск, а возвращается в памяти;
       game_over   — если True, для ячеек со статусом "empty" накладывается изображение empty.png, что позволяет полностью раскрыть поле.
+      profile     — имя профиля кодирования из OUTPUT_PROFILES (используется при output_path=None).
     
     Возвращает:
-      Путь к сгенерированному изображению.
+      Путь к сгенерированному изображению, либо (при output_path=None) буфер io.BytesIO
+      с закодированным изображением, который можно сразу передать в VkUpload.
     """
-    # Определяем размер ячейки так, чтобы с учетом отступов заполнить поле заданного размера
-    cell_size = int((field_width - (board_size + 1) * padding) / board_size)
-    
-    # Загружаем фон и изменяем его размер
-    field_path = os.path.join(images_path, "field.png")
-    field_img = Image.open(field_path).convert("RGBA")
-    field_img = field_img.resize((field_width, field_height))
-    
-    # Загружаем изображения ячеек и меняем их размер, конвертируя в RGBA
-    press_img = Image.open(os.path.join(images_path, "press.png")).convert("RGBA").resize((cell_size, cell_size))
-    explosion_img = Image.open(os.path.join(images_path, "explosion.png")).convert("RGBA").resize((cell_size, cell_size))
-    bomb_img = Image.open(os.path.join(images_path, "bomb.png")).convert("RGBA").resize((cell_size, cell_size))
-    empty_img = Image.open(os.path.join(images_path, "empty.png")).convert("RGBA").resize((cell_size, cell_size))
-    
-    # Генерируем координаты для каждой ячейки
-    cell_positions = {}
-    for row in range(board_size):
-        for col in range(board_size):
-            cell_number = row * board_size + col + 1
-            x = col * (cell_size + padding) + padding
-            y = row * (cell_size + padding) + padding
-            cell_positions[cell_number] = (x, y)
-            
-    updated_field = field_img.copy()
-    
-    for cell in range(1, board_size * board_size + 1):
-        x, y = cell_positions[cell]
-        status = game_state.get(cell, "empty")
-        if status == "press":
-            mask = press_img.split()[3]
-            updated_field.paste(press_img, (x, y), mask)
-        elif status == "explosion":
-            mask = explosion_img.split()[3]
-            updated_field.paste(explosion_img, (x, y), mask)
-        elif status == "bomb":
-            mask = bomb_img.split()[3]
-            updated_field.paste(bomb_img, (x, y), mask)
-        elif status == "empty":
-            # При завершении игры накладываем изображение пустой ячейки
-            if game_over:
-                mask = empty_img.split()[3]
-                updated_field.paste(empty_img, (x, y), mask)
-            # Если игра не завершена, для пустых ячеек оставляем фон без изменений.
+    updated_field = compose_field(game_state, board_size, field_width, field_height, padding, images_path, game_over)
     
+    if output_path is None:
+        return encode_field(updated_field, profile)
     updated_field.save(output_path)
     return output_path
 
+def image_to_buffer(image, filename="field.png", format="PNG", **save_params):
+    """
+    Кодирует изображение в буфер io.BytesIO без обращения к диску.
+    Атрибут name нужен VkUpload, чтобы определить расширение загружаемого файла.
+    """
+    buffer = io.BytesIO()
+    buffer.name = filename
+    image.save(buffer, format=format, **save_params)
+    buffer.seek(0)
+    return buffer
+
+def encode_field(image, profile=DEFAULT_PROFILE):
+    """
+    Кодирует изображение поля в буфер согласно профилю из OUTPUT_PROFILES.
+    При необходимости уменьшает изображение и приводит его к режиму, который
+    поддерживает выбранный формат (JPEG не хранит альфа-канал).
+    """
+    settings = OUTPUT_PROFILES.get(profile)
+    if settings is None:
+        raise ValueError(f"Неизвестный профиль изображения: {profile}")
+    size = settings["size"]
+    if size and image.size != (size, size):
+        image = image.resize((size, size), Image.LANCZOS)
+    if settings["format"] == "JPEG":
+        image = image.convert("RGB")
+    elif settings["quantize"]:
+        image = image.quantize(colors=256)
+    return image_to_buffer(image, filename=profile_filename(profile), format=settings["format"], **settings["params"])
+
+def profile_filename(profile):
+    """
+    Имя файла для буфера с изображением в заданном профиле (VkUpload берет из него расширение).
+    """
+    extension = {"PNG": "png", "JPEG": "jpg", "WEBP": "webp"}[OUTPUT_PROFILES[profile]["format"]]
+    return f"field.{extension}"
+
 if __name__ == "__main__":
     # Пример финального состояния поля (раскрытое поле, game_over=True)
     game_state = {}
@@ -89,4 +178,4 @@ if __name__ == "__main__":
             game_state[cell] = "press"
         else:
             game_state[cell] = "empty"
-    print(generate_field_image(game_state, board_size=board_size, game_over=True))
\ No newline at end of file
+    print(generate_field_image(game_state, board_size=board_size, output_path="updated_field.png", game_over=True))
\ No newline at end of file
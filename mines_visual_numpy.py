@@ -0,0 +1,104 @@
+import functools
+from PIL import Image
+from mines_visual import load_field_assets
+
+try:
+    import numpy as np
+except ImportError:  # numpy нужен только для векторного рендера
+    np = None
+
+# Индексы статусов в стопке изображений ячеек. Индекс 0 — «ничего не накладывать»
+# (нулевая маска), поэтому пустая ячейка без game_over не меняет фон.
+TILE_INDEX = {"press": 1, "explosion": 2, "bomb": 3, "empty": 4}
+
+def _require_numpy():
+    if np is None:
+        raise RuntimeError("Для векторного рендера поля требуется пакет numpy.")
+
+def blend_tiles(base, tiles):
+    """
+    Накладывает изображения RGBA tiles на base по альфа-каналу tiles (массивы uint8 одной формы).
+    Повторяет целочисленную формулу PIL для Image.paste с маской:
+      out = DIV255(base * (255 - mask) + tile * mask), DIV255(v) = (((v + 128) >> 8) + v + 128) >> 8,
+    поэтому результат попиксельно совпадает с mines_visual.paste_cell.
+    Все промежуточные значения не превышают 65535, поэтому вычисления ведутся в uint16.
+    """
+    masks = tiles[..., 3:4].astype(np.uint16)
+    tmp = base.astype(np.uint16) * (255 - masks) + tiles.astype(np.uint16) * masks + 128
+    tmp += tmp >> 8
+    return (tmp >> 8).astype(np.uint8)
+
+@functools.lru_cache(maxsize=8)
+def load_tile_stack(board_size=5, field_width=1440, field_height=1440, padding=10, images_path="images"):
+    """
+    Готовит массивы NumPy для векторного рендера по ресурсам из load_field_assets.
+    Возвращает словарь:
+      background — фон поля, массив (H, W, 4) uint8;
+      cells      — стопка уже смешанных с фоном ячеек (board_size, board_size, 5, cell, cell, 4) uint8:
+                   для каждой ячейки поля и каждого индекса TILE_INDEX (0 — фон без изменений);
+      cell_size, step, padding — геометрия сетки ячеек.
+    Смешивание выполняется один раз для всех ячеек и статусов, после чего сборка поля
+    сводится к выборке из стопки по вектору состояний. Для поля 5x5 стопка занимает ~30 МБ.
+    """
+    _require_numpy()
+    assets = load_field_assets(board_size, field_width, field_height, padding, images_path)
+    cell_size = assets["cell_size"]
+    stack = {
+        "background": np.asarray(assets["field"], dtype=np.uint8),
+        "cell_size": cell_size,
+        "step": cell_size + padding,
+        "padding": padding,
+    }
+    tiles = np.zeros((len(TILE_INDEX) + 1, cell_size, cell_size, 4), dtype=np.uint8)
+    for status, index in TILE_INDEX.items():
+        tile, _ = assets["tiles"][status]
+        tiles[index] = np.asarray(tile, dtype=np.uint8)
+    backgrounds = _cell_view(stack["background"], board_size, stack)[:, :, np.newaxis]
+    stack["cells"] = blend_tiles(np.broadcast_to(backgrounds, (board_size, board_size) + tiles.shape), tiles)
+    return stack
+
+def board_vector(game_state, board_size=5, game_over=False):
+    """
+    Переводит словарь состояний ячеек в вектор индексов стопки изображений (длина board_size²).
+    Как и в generate_field_image, отсутствующие ячейки считаются пустыми, а статус "empty"
+    отображается в изображение только при game_over.
+    """
+    _require_numpy()
+    empty = TILE_INDEX["empty"] if game_over else 0
+    vector = np.full(board_size * board_size, empty, dtype=np.intp)
+    for cell, status in game_state.items():
+        vector[int(cell) - 1] = empty if status == "empty" else TILE_INDEX.get(status, 0)
+    return vector
+
+def _cell_view(array, board_size, stack):
+    """
+    Представление (board_size, board_size, cell, cell, C) областей ячеек массива поля без копирования.
+    """
+    padding, step, cell_size = stack["padding"], stack["step"], stack["cell_size"]
+    span = board_size * step
+    grid = array[padding:padding + span, padding:padding + span]
+    grid = grid.reshape(board_size, step, board_size, step, array.shape[2])
+    return grid[:, :cell_size, :, :cell_size].transpose(0, 2, 1, 3, 4)
+
+def compose_field_array(vector, board_size=5, field_width=1440, field_height=1440, padding=10, images_path="images"):
+    """
+    Собирает поле за один векторный проход: для каждой ячейки из стопки load_tile_stack
+    выбирается заранее смешанное изображение по индексу из вектора состояний,
+    и все ячейки записываются в копию фона одной операцией.
+    Результат попиксельно совпадает с mines_visual.compose_field.
+    Возвращает массив (H, W, 4) uint8.
+    """
+    stack = load_tile_stack(board_size, field_width, field_height, padding, images_path)
+    result = stack["background"].copy()
+    indexes = np.asarray(vector, dtype=np.intp).reshape(board_size, board_size)
+    rows, cols = np.indices((board_size, board_size))
+    _cell_view(result, board_size, stack)[...] = stack["cells"][rows, cols, indexes]
+    return result
+
+def compose_field_fast(game_state, board_size=5, field_width=1440, field_height=1440, padding=10, images_path="images", game_over=False):
+    """
+    Векторный аналог mines_visual.compose_field: возвращает PIL.Image того же вида.
+    """
+    vector = board_vector(game_state, board_size, game_over)
+    array = compose_field_array(vector, board_size, field_width, field_height, padding, images_path)
+    return Image.fromarray(array, "RGBA")
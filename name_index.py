@@ -0,0 +1,116 @@
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from data_manager import is_placeholder
+
+# Имя игрока в нижнем регистре -> ID игроков с этим именем (имена-заглушки не индексируются).
+# Имена обновляются и из потока получения имен (names), поэтому индекс меняется и читается
+# под _names_lock.
+_names = {}
+_names_lock = threading.Lock()
+_player_data = None
+
+def build_name_index(player_data):
+    """
+    Строит индекс по именам игроков из player_data (имена-заглушки не индексируются).
+    """
+    global _names, _player_data
+    names = {}
+    for user_id, player in player_data.items():
+        name = player.get("name")
+        if not is_placeholder(user_id, name):
+            names.setdefault(name.lower(), set()).add(user_id)
+    with _names_lock:
+        _names, _player_data = names, player_data
+    return names
+
+def index_player_name(user_id, name, old_name=None):
+    """
+    Обновляет индекс после смены имени игрока.
+    """
+    user_id = str(user_id)
+    with _names_lock:
+        if old_name and not is_placeholder(user_id, old_name):
+            ids = _names.get(old_name.lower())
+            if ids is not None:
+                ids.discard(user_id)
+                if not ids:
+                    del _names[old_name.lower()]
+        if not is_placeholder(user_id, name):
+            _names.setdefault(name.lower(), set()).add(user_id)
+
+def _current_name(user_id):
+    player = _player_data.get(user_id) if _player_data is not None else None
+    return player.get("name", "") if player else ""
+
+def find_player(name):
+    """
+    ID игрока с именем name (без учета регистра); None, если игрок не найден или
+    такое имя у нескольких игроков. Начало имени не подходит: имена игроки выбирают
+    сами, и по префиксу перевод мог бы уйти не тому игроку.
+    """
+    lowered = name.lower()
+    # Индекс может отставать от player_data: кандидаты сверяются с текущими именами
+    with _names_lock:
+        candidates = list(_names.get(lowered, ()))
+    exact = [user_id for user_id in candidates if _current_name(user_id).lower() == lowered]
+    return exact[0] if len(exact) == 1 else None
+
+# Кэш utils.resolveScreenName: короткое имя -> (тип страницы VK или None, если имя свободно,
+# ID пользователя или None, время устаревания)
+MAX_SCREEN_NAMES = 10000
+SCREEN_NAME_TTL = 86400
+MISSING_SCREEN_NAME_TTL = 600
+# Короткие имена VK состоят только из латиницы, цифр, "_" и "."
+SCREEN_NAME_PATTERN = re.compile(r'[A-Za-z0-9_.]{2,32}')
+_screen_names = OrderedDict()
+_screen_lock = threading.Lock()
+screen_name_stats = {"hits": 0, "api_calls": 0, "errors": 0}
+
+def lookup_screen_name(vk, screen_name):
+    """
+    Страница VK с коротким именем screen_name через кэшированный utils.resolveScreenName:
+    (тип страницы или None, если имя никем не занято, ID пользователя или None).
+    Возвращает None, если имя не может быть коротким или VK не ответил.
+    """
+    if not SCREEN_NAME_PATTERN.fullmatch(screen_name):
+        return None
+    key = screen_name.lower()
+    now = time.monotonic()
+    with _screen_lock:
+        entry = _screen_names.get(key)
+        if entry is not None and entry[2] > now:
+            _screen_names.move_to_end(key)
+            screen_name_stats["hits"] += 1
+            return entry[:2]
+    if vk is None:
+        return None
+    try:
+        response = vk.utils.resolveScreenName(screen_name=screen_name)
+    except Exception as e:
+        screen_name_stats["errors"] += 1
+        logging.warning(f"Не удалось определить пользователя по имени {screen_name}: {e}")
+        return None
+    screen_name_stats["api_calls"] += 1
+    page_type = user_id = None
+    if isinstance(response, dict) and response.get("type"):
+        page_type = response["type"]
+        if page_type == "user":
+            user_id = str(response["object_id"])
+    ttl = SCREEN_NAME_TTL if page_type else MISSING_SCREEN_NAME_TTL
+    with _screen_lock:
+        _screen_names[key] = (page_type, user_id, now + ttl)
+        _screen_names.move_to_end(key)
+        while len(_screen_names) > MAX_SCREEN_NAMES:
+            _screen_names.popitem(last=False)
+    return page_type, user_id
+
+def resolve_screen_name(vk, screen_name):
+    """
+    ID пользователя по короткому имени (vk.com/durov -> "1"). Для сообществ,
+    несуществующих имен и при ошибке VK возвращается None.
+    """
+    page = lookup_screen_name(vk, screen_name)
+    return page[1] if page else None
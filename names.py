@@ -0,0 +1,136 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from data_manager import is_placeholder, placeholder_name, player_data_lock
+from name_index import index_player_name
+from config import CONFIG
+
+# users.get принимает до 1000 идентификаторов за запрос
+BATCH_SIZE = 1000
+# Сколько ждать (с) после первого запроса имени, чтобы собрать в пачку соседние
+BATCH_DELAY = 0.5
+MAX_CACHED_NAMES = 50000
+NAME_TTL = CONFIG.get("NAME_CACHE_TTL", 86400)
+RETRY_DELAY = 5.0
+
+# user_id -> (имя, время устаревания) в порядке последнего использования
+_cache = OrderedDict()
+# Идентификаторы, ожидающие запроса users.get
+_queue = OrderedDict()
+_cond = threading.Condition()
+_vk = None
+_player_data = None
+_thread = None
+name_stats = {"lookups": 0, "cache_hits": 0, "queued": 0, "resolved": 0, "api_calls": 0, "errors": 0}
+
+def cached_name(user_id):
+    """
+    Имя из кэша или None, если его нет или оно устарело.
+    """
+    key = str(user_id)
+    with _cond:
+        entry = _cache.get(key)
+        if entry is None or entry[1] < time.monotonic():
+            return None
+        _cache.move_to_end(key)
+        return entry[0]
+
+def request_names(user_ids):
+    """
+    Ставит идентификаторы в очередь фонового запроса имен. Не ждет ответа VK.
+    """
+    now = time.monotonic()
+    with _cond:
+        added = 0
+        for user_id in user_ids:
+            key = str(user_id)
+            entry = _cache.get(key)
+            if (entry is None or entry[1] < now) and key not in _queue and key.isdigit():
+                _queue[key] = None
+                added += 1
+        if added:
+            name_stats["queued"] += added
+            _cond.notify()
+
+def display_name(user_id, user_data=None):
+    """
+    Имя для показа: имя игрока из player_data, если оно задано, иначе имя из кэша VK.
+    Если имя еще не известно, возвращается "Пользователь {id}", а имя запрашивается в фоне.
+    """
+    name = (user_data or {}).get("name")
+    if not is_placeholder(user_id, name):
+        return name
+    name_stats["lookups"] += 1
+    name = cached_name(user_id)
+    if name is not None:
+        name_stats["cache_hits"] += 1
+        return name
+    request_names([user_id])
+    return placeholder_name(user_id)
+
+def fetch_names(vk, user_ids):
+    """
+    Один запрос users.get для списка идентификаторов. Возвращает {user_id: "Имя Фамилия"}.
+    """
+    response = vk.users.get(user_ids=",".join(user_ids))
+    return {str(user["id"]): f"{user.get('first_name', '')} {user.get('last_name', '')}".strip()
+            for user in response}
+
+def _store(names):
+    expires_at = time.monotonic() + NAME_TTL
+    with _cond:
+        for user_id, name in names.items():
+            _cache[user_id] = (name, expires_at)
+            _cache.move_to_end(user_id)
+        while len(_cache) > MAX_CACHED_NAMES:
+            _cache.popitem(last=False)
+    if _player_data is not None:
+        # Заменяются только имена-заглушки: имя, выбранное игроком, не перезаписывается.
+        # Проверка и замена идут под блокировкой данных игроков, иначе «сменить имя»
+        # в потоке событий между ними было бы перезаписано именем из VK
+        with player_data_lock:
+            for user_id, name in names.items():
+                player = _player_data.get(user_id)
+                if player is not None and name and is_placeholder(user_id, player.get("name")):
+                    player["name"] = name
+                    index_player_name(user_id, name)
+
+def _take_batch():
+    with _cond:
+        _cond.wait_for(lambda: _queue)
+    time.sleep(BATCH_DELAY)
+    with _cond:
+        batch = []
+        while _queue and len(batch) < BATCH_SIZE:
+            batch.append(_queue.popitem(last=False)[0])
+        return batch
+
+def _resolver_loop():
+    while True:
+        batch = _take_batch()
+        try:
+            names = fetch_names(_vk, batch)
+        except Exception as e:
+            name_stats["errors"] += 1
+            logging.warning(f"Не удалось получить имена {len(batch)} пользователей: {e}")
+            with _cond:
+                for user_id in batch:
+                    _queue.setdefault(user_id, None)
+            time.sleep(RETRY_DELAY)
+            continue
+        name_stats["api_calls"] += 1
+        name_stats["resolved"] += len(names)
+        _store(names)
+
+def start_name_resolver(vk, player_data):
+    """
+    Запускает фоновый поток запроса имен и ставит в очередь игроков с именем-заглушкой.
+    Найденные имена записываются в player_data и сохраняются вместе с ним.
+    """
+    global _vk, _player_data, _thread
+    _vk, _player_data = vk, player_data
+    request_names([user_id for user_id, player in player_data.items() if is_placeholder(user_id, player.get("name"))])
+    if _thread is None:
+        _thread = threading.Thread(target=_resolver_loop, name="name-resolver", daemon=True)
+        _thread.start()
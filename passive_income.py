@@ -0,0 +1,119 @@
+import bisect
+import logging
+import math
+import time
+from datetime import datetime
+from ledger import record_passive_income
+from config import CONFIG
+
+# Пассивный доход ("майнинг" без кликов) начисляется лениво: фоновых обходов игроков нет.
+# Доход с момента last_bonus (unix time) считается по расписанию ставок в момент, когда
+# игрок что-то делает с ботом (смотрит баланс, играет, переводит), и зачисляется записью
+# журнала вместе с новой отметкой last_bonus — после перезапуска она восстанавливается
+# из журнала, и период не оплачивается дважды.
+#
+# Расписание — пары [дата начала, Glitch в час]; ставка действует до следующей даты.
+# Чтобы сменить ставку, добавьте строку с датой, с которой действует новая ставка:
+# прошедшие периоды считаются по ставкам, которые действовали тогда.
+SCHEDULE = []
+_starts = []
+# Доход копится не дольше MAX_HOURS часов без активности игрока
+MAX_HOURS = CONFIG.get("PASSIVE_INCOME_MAX_HOURS", 24)
+
+passive_stats = {"settled": 0, "credited": 0}
+
+def load_schedule(rows):
+    """
+    Загружает расписание из строк [дата начала в ISO-формате, Glitch в час].
+    """
+    global SCHEDULE, _starts
+    SCHEDULE = sorted((datetime.fromisoformat(start).timestamp(), rate) for start, rate in rows)
+    _starts = [start for start, _rate in SCHEDULE]
+
+def current_rate(now=None):
+    """
+    Ставка (Glitch в час), действующая в момент now.
+    """
+    index = bisect.bisect_right(_starts, time.time() if now is None else now) - 1
+    return SCHEDULE[index][1] if index >= 0 else 0
+
+def _segments(start, end):
+    """
+    Участки [from, to) внутри [start, end) с постоянной ставкой: (from, to, Glitch в час).
+    """
+    index = max(0, bisect.bisect_right(_starts, start) - 1)
+    for position in range(index, len(SCHEDULE)):
+        segment_start, rate = SCHEDULE[position]
+        segment_end = SCHEDULE[position + 1][0] if position + 1 < len(SCHEDULE) else math.inf
+        low, high = max(start, segment_start), min(end, segment_end)
+        if low >= end:
+            break
+        if high > low:
+            yield low, high, rate
+
+def accrued(start, end):
+    """
+    Доход за время [start, end) по расписанию ставок.
+    """
+    return sum((high - low) / 3600 * rate for low, high, rate in _segments(start, end))
+
+def time_to_earn(start, amount, end):
+    """
+    Момент (не позже end), к которому с start накопится amount Glitch.
+    """
+    for low, high, rate in _segments(start, end):
+        earned = (high - low) / 3600 * rate
+        if rate > 0 and earned >= amount:
+            return low + amount / rate * 3600
+        amount -= earned
+    return end
+
+def pending_income(player, now=None):
+    """
+    (целых Glitch к зачислению, новая отметка last_bonus) для игрока на момент now.
+    Дробный остаток не теряется: отметка сдвигается ровно на время, за которое
+    накоплена зачисляемая сумма.
+    """
+    now = time.time() if now is None else now
+    last_bonus = player.get("last_bonus")
+    if last_bonus is None:
+        return 0, now
+    start = max(last_bonus, now - MAX_HOURS * 3600)
+    amount = math.floor(accrued(start, now) + 1e-9)
+    if amount <= 0:
+        return 0, last_bonus
+    return amount, time_to_earn(start, amount, now)
+
+def settle_passive_income(user_id, player_data, now=None):
+    """
+    Зачисляет накопленный пассивный доход игрока. Вызывается перед каждым чтением
+    или изменением баланса игрока. Возвращает зачисленную сумму.
+    """
+    player = player_data.get(str(user_id))
+    if player is None or not SCHEDULE:
+        return 0
+    now = time.time() if now is None else now
+    if player.get("last_bonus") is None:
+        # Доход копится с первого обращения игрока после появления пассивного дохода
+        player["last_bonus"] = now
+        return 0
+
+    credited = []
+
+    def accrue(last_bonus):
+        amount, until = pending_income({"last_bonus": last_bonus}, now)
+        credited[:] = [amount]
+        return (amount, until) if amount > 0 else None
+
+    try:
+        seq = record_passive_income(player_data, user_id, accrue)
+    except Exception as e:
+        logging.error(f"Не удалось начислить пассивный доход игроку {user_id}: {e}")
+        return 0
+    if seq is None:
+        return 0
+    passive_stats["settled"] += 1
+    passive_stats["credited"] += credited[0]
+    return credited[0]
+
+load_schedule(CONFIG.get("PASSIVE_INCOME_SCHEDULE", []))
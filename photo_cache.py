@@ -0,0 +1,97 @@
+import logging
+import threading
+from collections import OrderedDict
+from data_manager import append_photo_cache, load_photo_cache, save_photo_cache
+
+# Максимальное количество запоминаемых изображений поля
+MAX_CACHED_PHOTOS = 5000
+# Новые записи дописываются в файл по одной строке; когда строк набирается вдвое больше,
+# чем записей в кэше, файл переписывается только актуальными записями
+COMPACT_AFTER = MAX_CACHED_PHOTOS
+
+# Отпечаток поля -> attachment вида "photo{owner_id}_{id}" в порядке последнего использования
+_photo_cache = OrderedDict()
+# Кэш читают и меняют поток обработки событий и потоки отложенной загрузки изображений.
+# Под _lock только словарь; файл пишется под _file_lock, который берется раньше _lock.
+_lock = threading.Lock()
+_file_lock = threading.Lock()
+_loaded = False
+# Строк в файле кэша сверх числа записей в памяти
+_stale_lines = 0
+
+def board_fingerprint(board_state, board_size, game_over=False, profile="png"):
+    """
+    Вычисляет отпечаток состояния поля, однозначно определяющий итоговое изображение.
+    Для каждого статуса ("press", "bomb", "explosion") строится битовая маска ячеек,
+    флаг game_over учитывается, так как от него зависит отрисовка пустых ячеек.
+    Ячейки со статусом "empty" в маски не входят, поэтому board_state может быть неполным.
+    Профиль кодирования входит в отпечаток: одно поле в разных форматах — разные изображения.
+    """
+    masks = {"press": 0, "bomb": 0, "explosion": 0}
+    for cell, status in board_state.items():
+        if status in masks:
+            masks[status] |= 1 << (int(cell) - 1)
+    return masks_fingerprint(board_size, game_over, masks["press"], masks["bomb"], masks["explosion"], profile)
+
+def masks_fingerprint(board_size, game_over, press, bomb, explosion, profile="png"):
+    """
+    Отпечаток поля по готовым битовым маскам ячеек (бит n - 1 — ячейка n).
+    Совпадает с board_fingerprint для эквивалентного словаря состояний.
+    """
+    return f"{profile}:{board_size}:{int(bool(game_over))}:{press:x}:{bomb:x}:{explosion:x}"
+
+def _ensure_loaded():
+    global _loaded, _stale_lines
+    if _loaded:
+        return
+    entries = load_photo_cache()
+    for fingerprint, attachment in entries:
+        _photo_cache[fingerprint] = attachment
+        _photo_cache.move_to_end(fingerprint)
+    while len(_photo_cache) > MAX_CACHED_PHOTOS:
+        _photo_cache.popitem(last=False)
+    _stale_lines = len(entries) - len(_photo_cache)
+    _loaded = True
+
+def get_cached_attachment(fingerprint):
+    """
+    Возвращает ранее загруженный attachment для отпечатка поля или None.
+    """
+    with _lock:
+        _ensure_loaded()
+        attachment = _photo_cache.get(fingerprint)
+        if attachment is not None:
+            _photo_cache.move_to_end(fingerprint)
+        return attachment
+
+def remember_attachment(fingerprint, attachment):
+    """
+    Запоминает загруженный attachment и дописывает его строкой в файл кэша.
+    При переполнении вытесняется давно не использованная запись; файл сжимается
+    раз в COMPACT_AFTER вытесненных или замененных записей.
+    """
+    global _stale_lines
+    with _lock:
+        _ensure_loaded()
+        if fingerprint in _photo_cache:
+            _stale_lines += 1
+        _photo_cache[fingerprint] = attachment
+        _photo_cache.move_to_end(fingerprint)
+        while len(_photo_cache) > MAX_CACHED_PHOTOS:
+            _photo_cache.popitem(last=False)
+            _stale_lines += 1
+        compact = _stale_lines >= COMPACT_AFTER
+    try:
+        with _file_lock:
+            if compact:
+                # Снимок берется под _file_lock: записи, добавленные после него, дописываются
+                # строками уже после сжатого файла
+                with _lock:
+                    entries = [[key, value] for key, value in _photo_cache.items()]
+                save_photo_cache(entries)
+                with _lock:
+                    _stale_lines = 0
+            else:
+                append_photo_cache([fingerprint, attachment])
+    except OSError as e:
+        logging.error(f"Ошибка сохранения кэша изображений: {e}")
@@ -0,0 +1,158 @@
+import io
+import logging
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from mines_visual import DEFAULT_PROFILE, generate_field_image, profile_filename
+
+def _render_job(board_state, board_size, game_over, profile):
+    """
+    Выполняется в процессе-обработчике: собирает и кодирует поле, возвращает байты изображения.
+    """
+    buffer = generate_field_image(board_state, board_size=board_size, game_over=game_over, profile=profile)
+    return buffer.getvalue()
+
+def _to_buffer(data, profile):
+    buffer = io.BytesIO(data)
+    buffer.name = profile_filename(profile)
+    return buffer
+
+class RenderPool:
+    """
+    Пул процессов для отрисовки и кодирования изображений поля "Мины".
+    Сборка и кодирование PNG нагружают процессор, поэтому выполняются в отдельных процессах.
+    Поток обработки событий готовых байтов не ждет: submit ставит задание и сразу
+    возвращается, а готовое изображение передается в on_done в потоке результатов пула
+    (там же его можно загрузить в VK и отправить, не задерживая другие события).
+
+    Очередь ограничена max_pending заданиями: при заполненной очереди submit возвращает
+    False, и вызывающий решает, что делать с полем (см. games.mines.send_field_image).
+    Если задание не завершилось за timeout секунд или обработчик упал с ошибкой, поле
+    рисуется в потоке результатов функцией fallback.
+    """
+
+    def __init__(self, workers, max_pending=None, timeout=5.0):
+        self.workers = workers
+        self.timeout = timeout
+        self.max_pending = max_pending or workers * 4
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._executor = ProcessPoolExecutor(max_workers=workers)
+        # Загрузка готовых изображений в VK идет по сети, поэтому не выполняется
+        # в служебном потоке ProcessPoolExecutor, который раздает результаты процессов
+        self._results = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="render-results")
+        self._lock = threading.Lock()
+        self._pending = 0
+        self.stats = {"submitted": 0, "completed": 0, "rejected": 0, "timeouts": 0, "errors": 0, "fallbacks": 0}
+
+    def _count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+    def pending(self):
+        """
+        Количество заданий, поставленных в очередь и еще не переданных в on_done.
+        """
+        return self._pending
+
+    def _finish(self):
+        with self._lock:
+            self._pending -= 1
+        self._slots.release()
+
+    def submit(self, board_state, on_done, board_size=5, game_over=False, profile=DEFAULT_PROFILE, fallback=None):
+        """
+        Ставит отрисовку поля в очередь, не дожидаясь результата. on_done(буфер io.BytesIO)
+        вызывается ровно один раз в потоке результатов пула: с изображением из процесса
+        или, при таймауте и ошибке, с результатом fallback() (по умолчанию — отрисовка
+        в текущем процессе). Возвращает False, если очередь заполнена.
+        """
+        if not self._slots.acquire(blocking=False):
+            self._count("rejected")
+            return False
+        board_state = dict(board_state)
+        try:
+            future = self._executor.submit(_render_job, board_state, board_size, game_over, profile)
+        except Exception:
+            self._slots.release()
+            raise
+        with self._lock:
+            self._pending += 1
+            self.stats["submitted"] += 1
+        claimed = []
+        claim_lock = threading.Lock()
+
+        def claim():
+            # Результат процесса и таймаут могут прийти одновременно; on_done получает первый
+            with claim_lock:
+                if claimed:
+                    return False
+                claimed.append(True)
+                return True
+
+        def render_locally():
+            self._count("fallbacks")
+            if fallback is not None:
+                return fallback()
+            return generate_field_image(board_state, board_size=board_size, game_over=game_over, profile=profile)
+
+        def deliver(produce):
+            try:
+                on_done(produce())
+            except Exception as e:
+                logging.error(f"RenderPool: ошибка обработки изображения поля: {e}")
+            finally:
+                self._finish()
+
+        def on_result(done_future):
+            timer.cancel()
+            if not claim():
+                return
+            try:
+                data = done_future.result()
+            except Exception as e:
+                self._count("errors")
+                logging.error(f"RenderPool: ошибка отрисовки поля: {e}")
+                self._results.submit(deliver, render_locally)
+                return
+            self._count("completed")
+            self._results.submit(deliver, lambda: _to_buffer(data, profile))
+
+        def on_timeout():
+            if not claim():
+                return
+            future.cancel()
+            self._count("timeouts")
+            logging.warning(f"RenderPool: превышено время отрисовки поля ({self.timeout} с)")
+            self._results.submit(deliver, render_locally)
+
+        timer = threading.Timer(self.timeout, on_timeout)
+        timer.daemon = True
+        timer.start()
+        future.add_done_callback(on_result)
+        return True
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._results.shutdown(wait=False)
+
+# Пул, используемый ботом; создается в main.main через start_render_pool
+_pool = None
+
+def start_render_pool(workers, max_pending=None, timeout=5.0):
+    """
+    Запускает общий пул отрисовки. При workers <= 0 пул не создается,
+    и изображения рисуются в потоке обработки событий, как раньше.
+    """
+    global _pool
+    if _pool is not None:
+        _pool.shutdown()
+        _pool = None
+    if workers and workers > 0:
+        _pool = RenderPool(workers, max_pending=max_pending, timeout=timeout)
+        logging.info(f"Пул отрисовки запущен: {workers} процесс(ов), очередь {_pool.max_pending}")
+    return _pool
+
+def get_render_pool():
+    """
+    Возвращает общий пул отрисовки или None, если он не запущен.
+    """
+    return _pool
@@ -0,0 +1,221 @@
+"""
+Монте-Карло симулятор RTP (доли возвращаемых ставок) для игр "Мины" и "Орел-Решка".
+
+Правила повторяют игру: в "Минах" мины расставляются равновероятно, выплата после k
+безопасных ходов — ставка * get_current_coefficient(мин, k, размер поля); в "Орел-Решке"
+угадавший получает 2 ставки. Раунды разыгрываются пакетами NumPy в нескольких процессах.
+
+Стратегии "Мин":
+  fixed:K — открыть K ячеек и забрать выигрыш;
+  random  — открыть случайное число ячеек (от 1 до числа безопасных) и забрать выигрыш.
+
+Для проверки новой таблицы до выкладки можно задать --house-edge: коэффициенты будут
+построены build_coefficient_table, а не взяты из coefficients.json.
+
+Примеры запуска из корня проекта:
+    python rtp_simulator.py mines --size 5 --mines 3 --strategy fixed:1 --strategy fixed:5 --strategy random
+    python rtp_simulator.py coinflip --rounds 50000000 --bankroll 20
+"""
+import argparse
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import numpy as np
+except ImportError:  # numpy нужен только для симуляции
+    np = None
+
+COINFLIP_PAYOUT = 2.0
+BATCH_SIZE = 1_000_000
+RUIN_CHECKPOINTS = (10, 50, 100, 500, 1000)
+
+def _require_numpy():
+    if np is None:
+        raise RuntimeError("Для симуляции RTP требуется пакет numpy.")
+
+def payout_table(board_size, mine_count, house_edge=None):
+    """
+    Множители выплат "Мин": элемент k — коэффициент после k безопасных ходов (элемент 0 не используется).
+    По умолчанию берется из действующих таблиц через get_current_coefficient.
+    """
+    from games.mines import build_coefficient_table, get_current_coefficient
+    safe_cells = board_size * board_size - mine_count
+    if house_edge is None:
+        return [1.0] + [get_current_coefficient(mine_count, picks, board_size) for picks in range(1, safe_cells + 1)]
+    return [1.0] + list(build_coefficient_table(board_size, mine_count, house_edge))
+
+def parse_strategy(strategy, safe_cells):
+    """
+    Переводит строку стратегии в число ячеек для открытия (None — случайное число).
+    """
+    if strategy == "random":
+        return None
+    if strategy.startswith("fixed:"):
+        picks = int(strategy[len("fixed:"):])
+        if 1 <= picks <= safe_cells:
+            return picks
+    raise ValueError(f"Неизвестная стратегия: {strategy}")
+
+def theoretical_rtp(game, params, strategy):
+    """
+    Точный RTP стратегии: сумма выплат, умноженных на вероятность пройти k ходов
+    без мины (C(N - M, k) / C(N, k)).
+    """
+    if game == "coinflip":
+        return COINFLIP_PAYOUT / 2
+    total, mines, table = params["total_cells"], params["mine_count"], params["table"]
+    safe_cells = total - mines
+    picks = parse_strategy(strategy, safe_cells)
+    targets = range(1, safe_cells + 1) if picks is None else (picks,)
+    survive = [math.comb(safe_cells, k) / math.comb(total, k) for k in targets]
+    return sum(table[k] * p for k, p in zip(targets, survive)) / len(targets)
+
+def safe_picks(rng, rounds, total_cells, mine_count, max_picks):
+    """
+    Число безопасных ходов до первой мины (не больше max_picks) в rounds раундах.
+    Игрок открывает ячейки по одной; при равновероятной расстановке мин i-я открытая
+    ячейка (после i безопасных) содержит мину с вероятностью M / (N - i),
+    что совпадает с fairness.mines_mask.
+    """
+    result = np.full(rounds, max_picks, dtype=np.int16)
+    alive = np.ones(rounds, dtype=bool)
+    for i in range(max_picks):
+        hit = alive & (rng.random(rounds, dtype=np.float32) < mine_count / (total_cells - i))
+        result[hit] = i
+        alive &= ~hit
+    return result
+
+def play_batch(rng, game, params, picks, rounds):
+    """
+    Выплаты rounds раундов при ставке 1 (0 — проигрыш).
+    """
+    if game == "coinflip":
+        return np.where(rng.random(rounds, dtype=np.float32) < 0.5, COINFLIP_PAYOUT, 0.0)
+    safe_cells = params["total_cells"] - params["mine_count"]
+    table = np.asarray(params["table"], dtype=np.float64)
+    if picks is None:
+        targets = rng.integers(1, safe_cells + 1, size=rounds, dtype=np.int16)
+        max_picks = safe_cells
+    else:
+        targets = np.full(rounds, picks, dtype=np.int16)
+        max_picks = picks
+    survived = safe_picks(rng, rounds, params["total_cells"], params["mine_count"], max_picks) >= targets
+    return np.where(survived, table[targets], 0.0)
+
+def _strategy_picks(game, params, strategy):
+    if game == "coinflip":
+        return None
+    return parse_strategy(strategy, params["total_cells"] - params["mine_count"])
+
+def _simulate_chunk(game, params, strategy, rounds, seed):
+    """
+    Выполняется в процессе пула: возвращает (раундов, сумма выплат, сумма квадратов выплат).
+    """
+    rng = np.random.default_rng(seed)
+    picks = _strategy_picks(game, params, strategy)
+    total, total_sq, done = 0.0, 0.0, 0
+    while done < rounds:
+        size = min(BATCH_SIZE, rounds - done)
+        payouts = play_batch(rng, game, params, picks, size)
+        total += float(payouts.sum())
+        total_sq += float(np.dot(payouts, payouts))
+        done += size
+    return done, total, total_sq
+
+def _ruin_chunk(game, params, strategy, players, rounds, bankroll, checkpoints, seed):
+    """
+    Выполняется в процессе пула: players игроков с банком bankroll ставок играют по одной
+    ставке за раунд. Возвращает число разорившихся (банк меньше ставки) к каждой контрольной точке.
+    """
+    rng = np.random.default_rng(seed)
+    picks = _strategy_picks(game, params, strategy)
+    balance = np.full(players, float(bankroll))
+    ruined = np.zeros(players, dtype=bool)
+    counts = []
+    for played in range(1, rounds + 1):
+        payouts = play_batch(rng, game, params, picks, players)
+        balance = np.where(ruined, balance, balance - 1.0 + payouts)
+        ruined |= balance < 1.0
+        if played in checkpoints:
+            counts.append(int(ruined.sum()))
+    return counts
+
+def _split(total, parts):
+    return [total // parts + (1 if i < total % parts else 0) for i in range(parts)]
+
+def simulate(game, params, strategy, rounds, workers, seed=None):
+    """
+    Разыгрывает rounds раундов в workers процессах.
+    Возвращает словарь: rounds, rtp, variance (дисперсия чистого результата на ставку), std, elapsed.
+    """
+    _require_numpy()
+    seeds = np.random.SeedSequence(seed).spawn(workers)
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_simulate_chunk, game, params, strategy, chunk, chunk_seed)
+                   for chunk, chunk_seed in zip(_split(rounds, workers), seeds) if chunk]
+        results = [future.result() for future in futures]
+    count = sum(result[0] for result in results)
+    mean = sum(result[1] for result in results) / count
+    variance = sum(result[2] for result in results) / count - mean * mean
+    return {"rounds": count, "rtp": mean, "variance": variance, "std": math.sqrt(max(variance, 0.0)),
+            "elapsed": time.perf_counter() - started}
+
+def ruin_curve(game, params, strategy, players, rounds, bankroll, workers, seed=None):
+    """
+    Кривая разорения: список пар (раунд, доля разорившихся игроков).
+    """
+    _require_numpy()
+    checkpoints = tuple(point for point in RUIN_CHECKPOINTS if point < rounds) + (rounds,)
+    seeds = np.random.SeedSequence(seed).spawn(workers)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_ruin_chunk, game, params, strategy, chunk, rounds, bankroll, checkpoints, chunk_seed)
+                   for chunk, chunk_seed in zip(_split(players, workers), seeds) if chunk]
+        results = [future.result() for future in futures]
+    ruined = [sum(counts) for counts in zip(*results)]
+    return [(point, count / players) for point, count in zip(checkpoints, ruined)]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("game", choices=("mines", "coinflip"))
+    parser.add_argument("--size", type=int, default=5, help="размер поля \"Мин\"")
+    parser.add_argument("--mines", type=int, default=3, help="количество мин")
+    parser.add_argument("--strategy", action="append", help="fixed:K или random (можно несколько раз)")
+    parser.add_argument("--house-edge", default=None, help="построить таблицу с этим преимуществом казино")
+    parser.add_argument("--rounds", type=int, default=10_000_000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--players", type=int, default=100_000, help="игроков для кривой разорения (0 — не строить)")
+    parser.add_argument("--ruin-rounds", type=int, default=1000)
+    parser.add_argument("--bankroll", type=int, default=10, help="начальный банк в ставках")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.game == "coinflip":
+        params = {}
+        strategies = ["heads"]
+    else:
+        params = {"total_cells": args.size * args.size, "mine_count": args.mines,
+                  "table": payout_table(args.size, args.mines, args.house_edge)}
+        strategies = args.strategy or ["fixed:1", "random"]
+        for strategy in strategies:
+            try:
+                parse_strategy(strategy, params["total_cells"] - args.mines)
+            except ValueError as e:
+                parser.error(f"{e} (для fixed:K допустимо K от 1 до {params['total_cells'] - args.mines})")
+
+    for strategy in strategies:
+        stats = simulate(args.game, params, strategy, args.rounds, args.workers, args.seed)
+        expected = theoretical_rtp(args.game, params, strategy)
+        print(f"{args.game} {strategy}: RTP {stats['rtp'] * 100:.3f}% (теоретически {expected * 100:.3f}%), "
+              f"дисперсия {stats['variance']:.4f}, СКО {stats['std']:.4f}, "
+              f"{stats['rounds'] / stats['elapsed'] * 60 / 1e6:.1f} млн раундов/мин")
+        if args.players:
+            curve = ruin_curve(args.game, params, strategy, args.players, args.ruin_rounds, args.bankroll,
+                               args.workers, args.seed)
+            points = ", ".join(f"{point}: {share * 100:.1f}%" for point, share in curve)
+            print(f"  разорение при банке {args.bankroll} ставок — {points}")
+
+if __name__ == "__main__":
+    main()
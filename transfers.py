@@ -1,9 +1,9 @@
 import re
 import json
-import random
 import logging
 from vk_api.keyboard import VkKeyboard, VkKeyboardColor
 from data_manager import save_player_data, load_player_data, add_user
+from delivery import send_message
 
 # Global dictionary for tracking ongoing transfer sessions
 transfer_sessions = {}
@@ -43,10 +43,10 @@ def initiate_transfer(sender_id, event, vk):
     Initiates a transfer session by asking the sender for the recipient.
     """
     transfer_sessions[str(sender_id)] = {"stage": "recipient", "sender_id": str(sender_id)}
-    vk.messages.send(
+    send_message(
+        vk,
         peer_id=event.obj.message.get('peer_id'),
-        message="Введите ссылку или тег игрока, которому вы хотите перевести Glitch:",
-        random_id=random.randint(1, 1000)
+        message="Введите ссылку или тег игрока, которому вы хотите перевести Glitch:"
     )
 
 def process_transfer(bot_event, sender_id, text, player_data, vk):
@@ -67,18 +67,18 @@ def process_transfer(bot_event, sender_id, text, player_data, vk):
     if stage == "recipient":
         recipient = parse_recipient(text, bot_event)
         if not recipient:
-            vk.messages.send(
+            send_message(
+                vk,
                 peer_id=peer_id,
-                message="Не удалось определить получателя. Попробуйте еще раз, отправив корректную ссылку/тег.",
-                random_id=random.randint(1, 1000)
+                message="Не удалось определить получателя. Попробуйте еще раз, отправив корректную ссылку/тег."
             )
             return True
         session["recipient"] = recipient
         session["stage"] = "amount"
-        vk.messages.send(
+        send_message(
+            vk,
             peer_id=peer_id,
-            message="Введите сумму Glitch для перевода:",
-            random_id=random.randint(1, 1000)
+            message="Введите сумму Glitch для перевода:"
         )
         return True
 
@@ -88,19 +88,19 @@ def process_transfer(bot_event, sender_id, text, player_data, vk):
             if amount <= 0:
                 raise ValueError()
         except ValueError:
-            vk.messages.send(
+            send_message(
+                vk,
                 peer_id=peer_id,
-                message="Введите корректное число для суммы перевода.",
-                random_id=random.randint(1, 1000)
+                message="Введите корректное число для суммы перевода."
             )
             return True
         # Check if sender has enough funds
         sender_balance = int(player_data.get(str(sender_id), {}).get("balance", 0))
         if sender_balance < amount:
-            vk.messages.send(
+            send_message(
+                vk,
                 peer_id=peer_id,
-                message="Недостаточно средств для перевода.",
-                random_id=random.randint(1, 1000)
+                message="Недостаточно средств для перевода."
             )
             del transfer_sessions[str(sender_id)]
             return True
@@ -117,11 +117,11 @@ def process_transfer(bot_event, sender_id, text, player_data, vk):
                                      payload={"command": "transfer_confirm", "action": "cancel"})
         confirmation_msg = (f"Пожалуйста, подтвердите, что вы ({sender_tag}) хотите перевести "
                             f"{amount} Glitch игроку ({recipient_tag}).")
-        vk.messages.send(
+        send_message(
+            vk,
             peer_id=peer_id,
             message=confirmation_msg,
-            keyboard=keyboard.get_keyboard(),
-            random_id=random.randint(1, 1000)
+            keyboard=keyboard.get_keyboard()
         )
         return True
 
@@ -135,18 +135,18 @@ def process_transfer_confirmation(sender_id, action, player_data, vk, peer_id):
     """
     session = transfer_sessions.get(str(sender_id))
     if not session or session.get("stage") != "confirm":
-        vk.messages.send(
+        send_message(
+            vk,
             peer_id=peer_id,
-            message="Сессия перевода не найдена или уже завершена.",
-            random_id=random.randint(1, 1000)
+            message="Сессия перевода не найдена или уже завершена."
         )
         return
 
     if action == "cancel":
-        vk.messages.send(
+        send_message(
+            vk,
             peer_id=peer_id,
-            message="Перевод отменён.",
-            random_id=random.randint(1, 1000)
+            message="Перевод отменён."
         )
         del transfer_sessions[str(sender_id)]
         return
@@ -156,10 +156,10 @@ def process_transfer_confirmation(sender_id, action, player_data, vk, peer_id):
         recipient = session.get("recipient")
         sender_balance = int(player_data.get(str(sender_id), {}).get("balance", 0))
         if sender_balance < amount:
-            vk.messages.send(
+            send_message(
+                vk,
                 peer_id=peer_id,
-                message="Недостаточно средств для перевода.",
-                random_id=random.randint(1, 1000)
+                message="Недостаточно средств для перевода."
             )
             del transfer_sessions[str(sender_id)]
             return
@@ -171,11 +171,11 @@ def process_transfer_confirmation(sender_id, action, player_data, vk, peer_id):
             add_user(recipient, player_data, vk_name=f"Пользователь {recipient}")
         player_data[str(recipient)]["balance"] += amount
         save_player_data(player_data)
-        vk.messages.send(
+        send_message(
+            vk,
             peer_id=peer_id,
             message=(f"Перевод выполнен успешно! С вашего счета списано {amount} Glitch. "
-                     f"Новый баланс: {player_data[str(sender_id)]['balance']} Glitch."),
-            random_id=random.randint(1, 1000)
+                     f"Новый баланс: {player_data[str(sender_id)]['balance']} Glitch.")
         )
         del transfer_sessions[str(sender_id)]
         return
\ No newline at end of file
@@ -1,6 +1,7 @@
 import hashlib
 import random
 import string
+from names import display_name
 
 def generate_result():
     result = "heads" if random.randint(0, 1) == 0 else "tails"
@@ -25,6 +26,9 @@ def generate_random_string(length=16):
     letters_and_digits = string.ascii_letters + string.digits
     return ''.join(random.choice(letters_and_digits) for _ in range(length))
 
+def is_group_chat(peer_id):
+    return peer_id >= 2000000000
+
 def format_user_tag(user_id, user_data):
-    name = user_data.get("name", f"Пользователь {user_id}")
+    name = display_name(user_id, user_data)
     return f"[vk.com/id{user_id}|{name}]"
\ No newline at end of file